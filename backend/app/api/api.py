@@ -1,6 +1,6 @@
 # app/api/api.py
 from fastapi import APIRouter
-from app.api.v1 import auth, story, users, interaction, admin, discovery, upload
+from app.api.v1 import auth, story, users, interaction, admin, discovery, upload, events, leaderboard
 
 api_router = APIRouter()
 
@@ -19,4 +19,10 @@ api_router.include_router(admin.router, prefix="/admin", tags=["Admin (God Mode)
 
 api_router.include_router(discovery.router, prefix="/discovery", tags=["Discovery"])
 
-api_router.include_router(upload.router, prefix="/uploads", tags=["Uploads"])
\ No newline at end of file
+# 作者排行榜
+api_router.include_router(leaderboard.router, prefix="/leaderboard", tags=["Leaderboard"])
+
+api_router.include_router(upload.router, prefix="/uploads", tags=["Uploads"])
+
+# 实时推送 (SSE)
+api_router.include_router(events.router, prefix="/events", tags=["Events"])
\ No newline at end of file
@@ -1,45 +1,74 @@
 # app/api/deps.py
-from fastapi import Depends, HTTPException, status
+import ipaddress
+from datetime import datetime, timezone
+
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
 
 from app.core import security
 from app.core.config import settings
 from app.core.database import get_db
-from app.models.user import User, UserRole
-from app.schemas.token import TokenData
+from app.core.principal import Principal, load_principal
+from app.core.revocation import revocations
+from app.models.user import UserRole
+from app.utils.rate_limit import API_RULE, AUTH_RULE, RateLimitRule, limiter
 from typing import Optional
 
 # 定义 Token 获取方式 (Bearer Token)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_STR}/auth/login")
 
+def _decode_access_token(token: str) -> Optional[dict]:
+    """解码并校验访问令牌，无效/已吊销返回 None"""
+    try:
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    except JWTError:
+        return None
+    if payload.get("sub") is None or payload.get("typ", "access") != "access":
+        return None
+    if revocations.is_revoked(payload):
+        return None
+    return payload
+
+
+async def _resolve_principal(payload: dict, db: AsyncSession) -> Optional[Principal]:
+    # 新令牌自带身份声明，直接还原，不查库
+    if "role" in payload:
+        return Principal(
+            id=int(payload["sub"]),
+            role=UserRole(payload["role"]),
+            is_active=payload["act"],
+            is_verified=payload["ver"],
+            username=payload.get("name", ""),
+        )
+    # 兼容升级前签发的只含 sub 的令牌：走缓存/查库，自带 exp 到期 (或配置的截止时刻之后) 要求重新登录
+    cutoff = settings.LEGACY_ACCESS_TOKEN_ACCEPT_UNTIL
+    if cutoff is not None and cutoff.tzinfo is None:
+        cutoff = cutoff.replace(tzinfo=timezone.utc)
+    if cutoff is not None and datetime.now(timezone.utc) >= cutoff:
+        return None
+    # 注意: payload['sub'] 存的是 string 类型的 ID
+    return await load_principal(db, int(payload["sub"]))
+
+
 async def get_current_user(
     token: str = Depends(oauth2_scheme),
     db: AsyncSession = Depends(get_db)
-) -> User:
+) -> Principal:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="无法验证凭证",
         headers={"WWW-Authenticate": "Bearer"},
     )
     
-    try:
-        # 1. 解码 Token
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        user_id: str = payload.get("sub")
-        if user_id is None:
-            raise credentials_exception
-        token_data = TokenData(user_id=user_id) # 这里的 sub 我们存的是 ID 还是 Email? 建议存 ID 字符串
-    except JWTError:
+    # 1. 解码 Token (含过期、吊销检查)
+    payload = _decode_access_token(token)
+    if payload is None:
         raise credentials_exception
 
-    # 2. 查数据库获取用户对象
-    # 注意: payload['sub'] 存的是 string 类型的 ID
-    stmt = select(User).where(User.id == int(user_id))
-    result = await db.execute(stmt)
-    user = result.scalars().first()
+    # 2. 获取用户身份
+    user = await _resolve_principal(payload, db)
     
     if user is None:
         raise credentials_exception
@@ -48,8 +77,8 @@ async def get_current_user(
 
 # 获取当前活跃用户的快捷依赖
 async def get_current_active_user(
-    current_user: User = Depends(get_current_user),
-) -> User:
+    current_user: Principal = Depends(get_current_user),
+) -> Principal:
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="用户已被封禁")
     return current_user
@@ -59,21 +88,15 @@ oauth2_scheme_optional = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_STR}/a
 async def get_current_user_or_none(
     token: Optional[str] = Depends(oauth2_scheme_optional),
     db: AsyncSession = Depends(get_db)
-) -> Optional[User]:
+) -> Optional[Principal]:
     if not token:
         return None
     
-    try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        user_id: str = payload.get("sub")
-        if user_id is None:
-            return None
-    except JWTError:
+    payload = _decode_access_token(token)
+    if payload is None:
         return None
 
-    stmt = select(User).where(User.id == int(user_id))
-    result = await db.execute(stmt)
-    user = result.scalars().first()
+    user = await _resolve_principal(payload, db)
     if not user:
         return None
     # Treat inactive or unverified accounts as guests when auth is optional
@@ -81,11 +104,75 @@ async def get_current_user_or_none(
         return None
     return user
 async def get_current_admin(
-    current_user: User = Depends(get_current_active_user),
-) -> User:
+    current_user: Principal = Depends(get_current_active_user),
+) -> Principal:
     if current_user.role != UserRole.ADMIN:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN, 
             detail="权限不足：需要管理员权限"
         )
-    return current_user
\ No newline at end of file
+    return current_user
+
+
+# ==========================================
+# 🚦 限流依赖
+# ==========================================
+_TRUSTED_PROXIES = [ipaddress.ip_network(p, strict=False) for p in settings.RATE_LIMIT_TRUSTED_PROXIES]
+
+
+def _is_trusted_proxy(host: str) -> bool:
+    try:
+        addr = ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return any(addr in network for network in _TRUSTED_PROXIES)
+
+
+def _client_ip(request: Request) -> str:
+    """
+    默认取直连对端地址；只有对端是受信代理时才看 X-Forwarded-For，
+    并从右往左跳过受信代理自己追加的地址，取第一个不受信的 (左边的部分客户端可以随意伪造)
+    """
+    peer = request.client.host if request.client else "unknown"
+    if not _is_trusted_proxy(peer):
+        return peer
+    hops = [
+        hop.strip()
+        for header in request.headers.getlist("x-forwarded-for")
+        for hop in header.split(",")
+        if hop.strip()
+    ]
+    for hop in reversed(hops):
+        if not _is_trusted_proxy(hop):
+            return hop
+    return hops[0] if hops else peer
+
+
+def email_rate_key(scope: str, email: str) -> str:
+    """按邮箱限流的 key：先归一化大小写和空白，改写法不能换出新桶"""
+    return f"{scope}:{email.strip().lower()}"
+
+
+async def enforce_rate_limit(key: str, rule: RateLimitRule, cost: float = 1) -> None:
+    """扣减令牌，不够时直接 429，请求不会走到数据库"""
+    allowed, retry_after = await limiter.hit(key, rule, cost)
+    if not allowed:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="请求过于频繁，请稍后再试",
+            headers={"Retry-After": str(retry_after)},
+        )
+
+
+def rate_limit(cost: float = 1, scope: str = "api"):
+    """
+    按客户端 IP 限流的依赖工厂，cost 越大消耗额度越多，例如：
+        @router.get("/search", dependencies=[Depends(deps.rate_limit(cost=5))])
+    scope="auth" 使用单独的、更严格的登录/注册额度
+    """
+    rule = AUTH_RULE if scope == "auth" else API_RULE
+
+    async def dependency(request: Request) -> None:
+        await enforce_rate_limit(f"{scope}:{_client_ip(request)}", rule, cost)
+
+    return dependency
@@ -1,19 +1,25 @@
-from typing import Any, List
+from typing import Any, Dict, List
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, desc
-from sqlalchemy.orm import selectinload
+from sqlalchemy import select, desc, func, update
 
 from app.api import deps
+from app.core.config import settings
+from app.core.principal import Principal, principal_cache
+from app.core.security import password_hash_stats
 from app.core.database import get_db
-from app.models.user import User
+from app.models.user import User, UserRole
 from app.models.story import StoryNode, NodeStatus
-from app.models.interaction import Notification, NotificationType # 用于发审核通知
+from app.models.interaction import NotificationType # 用于发审核通知
 from app.schemas import story as node_schema
 from app.schemas import user as user_schema
 from app.schemas import common as common_schema
-from app.models.interaction import NotificationType
-from app.utils.notification import send_notification 
+from app.utils.notification import send_notifications
+from app.utils.pubsub import broker
+from app.utils.auth_tokens import revoke_user_sessions
+from app.utils.author_cache import author_cache, build_with_author, get_authors, with_authors
+from app.utils.user_stats import VISIBLE_STATUSES, bump_user_stats
+from app.core.revocation import revoke_user
 router = APIRouter()
 
 # ==========================================
@@ -35,21 +41,152 @@ async def get_pending_nodes(
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=200),
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(deps.get_current_admin), # 🔒 只有管理员能调
+    current_user: Principal = Depends(deps.get_current_admin), # 🔒 只有管理员能调
 ) -> Any:
     """
     专门给管理员用的“审核工作台”，只看 Pending 的
     """
     stmt = (
         select(StoryNode)
-        .options(selectinload(StoryNode.author))
         .where(StoryNode.status == NodeStatus.PENDING)
         .order_by(StoryNode.created_at) # 按时间正序，先处理积压的
         .offset(skip)
         .limit(limit)
     )
     result = await db.execute(stmt)
-    return result.scalars().all()
+    items = await with_authors(db, node_schema.StoryNodeListItem, result.scalars().all())
+    # 不碰 ORM children 懒加载，待审核列表不需要子节点
+    return [node_schema.StoryNodeTreeItem(**item.model_dump(), children=[]) for item in items]
+
+
+# 审核通过或驳回时通知作者
+AUDIT_NOTIFICATIONS = {
+    NodeStatus.PUBLISHED: NotificationType.APPROVED,
+    NodeStatus.REJECTED: NotificationType.REJECTED,
+}
+
+
+async def _apply_audits(
+    db: AsyncSession,
+    admin_id: int,
+    items: List[node_schema.NodeAuditItem],
+) -> List[node_schema.NodeAuditResult]:
+    """
+    在调用方的事务里执行一批审核 (只改会话不提交)，返回与 items 顺序一致的逐条结果：
+    - 一条 SELECT ... FOR UPDATE 取出所有节点的当前状态 (只取需要的列，不加载 ORM 对象)
+    - 按目标状态分组，每种状态一条 UPDATE；首次变为可见的同时补上 published_at
+    - 通过/驳回通知一次 INSERT 写入发件箱；已发布计数按作者合并后增减
+    """
+    node_ids = list(dict.fromkeys(item.node_id for item in items))
+    rows = await db.execute(
+        select(StoryNode.id, StoryNode.author_id, StoryNode.status)
+        .where(StoryNode.id.in_(node_ids))
+        .with_for_update()
+    )
+    current = {row.id: row for row in rows.all()}
+
+    seen = set()
+    results: List[node_schema.NodeAuditResult] = []
+    by_status: Dict[NodeStatus, List[int]] = {}
+    notifications = []
+    published_delta: Dict[int, int] = {}
+    for item in items:
+        row = current.get(item.node_id)
+        if row is None:
+            results.append(node_schema.NodeAuditResult(node_id=item.node_id, ok=False, detail="节点不存在"))
+            continue
+        if item.node_id in seen:
+            results.append(node_schema.NodeAuditResult(node_id=item.node_id, ok=False, detail="重复的节点，已忽略"))
+            continue
+        seen.add(item.node_id)
+        results.append(
+            node_schema.NodeAuditResult(node_id=item.node_id, ok=True, old_status=row.status, status=item.status)
+        )
+        if row.status == item.status:
+            continue
+        by_status.setdefault(item.status, []).append(item.node_id)
+
+        notify_type = AUDIT_NOTIFICATIONS.get(item.status)
+        if notify_type is not None:
+            notifications.append(
+                {"sender_id": admin_id, "receiver_id": row.author_id, "type": notify_type, "node_id": item.node_id}
+            )
+
+        # 已发布计数随可见性变化
+        was_visible = row.status in VISIBLE_STATUSES
+        is_visible = item.status in VISIBLE_STATUSES
+        if was_visible != is_visible:
+            published_delta[row.author_id] = published_delta.get(row.author_id, 0) + (1 if is_visible else -1)
+
+    for status, ids in by_status.items():
+        values = {"status": status}
+        if status in VISIBLE_STATUSES:
+            # 首次发布时间，排行榜按它统计每周发布的分支 (用数据库时间，和点赞的 created_at 同一个时钟)
+            values["published_at"] = func.coalesce(StoryNode.published_at, func.now())
+        await db.execute(
+            update(StoryNode)
+            .where(StoryNode.id.in_(ids))
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+    await send_notifications(db, notifications)
+    for author_id, delta in published_delta.items():
+        await bump_user_stats(db, author_id, published_nodes_count=delta)
+    return results
+
+
+async def _publish_audited(db: AsyncSession, results: List[node_schema.NodeAuditResult]) -> None:
+    """提交后：可见性发生变化的节点推送给订阅该活动的客户端"""
+    changed = {
+        r.node_id: r for r in results
+        if r.ok and r.old_status != r.status
+        and (r.old_status in VISIBLE_STATUSES or r.status in VISIBLE_STATUSES)
+    }
+    if not changed:
+        return
+    rows = await db.execute(
+        select(StoryNode.id, StoryNode.book_id, StoryNode.parent_id).where(StoryNode.id.in_(changed))
+    )
+    for node_id, book_id, parent_id in rows.all():
+        await broker.publish(
+            f"book:{book_id}",
+            "node_audited",
+            {"id": node_id, "parent_id": parent_id, "status": changed[node_id].status.value},
+        )
+
+
+@router.post(
+    "/nodes/audit",
+    response_model=node_schema.BulkNodeAuditResponse,
+    summary="[Admin] 批量审核节点",
+    responses={
+        200: {"description": "操作完成，逐条结果见 results (不存在/重复的节点 ok=false，其余照常处理)"},
+        400: {"model": common_schema.ErrorResponse, "description": "单次提交的节点过多"},
+        401: {"model": common_schema.ErrorResponse, "description": "未认证"},
+        403: {"model": common_schema.ErrorResponse, "description": "权限不足"},
+        422: {"model": common_schema.ValidationErrorResponse, "description": "参数校验失败"},
+    },
+)
+async def bulk_audit_nodes(
+    audit_in: node_schema.BulkNodeAuditRequest,
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(deps.get_current_admin), # 🔒
+) -> Any:
+    """
+    清积压用：一个事务处理整批审核，往返次数与条数无关
+    """
+    if len(audit_in.items) > settings.ADMIN_BULK_AUDIT_MAX_ITEMS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"一次最多审核 {settings.ADMIN_BULK_AUDIT_MAX_ITEMS} 个节点",
+        )
+    results = await _apply_audits(db, current_user.id, audit_in.items)
+    await db.commit()
+    await _publish_audited(db, results)
+    return {
+        "updated": sum(1 for r in results if r.ok and r.old_status != r.status),
+        "results": results,
+    }
 
 
 @router.patch(
@@ -68,43 +205,21 @@ async def audit_node(
     node_id: int,
     audit_in: node_schema.NodeAuditRequest,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(deps.get_current_admin), # 🔒
+    current_user: Principal = Depends(deps.get_current_admin), # 🔒
 ) -> Any:
-    # 1. 查节点
-    node = await db.get(StoryNode, node_id)
-    if not node:
+    # 与批量审核走同一套逻辑
+    items = [node_schema.NodeAuditItem(node_id=node_id, status=audit_in.status)]
+    results = await _apply_audits(db, current_user.id, items)
+    if not results[0].ok:
         raise HTTPException(status_code=404, detail="节点不存在")
-    
-    # 2. 修改状态
-    old_status = node.status
-    node.status = audit_in.status
-    
-    # 3. 发送通知 (可选：审核通过或驳回时通知作者)
-    if old_status != audit_in.status:
-        # 1. 审核通过
-        if audit_in.status == NodeStatus.PUBLISHED:
-            await send_notification(
-                db=db,
-                sender_id=current_user.id, # 管理员ID
-                receiver_id=node.author_id,
-                type=NotificationType.APPROVED,
-                target_id=node.id
-            )
-            
-        # 2. 审核驳回 (Rejected)
-        elif audit_in.status == NodeStatus.REJECTED:
-            await send_notification(
-                db=db,
-                sender_id=current_user.id,
-                receiver_id=node.author_id,
-                type=NotificationType.REJECTED,
-                target_id=node.id
-            )
-    
-    db.add(node)
     await db.commit()
-    await db.refresh(node)
-    return node
+    await _publish_audited(db, results)
+
+    # UPDATE 没有经过 ORM，重新读一次；作者走缓存，不触发 author/children 懒加载
+    node = await db.get(StoryNode, node_id, populate_existing=True)
+    authors = await get_authors(db, [node.author_id])
+    item = build_with_author(node_schema.StoryNodeListItem, node, authors)
+    return node_schema.StoryNodeTreeItem(**item.model_dump(), children=[])
 
 
 # ==========================================
@@ -127,12 +242,16 @@ async def admin_update_user(
     user_id: int,
     user_in: user_schema.UserAdminUpdate,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(deps.get_current_admin), # 🔒
+    current_user: Principal = Depends(deps.get_current_admin), # 🔒
 ) -> Any:
     user = await db.get(User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="用户不存在")
     
+    was_banned = user.role == UserRole.BANNED or not user.is_active
+    role_before = user.role
+    username_before = user.username
+
     # 逐项修改
     if user_in.role is not None:
         user.role = user_in.role
@@ -150,6 +269,36 @@ async def admin_update_user(
         user.avatar = user_in.avatar
 
     db.add(user)
+    # 访问令牌里带着角色/状态声明，变更后要让旧令牌立即失效
+    if user.role == UserRole.BANNED or not user.is_active:
+        if not was_banned:
+            # 封禁：访问令牌和刷新令牌全部作废，强制下线
+            await revoke_user_sessions(db, user.id)
+    elif user.role != role_before or was_banned or user.username != username_before:
+        # 角色变更/解封/改名：只作废访问令牌，客户端刷新后拿到新声明
+        await revoke_user(db, user.id)
     await db.commit()
     await db.refresh(user)
-    return user
\ No newline at end of file
+    principal_cache.invalidate(user.id)
+    author_cache.invalidate(user.id)
+    return user
+
+
+# ==========================================
+# 📈 运行指标 (Metrics)
+# ==========================================
+
+@router.get(
+    "/metrics/password-hash",
+    response_model=Dict[str, float],
+    summary="[Admin] 密码哈希线程池排队/耗时统计",
+    responses={
+        200: {"description": "获取成功"},
+        401: {"model": common_schema.ErrorResponse, "description": "未认证"},
+        403: {"model": common_schema.ErrorResponse, "description": "权限不足"},
+    },
+)
+async def get_password_hash_metrics(
+    current_user: Principal = Depends(deps.get_current_admin), # 🔒
+) -> Any:
+    return password_hash_stats.snapshot()
@@ -1,32 +1,51 @@
 # app/api/v1/auth.py
-from datetime import datetime, timedelta
+import asyncio
 from typing import Optional
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import func, or_, select
+from sqlalchemy import or_, select
 from fastapi.security import OAuth2PasswordRequestForm
+from jose import JWTError, jwt
 from random import randint
 from app.api import deps
+from app.core.principal import Principal, principal_cache
+from app.core.revocation import revoke_token, revoke_user
 from app.core import security
 from app.core.config import settings
 from app.core.database import get_db
 from app.models.user import User, UserRole
-from app.models.story import StoryNode, NodeLike
 from app.schemas import user as user_schema
 from app.schemas import token as token_schema
 from app.schemas.story import MessageResponse # 引入通用的消息响应模型
 from app.schemas import common as common_schema
 from app.utils import get_gravatar_url, send_email_code
-from app.models.auth import EmailVerificationCode, VerificationPurpose
+from app.models.auth import VerificationPurpose
+from app.utils.rate_limit import EMAIL_CODE_RULE, EMAIL_VERIFY_RULE, PASSWORD_RESET_RULE
+from app.utils.verification_code_store import CodeCheck, code_store
+from app.utils.user_stats import get_user_with_stats
+from app.utils.author_cache import author_cache
+from app.utils.auth_tokens import issue_token_pair, revoke_refresh_token, revoke_user_sessions, rotate_refresh_token
 router = APIRouter()
 
 # ==========================================
 # ✉️ 验证模块
 # ==========================================
 
+async def _queue_code_email(email: str, code: str) -> None:
+    """
+    在签发验证码之前放进发件队列：队列满时直接 503，验证码不落库 (内存存储也不写入)，
+    之前签发的验证码也不会被作废，不会出现"库里有码、邮件却发不出去"
+    """
+    try:
+        await send_email_code(email, code)
+    except asyncio.QueueFull:
+        raise HTTPException(status_code=503, detail="邮件服务繁忙，请稍后再试")
+
+
 @router.post(
     "/send-code-for-activation", 
+    dependencies=[Depends(deps.rate_limit(cost=1, scope="auth"))],  # 🚦 限流
     response_model=MessageResponse, # 显式定义返回模型
     summary="发送邮箱验证码",
     operation_id="sendVerificationCode",
@@ -34,6 +53,7 @@ router = APIRouter()
         200: {"description": "验证码发送成功"},
         400: {"model": MessageResponse, "description": "邮箱已注册并激活"},
         422: {"model": common_schema.ValidationErrorResponse, "description": "参数校验失败"},
+        503: {"model": common_schema.ErrorResponse, "description": "邮件队列已满，稍后再试"},
     }
 )
 async def send_verification_code(
@@ -44,6 +64,8 @@ async def send_verification_code(
     把发送邮件的功能单独拆出来，方便前端在注册前调用。
     在写完邮件逻辑之前可以是一个mock的实现，打印到控制台。
     """
+    # 同一邮箱 1 分钟内只能发送一次（内存令牌桶，不再 COUNT 验证码表）
+    await deps.enforce_rate_limit(deps.email_rate_key("email-code", email_data.email), EMAIL_CODE_RULE)
     # 检查邮箱是否已被注册且已验证
     result = await db.execute(select(User).where(User.email == email_data.email))
     user = result.scalars().first()
@@ -52,36 +74,18 @@ async def send_verification_code(
             status_code=400,
             detail="该邮箱已注册并激活，请直接登录",
         )
-    # 检查是否存在一分钟内发送过的验证码
-    recent_code_stmt = (
-        select(func.count())
-        .where(EmailVerificationCode.email == email_data.email)
-        .where(EmailVerificationCode.created_at >= datetime.utcnow() - timedelta(minutes=1))
-    )
-    recent_code_count = (await db.execute(recent_code_stmt)).scalar() or 0
-    if recent_code_count > 0:
-        raise HTTPException(
-            status_code=400,
-            detail="请勿频繁发送验证码，1分钟内只能发送一次",
-        )
-    # 在数据库创建一个新的验证码
-    verification_code = EmailVerificationCode(
-        email=email_data.email,
-        purpose=VerificationPurpose.REGISTER,
-        code=str(randint(100000, 999999)),
-        expires_at=datetime.utcnow() + timedelta(minutes=10)  # 验证码有效期10分钟
-    )
-    db.add(verification_code)
+    # 先把6位随机验证码放进发件队列，再签发（同时作废该邮箱之前未使用的验证码）
+    code = str(randint(100000, 999999))
+    await _queue_code_email(email_data.email, code)
+    await code_store.issue(db, email_data.email, VerificationPurpose.REGISTER, code)
     await db.commit()
     
-    # 发送一个6位的随机整数验证码
-    await send_email_code(email_data.email, verification_code.code)
-    
     return {"detail": "验证码已发送 (测试环境请查看控制台输出或直接使用 114514)"}
 
 
 @router.post(
     "/verify-email-for-activation", 
+    dependencies=[Depends(deps.rate_limit(cost=1, scope="auth"))],  # 🚦 限流
     response_model=MessageResponse, 
     summary="验证邮箱验证码, 用于激活账号",
 )
@@ -91,26 +95,15 @@ async def verify_email(
 ):
     code = verify_in.code
     email = verify_in.email
+    # 限制同一邮箱的尝试次数，防止暴力猜验证码
+    await deps.enforce_rate_limit(deps.email_rate_key("email-verify", email), EMAIL_VERIFY_RULE)
 
-    # 在数据库中查找最新的未使用且未过期的验证码
-    stmt = (
-        select(EmailVerificationCode)
-        .where(EmailVerificationCode.email == email)
-        .where(EmailVerificationCode.purpose == VerificationPurpose.REGISTER)
-        .where(EmailVerificationCode.is_used == False)
-        .where(EmailVerificationCode.expires_at > datetime.utcnow())
-        .order_by(EmailVerificationCode.created_at.desc())
-    )
-    result = await db.execute(stmt)
-    verification_code: Optional[EmailVerificationCode] = result.scalars().first()
-    if not verification_code:
+    # 校验并标记验证码为已使用（每个邮箱只有一个有效码，按索引直接定位）
+    check = await code_store.consume(db, email, VerificationPurpose.REGISTER, code)
+    if check == CodeCheck.MISSING:
         raise HTTPException(status_code=400, detail="验证码无效或已过期")
-    # 检测验证码是否匹配
-    if not security.verify_email_code(code, verification_code.code):
+    if check == CodeCheck.MISMATCH:
         raise HTTPException(status_code=400, detail="验证码错误")
-    # 标记验证码为已使用
-    verification_code.is_used = True
-    db.add(verification_code)
     # 激活对应的用户账号
     user_stmt = select(User).where(User.email == email)
     user_result = await db.execute(user_stmt)
@@ -121,6 +114,7 @@ async def verify_email(
     db.add(user)
 
     await db.commit()
+    principal_cache.invalidate(user.id)
     
     return {"detail": "邮箱验证成功，账号已激活"}
 
@@ -131,6 +125,7 @@ async def verify_email(
 
 @router.post(
     "/register", 
+    dependencies=[Depends(deps.rate_limit(cost=1, scope="auth"))],  # 🚦 限流
     response_model=user_schema.UserCreateResponse, 
     summary="用户注册",
 )
@@ -154,7 +149,7 @@ async def register(
     user = User(
         email=user_in.email.strip().lower(),
         username=user_in.username.strip(),
-        hashed_password=security.get_password_hash(user_in.password),
+        hashed_password=await security.get_password_hash_async(user_in.password),
         role=UserRole.WRITER,
         is_active=True,
         is_verified=False,
@@ -173,6 +168,7 @@ async def register(
 
 @router.post(
     "/login",
+    dependencies=[Depends(deps.rate_limit(cost=1, scope="auth"))],  # 🚦 限流
     response_model=token_schema.Token,
     summary="登录获取Token（邮箱或用户名）",
 )
@@ -205,7 +201,10 @@ async def login(
     user = (await db.execute(stmt)).scalars().first()
 
     # 统一 401：避免泄露“用户是否存在”
-    if not user or not security.verify_password(password, user.hashed_password):
+    verified, new_hash = (False, None)
+    if user:
+        verified, new_hash = await security.verify_and_update_password_async(password, user.hashed_password)
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="邮箱/用户名或密码错误",
@@ -219,13 +218,62 @@ async def login(
     if not user.is_verified:
         raise HTTPException(status_code=400, detail="账号未激活，请先验证邮箱以激活账号")
 
-    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = security.create_access_token(
-        subject=str(user.id),   # ✅ sub 建议用 str
-        expires_delta=access_token_expires,
-    )
+    # 旧哈希参数已过时：借这次登录透明升级
+    if new_hash:
+        user.hashed_password = new_hash
+        db.add(user)
+        await db.commit()
+
+    token = await issue_token_pair(db, user)
+    await db.commit()
+    return token
+
+
+@router.post(
+    "/refresh",
+    dependencies=[Depends(deps.rate_limit(cost=1, scope="auth"))],  # 🚦 限流
+    response_model=token_schema.Token,
+    summary="用刷新令牌换取新的访问令牌",
+    responses={
+        200: {"description": "刷新成功，旧刷新令牌作废"},
+        401: {"model": common_schema.ErrorResponse, "description": "刷新令牌无效或已过期"},
+    },
+)
+async def refresh_access_token(
+    body: token_schema.RefreshTokenRequest,
+    db: AsyncSession = Depends(get_db),
+):
+    token = await rotate_refresh_token(db, body.refresh_token)
+    await db.commit()
+    if token is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="登录已过期，请重新登录",
+        )
+    return token
 
-    return token_schema.Token(access_token=access_token, token_type="bearer")
+
+@router.post(
+    "/logout",
+    response_model=MessageResponse,
+    summary="退出登录",
+)
+async def logout(
+    body: token_schema.RefreshTokenRequest,
+    token: str = Depends(deps.oauth2_scheme_optional),
+    db: AsyncSession = Depends(get_db),
+):
+    """作废刷新令牌；若带了访问令牌，同时把它加入吊销表"""
+    await revoke_refresh_token(db, body.refresh_token)
+    await db.commit()
+    if token:
+        try:
+            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        except JWTError:
+            payload = {}
+        if payload.get("jti"):
+            await revoke_token(payload["jti"], payload["exp"])
+    return {"detail": "已退出登录"}
 
 @router.get(
     "/me", 
@@ -234,43 +282,20 @@ async def login(
     operation_id="getMe",
 )
 async def read_users_me(
-    current_user: User = Depends(deps.get_current_active_user),
+    current_user: Principal = Depends(deps.get_current_active_user),
     db: AsyncSession = Depends(get_db)
 ):
-    # 1. 获取基本用户信息
-    user = current_user
-
-    # 2. 统计数据
+    # 主键取资料 + 统计行，不再现场 COUNT
+    found = await get_user_with_stats(db, current_user.id)
+    if not found:
+        raise HTTPException(status_code=404, detail="用户不存在")
+    user, stats = found
 
-    # 用户发布过的节点总数
-    nodes_count = select(
-        func.count(StoryNode.id)
-        .where(StoryNode.author_id == user.id)
-    )
-    nodes_count = (await db.execute(nodes_count)).scalar() or 0
-    # 用户收到的点赞总数
-    likes_count = select(
-        func.count(NodeLike.user_id)
-        .select_from(NodeLike)
-        .join(StoryNode, NodeLike.node_id == StoryNode.id)
-        .where(StoryNode.author_id == user.id)
-    )
-    likes_count = (await db.execute(likes_count)).scalar() or 0
-    
-    profile = user_schema.UserProfileResponse(
-        id=user.id,
-        email=user.email,
-        username=user.username,
-        bio=user.bio,
-        avatar=user.avatar,
-        role=user.role,
-        is_active=user.is_active,
-        is_verified=user.is_verified,
-        created_at=user.created_at,
-        updated_at=user.updated_at,
-        nodes_count=nodes_count,
-        likes_count=likes_count,
-    )   
+    profile = user_schema.UserProfileResponse.model_validate(user)
+    profile.nodes_count = stats["nodes_count"]
+    profile.published_nodes_count = stats["published_nodes_count"]
+    profile.likes_count = stats["likes_received"]
+    profile.comments_received = stats["comments_received"]
     return profile
 
 
@@ -288,19 +313,30 @@ async def read_users_me(
 )
 async def update_user_me(
     user_update: user_schema.UserUpdate,
-    current_user: User = Depends(deps.get_current_active_user),
+    current_user: Principal = Depends(deps.get_current_active_user),
     db: AsyncSession = Depends(get_db)
 ):
     # 使用 exclude_unset=True 防止把未传的字段改为空
     update_data = user_update.model_dump(exclude_unset=True)
+
+    user = await db.get(User, current_user.id)
+    if not user:
+        raise HTTPException(status_code=404, detail="用户不存在")
+    username_before = user.username
     
     for field, value in update_data.items():
-        setattr(current_user, field, value)
+        setattr(user, field, value)
     
-    db.add(current_user)
+    db.add(user)
+    # 访问令牌里带着用户名声明：改名后作废旧访问令牌，客户端刷新后拿到新名字
+    if user.username != username_before:
+        await revoke_user(db, user.id)
     await db.commit()
-    await db.refresh(current_user)
-    return current_user
+    await db.refresh(user)
+    # 用户名/头像已变，清掉鉴权缓存和作者信息缓存
+    principal_cache.invalidate(user.id)
+    author_cache.invalidate(user.id)
+    return user
 
 # ==========================================
 # 🔐 安全模块
@@ -308,13 +344,19 @@ async def update_user_me(
 
 @router.post(
     "/send-code-for-password-reset", 
+    dependencies=[Depends(deps.rate_limit(cost=1, scope="auth"))],  # 🚦 限流
     response_model=MessageResponse, 
     summary="验证邮箱并发送重置密码验证码",
+    responses={
+        503: {"model": common_schema.ErrorResponse, "description": "邮件队列已满，稍后再试"},
+    },
 )
 async def send_verification_code_for_password_reset(
-    email_data: user_schema.EmailVerify, 
+    email_data: user_schema.UserEmail, 
     db: AsyncSession = Depends(get_db)
 ):
+    # 同一邮箱 1 分钟内只能发送一次
+    await deps.enforce_rate_limit(deps.email_rate_key("email-code", email_data.email), EMAIL_CODE_RULE)
     # 检查邮箱是否已被注册且已验证
     result = await db.execute(select(User).where(User.email == email_data.email))
     user = result.scalars().first()
@@ -323,22 +365,16 @@ async def send_verification_code_for_password_reset(
             status_code=400,
             detail="该邮箱未注册或未激活",
         )
-    # 在数据库创建一个新的验证码
-    verification_code = EmailVerificationCode(
-        email=email_data.email,
-        purpose=VerificationPurpose.PASSWORD_RESET,
-        code=str(randint(100000, 999999)),
-        expires_at=datetime.utcnow() + timedelta(minutes=10)  # 验证码有效期10分钟
-    )
-    db.add(verification_code)
+    # 先把6位随机验证码放进发件队列，再签发（同时作废该邮箱之前未使用的重置码）
+    code = str(randint(100000, 999999))
+    await _queue_code_email(email_data.email, code)
+    await code_store.issue(db, email_data.email, VerificationPurpose.RESET_PASSWORD, code)
     await db.commit()
     
-    # 发送一个6位的随机整数验证码
-    await send_email_code(email_data.email, verification_code.code)
-    
     return {"detail": "验证码已发送 (测试环境请查看控制台输出或直接使用 114514)"}
 @router.post(
     "/reset-password", 
+    dependencies=[Depends(deps.rate_limit(cost=1, scope="auth"))],  # 🚦 限流
     response_model=MessageResponse, 
     summary="重置密码",
 )
@@ -348,30 +384,11 @@ async def reset_password(
 ):
     if not security.is_password_strong(reset_data.new_password):
         raise HTTPException(status_code=400, detail="密码强度不足")
-    # 检查是否存在一分钟内发送过的验证码
-    recent_code_stmt = (
-        select(func.count())
-        .where(EmailVerificationCode.email == reset_data.email)
-        .where(EmailVerificationCode.created_at >= datetime.utcnow() - timedelta(minutes=1))
-    )
-    recent_code_count = (await db.execute(recent_code_stmt)).scalar() or 0
-    if recent_code_count > 0:
-        raise HTTPException(
-            status_code=400,
-            detail="请勿频繁发送验证码，1分钟内只能发送一次",
-        )
-    # 验证验证码
-    result = await db.execute(
-        select(EmailVerificationCode)
-        .where(
-            EmailVerificationCode.email == reset_data.email,
-            EmailVerificationCode.purpose == VerificationPurpose.PASSWORD_RESET,
-            EmailVerificationCode.code == reset_data.code,
-            EmailVerificationCode.expires_at > datetime.utcnow()
-        )
-    )
-    verification_code = result.scalars().first()
-    if not verification_code:
+    # 限制同一邮箱的尝试次数，防止暴力猜验证码
+    await deps.enforce_rate_limit(deps.email_rate_key("password-reset", reset_data.email), PASSWORD_RESET_RULE)
+    # 验证验证码，成功后标记为已使用，防止重复使用
+    check = await code_store.consume(db, reset_data.email, VerificationPurpose.RESET_PASSWORD, reset_data.code)
+    if check != CodeCheck.OK:
         raise HTTPException(
             status_code=400,
             detail="验证码无效或已过期",
@@ -385,8 +402,10 @@ async def reset_password(
             status_code=400,
             detail="用户不存在",
         )
-    user.hashed_password = security.get_password_hash(reset_data.new_password)
+    user.hashed_password = await security.get_password_hash_async(reset_data.new_password)
     db.add(user)
+    # 已登录的设备全部下线
+    await revoke_user_sessions(db, user.id)
     await db.commit()
     
     return {"detail": "密码重置成功"}
\ No newline at end of file
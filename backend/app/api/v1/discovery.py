@@ -3,13 +3,13 @@ from datetime import datetime, timedelta, timezone
 from fastapi import APIRouter, Depends, Query, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, desc, or_
-from sqlalchemy.orm import selectinload
 
 from app.api import deps
 from app.core.database import get_db
 from app.models.story import StoryNode, NodeStatus
 from app.schemas import story as node_schema
 from app.schemas import common as common_schema
+from app.utils.author_cache import with_authors
 
 router = APIRouter()
 
@@ -19,6 +19,7 @@ router = APIRouter()
 
 @router.get(
     "/feed", 
+    dependencies=[Depends(deps.rate_limit(cost=1))],  # 🚦 限流
     response_model=List[node_schema.StoryNodeListItem], 
     summary="最新动态 (瀑布流)",
     operation_id="getLatestFeed",
@@ -38,7 +39,6 @@ async def get_latest_feed(
     """
     stmt = (
         select(StoryNode)
-        .options(selectinload(StoryNode.author))
         .where(StoryNode.status == NodeStatus.PUBLISHED)
         .order_by(desc(StoryNode.created_at))
     )
@@ -47,7 +47,7 @@ async def get_latest_feed(
         stmt = stmt.where(StoryNode.book_id == book_id)
 
     result = await db.execute(stmt.offset(skip).limit(limit))
-    return result.scalars().all()
+    return await with_authors(db, node_schema.StoryNodeListItem, result.scalars().all())
 
 
 # ==========================================
@@ -56,6 +56,7 @@ async def get_latest_feed(
 
 @router.get(
     "/trending", 
+    dependencies=[Depends(deps.rate_limit(cost=2))],  # 🚦 限流
     response_model=List[node_schema.StoryNodeListItem], 
     summary="热门分支榜",
     operation_id="getTrendingNodes",
@@ -78,7 +79,6 @@ async def get_trending_nodes(
 
     stmt = (
         select(StoryNode)
-        .options(selectinload(StoryNode.author))
         .where(StoryNode.status == NodeStatus.PUBLISHED)
         .where(StoryNode.created_at >= start_date)
         .order_by(desc(StoryNode.likes_count))
@@ -92,15 +92,14 @@ async def get_trending_nodes(
     if len(nodes) < 3:
         stmt_fallback = (
             select(StoryNode)
-            .options(selectinload(StoryNode.author))
             .where(StoryNode.status == NodeStatus.PUBLISHED)
             .order_by(desc(StoryNode.likes_count))
             .limit(limit)
         )
         result = await db.execute(stmt_fallback)
-        return result.scalars().all()
-        
-    return nodes
+        nodes = result.scalars().all()
+
+    return await with_authors(db, node_schema.StoryNodeListItem, nodes)
 
 
 # ==========================================
@@ -109,6 +108,7 @@ async def get_trending_nodes(
 
 @router.get(
     "/search", 
+    dependencies=[Depends(deps.rate_limit(cost=5))],  # 🚦 限流
     response_model=List[node_schema.StoryNodeListItem], 
     summary="关键词搜索",
     operation_id="searchNodes",
@@ -128,7 +128,6 @@ async def search_nodes(
     # 🛡️ 过滤特殊字符或空字符串逻辑已经在 Query(min_length=1) 中处理
     stmt = (
         select(StoryNode)
-        .options(selectinload(StoryNode.author))
         .where(StoryNode.status == NodeStatus.PUBLISHED)
         .where(
             or_(
@@ -141,4 +140,4 @@ async def search_nodes(
     )
     
     result = await db.execute(stmt)
-    return result.scalars().all()
\ No newline at end of file
+    return await with_authors(db, node_schema.StoryNodeListItem, result.scalars().all())
\ No newline at end of file
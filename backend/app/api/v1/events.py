@@ -0,0 +1,75 @@
+# app/api/v1/events.py
+from typing import AsyncIterator, List, Optional
+
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+
+from app.api import deps
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.schemas import common as common_schema
+from app.utils.pubsub import broker
+
+router = APIRouter()
+
+
+async def _event_stream(request: Request, channels: List[str]) -> AsyncIterator[str]:
+    # 在生成器里订阅：客户端在响应开始前断开时生成器不会启动，也就不会留下没人清理的订阅
+    with broker.subscribe(channels) as sub:
+        # 首条消息让客户端确认连接建立
+        yield ": connected\n\n"
+        while True:
+            if await request.is_disconnected():
+                break
+            payload = await sub.get(timeout=settings.SSE_HEARTBEAT_SECONDS)
+            if payload is None:
+                # 心跳，防止代理把空闲连接断掉
+                yield ": ping\n\n"
+                continue
+            yield f"data: {payload}\n\n"
+
+
+@router.get(
+    "/stream",
+    summary="实时事件推送 (SSE)",
+    operation_id="streamEvents",
+    response_class=StreamingResponse,
+    responses={
+        200: {"description": "text/event-stream 事件流", "content": {"text/event-stream": {}}},
+        400: {"model": common_schema.ErrorResponse, "description": "未订阅任何频道"},
+        401: {"model": common_schema.ErrorResponse, "description": "Token 无效"},
+        422: {"model": common_schema.ValidationErrorResponse, "description": "book_id 数量超过上限"},
+    },
+)
+async def stream_events(
+    request: Request,
+    book_id: List[int] = Query(
+        default=[],
+        max_length=settings.SSE_MAX_BOOK_CHANNELS,
+        description="订阅这些活动的故事树变化",
+    ),
+    token: Optional[str] = Query(None, description="EventSource 无法带 Header，登录用户用 query 传 token 以接收个人通知"),
+):
+    """
+    - 传 token：推送自己的新通知 (event=notification)
+    - 传 book_id：推送该活动新发布/审核变化的节点 (event=node_created / node_audited)
+    - 不再需要定时轮询通知和故事树
+    """
+    channels = [f"book:{bid}" for bid in dict.fromkeys(book_id)]
+
+    if token:
+        # 只在建立连接时查一次用户，不占用整个长连接期间的 DB 会话
+        async with AsyncSessionLocal() as db:
+            user = await deps.get_current_user_or_none(token=token, db=db)
+        if user is None:
+            raise HTTPException(status_code=401, detail="无法验证凭证")
+        channels.append(f"user:{user.id}")
+
+    if not channels:
+        raise HTTPException(status_code=400, detail="请至少订阅一个频道")
+
+    return StreamingResponse(
+        _event_stream(request, channels),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
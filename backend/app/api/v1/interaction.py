@@ -1,18 +1,21 @@
 from typing import Any, List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Path, Query, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, desc, update
-from sqlalchemy.orm import selectinload
+from sqlalchemy import select, desc
 
 from app.api import deps
+from app.core.principal import Principal
 from app.core.database import get_db
-from app.models.user import User
 from app.models.story import StoryNode, NodeLike
 from app.models.interaction import StoryComment, Notification, NotificationType
 from app.schemas import interaction as interact_schema
 from app.schemas import common as common_schema
 from app.schemas.story import MessageResponse # 复用之前定义的通用消息模型
-from app.utils.notification import send_notification
+from app.utils.author_cache import build_with_author, get_authors, with_authors
+from app.utils.notification import hydrate_notifications, send_notification
+from app.utils.notification_retention import mark_read_in_chunks
+from app.utils.unread_counter import get_unread_count, unread_counter
+from app.utils.user_stats import bump_user_stats
 
 router = APIRouter()
 
@@ -34,7 +37,7 @@ router = APIRouter()
 )
 async def toggle_node_like(
     node_id: int,
-    current_user: User = Depends(deps.get_current_active_user),
+    current_user: Principal = Depends(deps.get_current_active_user),
     db: AsyncSession = Depends(get_db),
 ) -> Any:
     # 1. 检查节点是否存在
@@ -59,11 +62,13 @@ async def toggle_node_like(
         await db.delete(existing_like)
         if node.likes_count > 0:
             node.likes_count -= 1
+        await bump_user_stats(db, node.author_id, likes_received=-1)
         action = "unliked"
     else:
         new_like = NodeLike(user_id=current_user.id, node_id=node_id)
         db.add(new_like)
         node.likes_count += 1
+        await bump_user_stats(db, node.author_id, likes_received=1)
         action = "liked"
         
         # 触发通知
@@ -72,7 +77,7 @@ async def toggle_node_like(
             sender_id=current_user.id,
             receiver_id=node.author_id,
             type=NotificationType.LIKED,
-            target_id=node.id
+            node_id=node.id,
         )
 
     await db.commit()
@@ -106,17 +111,20 @@ async def get_node_comments(
     stmt = (
         select(StoryComment)
         .where(StoryComment.node_id == node_id)
-        .options(selectinload(StoryComment.user)) 
         .order_by(desc(StoryComment.created_at))
         .offset(skip)
         .limit(limit)
     )
     result = await db.execute(stmt)
-    return result.scalars().all()
+    # 评论者信息走作者缓存，不再 selectinload 整行 User
+    return await with_authors(
+        db, interact_schema.CommentResponse, result.scalars().all(), fk="user_id", field="user"
+    )
 
 
 @router.post(
     "/node/{node_id}/comment", 
+    dependencies=[Depends(deps.rate_limit(cost=2))],  # 🚦 限流
     response_model=interact_schema.CommentResponse, 
     summary="发表评论",
     operation_id="createComment",
@@ -130,7 +138,7 @@ async def get_node_comments(
 async def create_node_comment(
     node_id: int,
     comment_in: interact_schema.CommentCreate,
-    current_user: User = Depends(deps.get_current_active_user),
+    current_user: Principal = Depends(deps.get_current_active_user),
     db: AsyncSession = Depends(get_db),
 ) -> Any:
     node = await db.get(StoryNode, node_id)
@@ -147,18 +155,24 @@ async def create_node_comment(
         content=comment_in.content
     )
     db.add(comment)
+    # flush 拿到评论 id，通知里带上评论以便列表展示摘要
+    await db.flush()
+    await bump_user_stats(db, node.author_id, comments_received=1)
     
     await send_notification(
         db=db,
         sender_id=current_user.id,
         receiver_id=node.author_id,
         type=NotificationType.COMMENTED,
-        target_id=node.id
+        node_id=node.id,
+        comment_id=comment.id,
     )
 
     await db.commit()
     await db.refresh(comment)
-    return comment
+    # 鉴权只拿到 Principal，评论者信息走作者缓存，不触碰 comment.user 懒加载
+    authors = await get_authors(db, [comment.user_id])
+    return build_with_author(interact_schema.CommentResponse, comment, authors, fk="user_id", field="user")
 
 
 # ==========================================
@@ -179,41 +193,90 @@ async def create_node_comment(
 async def get_my_notifications(
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=100),
-    current_user: User = Depends(deps.get_current_active_user),
+    current_user: Principal = Depends(deps.get_current_active_user),
     db: AsyncSession = Depends(get_db),
 ) -> Any:
     stmt = (
         select(Notification)
         .where(Notification.user_id == current_user.id)
-        .options(selectinload(Notification.sender)) 
         .order_by(desc(Notification.created_at))
         .offset(skip)
         .limit(limit)
     )
     result = await db.execute(stmt)
-    return result.scalars().all()
+    return await hydrate_notifications(db, result.scalars().all())
+
+
+@router.get(
+    "/notifications/unread-count",
+    response_model=interact_schema.UnreadCountResponse,
+    summary="未读通知数 (角标)",
+    operation_id="getUnreadNotificationCount",
+    responses={
+        200: {"description": "获取成功"},
+        401: {"model": common_schema.ErrorResponse, "description": "未认证"},
+    }
+)
+async def get_my_unread_count(
+    current_user: Principal = Depends(deps.get_current_active_user),
+    db: AsyncSession = Depends(get_db),
+) -> Any:
+    """
+    角标轮询专用：命中进程内缓存时不查数据库
+    """
+    count = await get_unread_count(db, current_user.id)
+    return {"unread_count": count}
 
 
 @router.put(
     "/notifications/read", 
     response_model=MessageResponse, # ⭐ 使用统一消息模型
-    summary="一键已读",
+    summary="一键已读 (可按类型)",
     operation_id="markNotificationsRead",
     responses={
         200: {"description": "全部设为已读"},
         401: {"model": common_schema.ErrorResponse, "description": "未认证"},
+        422: {"model": common_schema.ValidationErrorResponse, "description": "参数校验失败"},
     }
 )
 async def mark_notifications_read(
-    current_user: User = Depends(deps.get_current_active_user),
+    type: Optional[NotificationType] = Query(None, description="[可选] 只把这一类通知设为已读"),
+    current_user: Principal = Depends(deps.get_current_active_user),
     db: AsyncSession = Depends(get_db),
 ) -> Any:
-    stmt = (
-        update(Notification)
-        .where(Notification.user_id == current_user.id)
-        .where(Notification.is_read == False)
-        .values(is_read=True)
-    )
-    await db.execute(stmt)
-    await db.commit()
-    return {"msg": "All marked as read"}
\ No newline at end of file
+    # 分批更新，避免重度用户一条 UPDATE 锁住大段范围
+    updated = await mark_read_in_chunks(db, current_user.id, type=type)
+    if type is None:
+        unread_counter.reset(current_user.id)
+    else:
+        unread_counter.incr(current_user.id, -updated)
+    return {"detail": f"已将 {updated} 条通知设为已读"}
+
+
+@router.put(
+    "/notifications/{notification_id}/read",
+    response_model=MessageResponse,
+    summary="单条通知设为已读",
+    operation_id="markNotificationRead",
+    responses={
+        200: {"description": "设为已读"},
+        401: {"model": common_schema.ErrorResponse, "description": "未认证"},
+        404: {"model": common_schema.ErrorResponse, "description": "通知不存在"},
+        422: {"model": common_schema.ValidationErrorResponse, "description": "参数校验失败"},
+    }
+)
+async def mark_notification_read(
+    notification_id: int = Path(..., ge=1),
+    current_user: Principal = Depends(deps.get_current_active_user),
+    db: AsyncSession = Depends(get_db),
+) -> Any:
+    notif = await db.get(Notification, notification_id)
+    # 🛡️ 别人的通知同样返回 404，避免泄露是否存在
+    if not notif or notif.user_id != current_user.id:
+        raise HTTPException(status_code=404, detail="通知不存在")
+
+    if not notif.is_read:
+        notif.is_read = True
+        await db.commit()
+        unread_counter.incr(current_user.id, -1)
+    return {"detail": "已设为已读"}
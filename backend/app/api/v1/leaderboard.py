@@ -0,0 +1,76 @@
+from typing import Any, Optional
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api import deps
+from app.core.database import get_db
+from app.core.principal import Principal
+from app.schemas import common as common_schema
+from app.schemas import leaderboard as leaderboard_schema
+from app.utils.author_cache import get_authors
+from app.utils.leaderboard import leaderboard
+
+router = APIRouter()
+
+# ==========================================
+# 🏆 作者排行榜 (Leaderboard)
+# ==========================================
+
+@router.get(
+    "",
+    dependencies=[Depends(deps.rate_limit(cost=1))],  # 🚦 限流
+    response_model=leaderboard_schema.LeaderboardResponse,
+    summary="作者排行榜",
+    operation_id="getLeaderboard",
+    responses={
+        200: {"description": "获取成功"},
+        422: {"model": common_schema.ValidationErrorResponse, "description": "参数校验失败"},
+    },
+)
+async def get_leaderboard(
+    metric: leaderboard_schema.LeaderboardMetric = Query("likes", description="likes 收到的点赞 / branches 发布的分支"),
+    period: leaderboard_schema.LeaderboardPeriod = Query("all", description="all 总榜 / week 本周 (周一 0 点 UTC 起)"),
+    book_id: Optional[int] = Query(None, ge=1, description="[可选] 只看某个活动的榜单"),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    user_id: Optional[int] = Query(None, ge=1, description="[可选] 查询该用户的名次，默认为当前登录用户"),
+    current_user: Optional[Principal] = Depends(deps.get_current_user_or_none),
+    db: AsyncSession = Depends(get_db),
+) -> Any:
+    """
+    榜单由后台任务预先算好放在内存里，这里只做切片和二分查找，不扫描点赞/节点表。
+    数据有最多 LEADERBOARD_REFRESH_SECONDS 的延迟。
+    """
+    await leaderboard.ensure_ready(db)
+    board = leaderboard.get(metric, period, book_id)
+    top = board.top(limit, offset=skip)
+
+    # 上榜作者的名字和头像走作者缓存，未命中的一次 IN 查询补全
+    authors = await get_authors(db, (uid for _, uid, _ in top))
+
+    entries = [
+        leaderboard_schema.LeaderboardEntry(rank=rank, score=score, user=authors[uid])
+        for rank, uid, score in top
+        if uid in authors
+    ]
+
+    me = None
+    target_id = user_id or (current_user.id if current_user else None)
+    if target_id is not None:
+        position = board.rank(target_id)
+        me = leaderboard_schema.LeaderboardPosition(
+            user_id=target_id,
+            rank=position[0] if position else None,
+            score=position[1] if position else 0,
+        )
+
+    return leaderboard_schema.LeaderboardResponse(
+        metric=metric,
+        period=period,
+        book_id=book_id,
+        total=len(board),
+        updated_at=leaderboard.updated_at,
+        entries=entries,
+        me=me,
+    )
@@ -5,21 +5,26 @@ from datetime import datetime
 from typing import List, Optional
 
 from fastapi import APIRouter, Depends, HTTPException, Path, Query
-from sqlalchemy import desc, select, text, or_
+from sqlalchemy import desc, func, select, text, or_
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload, defer, raiseload
+from sqlalchemy.orm import defer, raiseload
 from sqlalchemy.sql import true
 
 from app.api import deps
+from app.core.principal import Principal
 from app.core.database import get_db
-from app.models.story import NodeStatus, StoryNode
+from app.models.story import NodeLike, NodeStatus, StoryNode
 from app.models.story_book import StoryBook
-from app.models.user import User, UserRole
+from app.models.user import UserRole
 from app.schemas import story as node_schema
 from app.schemas import story_book as book_schema
 from app.schemas import common as common_schema
-from app.models.interaction import NotificationType
+from app.models.interaction import NotificationType, StoryComment
+from app.utils.author_cache import build_with_author, get_authors, with_authors
+from app.utils.image_pipeline import get_variants
 from app.utils.notification import send_notification
+from app.utils.pubsub import broker
+from app.utils.user_stats import VISIBLE_STATUSES, bump_user_stats
 
 router = APIRouter()
 
@@ -27,16 +32,19 @@ router = APIRouter()
 # ==========================================
 # 🛠 内部辅助函数
 # ==========================================
-def build_memory_tree(nodes: List[StoryNode]) -> List[node_schema.StoryNodeTreeItem]:
+def build_memory_tree(
+    nodes: List[StoryNode],
+    authors: dict[int, node_schema.AuthorInfo],
+) -> List[node_schema.StoryNodeTreeItem]:
     """
-    把一堆节点（已预加载 author/children）组装成内存树。
-    关键点：先用 StoryNodeListItem 做一次 model_validate，避免 Pydantic 触碰 children 懒加载。
+    把一堆节点组装成内存树，作者信息由调用方通过 get_authors 批量取好。
+    关键点：先按 StoryNodeListItem 的字段取值，避免 Pydantic 触碰 author/children 懒加载。
     """
     node_map: dict[int, node_schema.StoryNodeTreeItem] = {}
     roots: List[node_schema.StoryNodeTreeItem] = []
 
     for n in nodes:
-        base = node_schema.StoryNodeListItem.model_validate(n).model_dump()
+        base = build_with_author(node_schema.StoryNodeListItem, n, authors).model_dump()
         node_map[n.id] = node_schema.StoryNodeTreeItem(**base, children=[])
 
     for n in nodes:
@@ -51,6 +59,17 @@ def build_memory_tree(nodes: List[StoryNode]) -> List[node_schema.StoryNodeTreeI
     return roots
 
 
+async def build_book_responses(db: AsyncSession, books: List[StoryBook]) -> List[book_schema.StoryBookResponse]:
+    """活动列表附带封面缩略图：一次 IN 查询取全部封面的衍生图"""
+    variants = await get_variants(db, (b.cover_image for b in books))
+    return [
+        book_schema.StoryBookResponse.model_validate(b).model_copy(
+            update={"cover_variants": variants.get(b.cover_image, [])}
+        )
+        for b in books
+    ]
+
+
 # ==========================================
 # 📖 StoryBook (故事集/活动) 模块
 # ==========================================
@@ -62,7 +81,7 @@ def build_memory_tree(nodes: List[StoryNode]) -> List[node_schema.StoryNodeTreeI
 )
 async def create_book(
     book_in: book_schema.StoryBookCreate,
-    current_user: User = Depends(deps.get_current_admin),
+    current_user: Principal = Depends(deps.get_current_admin),
     db: AsyncSession = Depends(get_db),
 ):
     book = StoryBook(
@@ -79,7 +98,7 @@ async def create_book(
     except Exception as e:
         await db.rollback()
         raise HTTPException(status_code=500, detail="创建活动失败") from e
-    return book
+    return (await build_book_responses(db, [book]))[0]
 @router.patch(
     "/books/{book_id}",
     response_model=book_schema.StoryBookResponse,
@@ -87,7 +106,7 @@ async def create_book(
 async def update_book(
     book_id: int = Path(..., ge=1),
     book_in: book_schema.StoryBookUpdate = Depends(),
-    current_user: User = Depends(deps.get_current_admin),
+    current_user: Principal = Depends(deps.get_current_admin),
     db: AsyncSession = Depends(get_db),
 ):
     book = await db.get(StoryBook, book_id)
@@ -103,10 +122,11 @@ async def update_book(
     except Exception as e:
         await db.rollback()
         raise HTTPException(status_code=500, detail="更新活动失败") from e
-    return book
+    return (await build_book_responses(db, [book]))[0]
 
 @router.get(
     "/books",
+    dependencies=[Depends(deps.rate_limit(cost=1))],  # 🚦 限流
     response_model=List[book_schema.StoryBookResponse],
     summary="获取活动列表",
     operation_id="getBooks",
@@ -128,7 +148,7 @@ async def read_books(
         .limit(limit)
     )
     result = await db.execute(stmt)
-    return result.scalars().all()
+    return await build_book_responses(db, result.scalars().all())
 
 
 # ==========================================
@@ -136,13 +156,14 @@ async def read_books(
 # ==========================================
 @router.get(
     "/tree",
+    dependencies=[Depends(deps.rate_limit(cost=3))],  # 🚦 限流
     response_model=List[node_schema.StoryNodeTreeItem],
     summary="获取故事树结构",
     operation_id="getStoryTree",
 )
 async def get_story_tree(
     book_id: int = Query(..., ge=1),
-    current_user: Optional[User] = Depends(deps.get_current_user_or_none),
+    current_user: Optional[Principal] = Depends(deps.get_current_user_or_none),
     db: AsyncSession = Depends(get_db),
 ):
     """
@@ -153,14 +174,14 @@ async def get_story_tree(
 
     技术点：
     - defer(content) 避免树接口把正文大字段从 DB 拉出来
-    - selectinload(author/children) 预加载，避免 MissingGreenlet
+    - 只取 author_id，作者信息走 get_authors 缓存，不再每次 selectinload 整行 User
     - build_memory_tree 手动组装，避免 Pydantic 触碰 children 懒加载
     """
     stmt = (
         select(StoryNode)
         .options(
-            # 你会在 schema 里返回 author，所以要预加载，避免 MissingGreenlet
-            selectinload(StoryNode.author),
+            # 作者信息由 get_authors 补全，不允许碰 ORM author
+            raiseload(StoryNode.author),
 
             # 树接口不需要正文：减少数据搬运
             defer(StoryNode.content),
@@ -187,11 +208,13 @@ async def get_story_tree(
         stmt = stmt.where(StoryNode.status.in_([NodeStatus.PUBLISHED, NodeStatus.LOCKED]))
 
     nodes = (await db.execute(stmt)).scalars().all()
-    return build_memory_tree(nodes)
+    authors = await get_authors(db, (n.author_id for n in nodes))
+    return build_memory_tree(nodes, authors)
 
 
 @router.get(
     "/node/{node_id}/path",
+    dependencies=[Depends(deps.rate_limit(cost=2))],  # 🚦 限流
     response_model=List[node_schema.StoryNodeRead],
     summary="获取阅读路径 (溯源)",
     operation_id="getNodePath",
@@ -202,7 +225,7 @@ async def get_story_tree(
 )
 async def get_node_reading_path(
     node_id: int = Path(..., ge=1),
-    current_user: Optional[User] = Depends(deps.get_current_user_or_none),
+    current_user: Optional[Principal] = Depends(deps.get_current_user_or_none),
     db: AsyncSession = Depends(get_db),
 ):
     """
@@ -249,18 +272,13 @@ async def get_node_reading_path(
     if not rows:
         raise HTTPException(status_code=404, detail="路径不存在或无权访问")
 
-    author_ids = {r["author_id"] for r in rows if r.get("author_id") is not None}
-    users_map: dict[int, User] = {}
-    if author_ids:
-        user_stmt = select(User).where(User.id.in_(author_ids))
-        user_res = await db.execute(user_stmt)
-        users_map = {u.id: u for u in user_res.scalars().all()}
+    authors = await get_authors(db, (r["author_id"] for r in rows))
 
     # ✅ 用 schema 再过一遍，避免额外字段/缺字段导致隐蔽问题
     final_list: List[node_schema.StoryNodeRead] = []
     for r in rows:
         item = dict(r)
-        item["author"] = users_map.get(item["author_id"])
+        item["author"] = authors.get(item["author_id"])
         final_list.append(node_schema.StoryNodeRead.model_validate(item))
 
     return final_list
@@ -268,6 +286,7 @@ async def get_node_reading_path(
 
 @router.post(
     "/node",
+    dependencies=[Depends(deps.rate_limit(cost=2))],  # 🚦 限流
     response_model=node_schema.StoryNodeListItem,
     summary="提交续写内容",
     operation_id="createNode",
@@ -281,7 +300,7 @@ async def get_node_reading_path(
 )
 async def create_story_node(
     node_in: node_schema.StoryNodeCreate,
-    current_user: User = Depends(deps.get_current_active_user),
+    current_user: Principal = Depends(deps.get_current_active_user),
     db: AsyncSession = Depends(get_db),
 ):
     is_admin = current_user.role == UserRole.ADMIN
@@ -321,8 +340,31 @@ async def create_story_node(
         author_id=current_user.id,
         depth=new_depth,
         status=initial_status,
+        published_at=func.now() if initial_status == NodeStatus.PUBLISHED else None,
     )
     db.add(new_node)
+    await bump_user_stats(
+        db,
+        current_user.id,
+        nodes_count=1,
+        published_nodes_count=1 if initial_status in VISIBLE_STATUSES else 0,
+    )
+
+    # 4) 通知父节点作者：写入发件箱，和节点在同一事务里提交，不再额外 commit
+    if parent_node:
+        # 已发布的新分支：flush 拿到 id，通知直接指向它，列表里能展示分支名；
+        # 待审核的分支别人打不开，通知先指向父节点
+        target_id = parent_node.id
+        if initial_status in VISIBLE_STATUSES:
+            await db.flush()
+            target_id = new_node.id
+        await send_notification(
+            db=db,
+            sender_id=current_user.id,
+            receiver_id=parent_node.author_id,
+            type=NotificationType.BRANCHED,
+            node_id=target_id,
+        )
 
     try:
         await db.commit()
@@ -331,34 +373,24 @@ async def create_story_node(
         await db.rollback()
         raise HTTPException(status_code=500, detail="创建节点失败") from e
 
-    # ✅ 确保 author 预加载，避免 response_model 触发懒加载 MissingGreenlet
-    new_node = (
-        await db.execute(
-            select(StoryNode)
-            .options(selectinload(StoryNode.author))
-            .where(StoryNode.id == new_node.id)
-        )
-    ).scalars().first()
+    # 作者就是当前用户，信息走缓存，不再为了 author 重新 select 一次
+    authors = await get_authors(db, [new_node.author_id])
+    item = build_with_author(node_schema.StoryNodeListItem, new_node, authors)
 
-    # 4) 通知父节点作者（通知失败不影响主流程）
-    if parent_node:
-        try:
-            await send_notification(
-                db=db,
-                sender_id=current_user.id,
-                receiver_id=parent_node.author_id,
-                type=NotificationType.BRANCHED,
-                target_id=parent_node.id,
-            )
-            await db.commit()
-        except Exception:
-            await db.rollback()
+    # 5) 已发布的节点立即推送给订阅该活动的客户端（待审核节点等审核后再推）
+    if new_node.status == NodeStatus.PUBLISHED:
+        await broker.publish(
+            f"book:{new_node.book_id}",
+            "node_created",
+            item.model_dump(mode="json"),
+        )
 
-    return new_node
+    return item
 
 
 @router.get(
     "/node/{node_id}",
+    dependencies=[Depends(deps.rate_limit(cost=1))],  # 🚦 限流
     response_model=node_schema.StoryNodeRead,
     summary="查看节点正文详情",
     operation_id="getNodeDetail",
@@ -370,15 +402,10 @@ async def create_story_node(
 )
 async def get_node_detail(
     node_id: int = Path(..., ge=1),
-    current_user: Optional[User] = Depends(deps.get_current_user_or_none),
+    current_user: Optional[Principal] = Depends(deps.get_current_user_or_none),
     db: AsyncSession = Depends(get_db),
 ):
-    stmt = (
-        select(StoryNode)
-        .options(selectinload(StoryNode.author))
-        .where(StoryNode.id == node_id)
-    )
-    node = (await db.execute(stmt)).scalars().first()
+    node = await db.get(StoryNode, node_id)
     if not node:
         raise HTTPException(status_code=404, detail="节点不存在")
 
@@ -388,7 +415,8 @@ async def get_node_detail(
     if node.status not in [NodeStatus.PUBLISHED, NodeStatus.LOCKED] and not (is_admin or is_author):
         raise HTTPException(status_code=403, detail="该内容正在审核中")
 
-    return node
+    authors = await get_authors(db, [node.author_id])
+    return build_with_author(node_schema.StoryNodeRead, node, authors)
 
 
 @router.get(
@@ -402,7 +430,7 @@ async def read_user_nodes(
     status: Optional[NodeStatus] = Query(None),
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=200),
-    current_user: Optional[User] = Depends(deps.get_current_user_or_none),
+    current_user: Optional[Principal] = Depends(deps.get_current_user_or_none),
     db: AsyncSession = Depends(get_db),
 ):
     is_admin = bool(current_user and current_user.role == UserRole.ADMIN)
@@ -410,7 +438,6 @@ async def read_user_nodes(
 
     stmt = (
         select(StoryNode)
-        .options(selectinload(StoryNode.author))
         .where(StoryNode.author_id == user_id)
         .order_by(desc(StoryNode.created_at))
         .offset(skip)
@@ -422,7 +449,8 @@ async def read_user_nodes(
     elif status:
         stmt = stmt.where(StoryNode.status == status)
 
-    return (await db.execute(stmt)).scalars().all()
+    nodes = (await db.execute(stmt)).scalars().all()
+    return await with_authors(db, node_schema.StoryNodeListItem, nodes)
 
 
 @router.patch(
@@ -434,7 +462,7 @@ async def read_user_nodes(
 async def update_story_node(
     node_id: int = Path(..., ge=1),
     node_in: node_schema.NodeUpdate = Depends(),  # ✅ 不要 None；让 FastAPI 负责 body 校验
-    current_user: User = Depends(deps.get_current_active_user),
+    current_user: Principal = Depends(deps.get_current_active_user),
     db: AsyncSession = Depends(get_db),
 ):
     node = await db.get(StoryNode, node_id)
@@ -454,16 +482,10 @@ async def update_story_node(
         await db.rollback()
         raise HTTPException(status_code=500, detail="更新失败") from e
 
-    # ✅ 返回 StoryNodeRead 需要 author，重新 select 一次最稳（避免 refresh 不加载 relationship）
-    node = (
-        await db.execute(
-            select(StoryNode)
-            .options(selectinload(StoryNode.author))
-            .where(StoryNode.id == node_id)
-        )
-    ).scalars().first()
-
-    return node
+    # commit 后属性已过期，refresh 一次列；作者信息走缓存
+    await db.refresh(node)
+    authors = await get_authors(db, [node.author_id])
+    return build_with_author(node_schema.StoryNodeRead, node, authors)
 
 
 @router.delete(
@@ -474,7 +496,7 @@ async def update_story_node(
 )
 async def delete_story_node(
     node_id: int = Path(..., ge=1),
-    current_user: User = Depends(deps.get_current_active_user),
+    current_user: Principal = Depends(deps.get_current_active_user),
     db: AsyncSession = Depends(get_db),
 ):
     node = await db.get(StoryNode, node_id)
@@ -489,8 +511,20 @@ async def delete_story_node(
     if (await db.execute(child_stmt)).scalar() is not None:
         raise HTTPException(status_code=400, detail="已有后续故事，无法删除")
 
+    # 节点连同其点赞、评论一起删除，作者统计同步扣减
+    likes = (await db.execute(select(func.count()).select_from(NodeLike).where(NodeLike.node_id == node_id))).scalar() or 0
+    comments = (await db.execute(select(func.count(StoryComment.id)).where(StoryComment.node_id == node_id))).scalar() or 0
+
     try:
         await db.delete(node)
+        await bump_user_stats(
+            db,
+            node.author_id,
+            nodes_count=-1,
+            published_nodes_count=-1 if node.status in VISIBLE_STATUSES else 0,
+            likes_received=-likes,
+            comments_received=-comments,
+        )
         await db.commit()
     except Exception as e:
         await db.rollback()
@@ -1,32 +1,51 @@
-import shutil
-import os
-import uuid
-from typing import Any, Optional
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, status
-from pydantic import BaseModel
+import logging
+from typing import Any, List
+from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Query, Request, status
+from fastapi.responses import RedirectResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.api import deps
-from app.models.user import User
+from app.core.config import settings
+from app.core.database import get_db
+from app.core.principal import Principal
 from app.schemas import common as common_schema
+from app.schemas.upload import (
+    DirectUploadCompleteRequest,
+    DirectUploadRequest,
+    DirectUploadTicketResponse,
+    ImageVariantInfo,
+    PresignedUploadInfo,
+    UploadResponse,
+)
+from app.utils.image_pipeline import get_variants, image_pipeline, upload_url
+from app.utils.image_probe import ImageTooLarge, InvalidImage
+from app.utils.storage import InvalidUploadToken, storage
+from app.utils.upload_store import (
+    EmptyUpload,
+    UploadMismatch,
+    UploadTooLarge,
+    complete_direct_upload,
+    inspect_image,
+    prepare_direct_upload,
+    receive_direct_upload,
+    save_upload,
+)
 
-router = APIRouter()
+logger = logging.getLogger(__name__)
 
-# --- 1. 定义响应模型 (建议放入 schemas/upload.py) ---
-class UploadResponse(BaseModel):
-    url: str
+router = APIRouter()
 
-# --- 2. 配置 ---
-UPLOAD_DIR = "static/uploads"
-# 启动时确保目录存在
-os.makedirs(UPLOAD_DIR, exist_ok=True)
+# 存储后端 (local / s3) 及上传目录在 app.utils.storage 里按配置初始化
+MAX_MB = settings.UPLOAD_MAX_BYTES // (1024 * 1024)
 
 @router.post(
     "/", 
+    dependencies=[Depends(deps.rate_limit(cost=10))],  # 🚦 限流
     response_model=UploadResponse, # ⭐ 消除前端的 any
     summary="上传图片 (返回URL)",
     operation_id="uploadImage",
     responses={
         200: {"description": "上传成功"},
-        400: {"model": common_schema.ErrorResponse, "description": "文件类型/大小不合法"},
+        400: {"model": common_schema.ErrorResponse, "description": "文件类型/大小/尺寸不合法"},
         401: {"model": common_schema.ErrorResponse, "description": "未认证"},
         422: {"model": common_schema.ValidationErrorResponse, "description": "参数校验失败"},
         500: {"model": common_schema.ErrorResponse, "description": "服务器内部错误"}
@@ -35,7 +54,8 @@ os.makedirs(UPLOAD_DIR, exist_ok=True)
 async def upload_image(
     file: UploadFile = File(...),
     # 🛡️ 增加权限检查：只有登录用户可以上传
-    current_user: User = Depends(deps.get_current_active_user)
+    current_user: Principal = Depends(deps.get_current_active_user),
+    db: AsyncSession = Depends(get_db),
 ) -> Any:
     # 1. 🛡️ 防御性检查：检查文件名是否存在
     if not file.filename:
@@ -45,37 +65,32 @@ async def upload_image(
     if not file.content_type or not file.content_type.startswith("image/"):
         raise HTTPException(status_code=400, detail="只能上传图片文件 (jpg, png, gif等)")
     
-    # 3. 🛡️ 验证文件大小 (例如限制为 5MB)
-    MAX_SIZE = 5 * 1024 * 1024 # 5MB
-    # 注意：某些环境下 file.size 可能为 None，需要谨慎处理
-    if file.size and file.size > MAX_SIZE:
-        raise HTTPException(status_code=400, detail="文件过大，不能超过 5MB")
-
-    # 4. 🛡️ 安全地生成文件名
-    file_parts = file.filename.rsplit(".", 1)
-    file_ext = file_parts[-1].lower() if len(file_parts) > 1 else "jpg"
-    
-    # 限制后缀名，防止上传恶意脚本 (如 .php, .sh)
-    ALLOWED_EXTENSIONS = {"jpg", "jpeg", "png", "gif", "webp"}
-    if file_ext not in ALLOWED_EXTENSIONS:
-        raise HTTPException(status_code=400, detail="不支持的文件后缀")
-
-    unique_filename = f"{uuid.uuid4()}.{file_ext}"
-    file_path = os.path.join(UPLOAD_DIR, unique_filename)
-
-    # 5. 读取首字节，避免空文件导致 500
-    await file.seek(0)
-    first_chunk = await file.read(1)
-    if not first_chunk:
-        raise HTTPException(status_code=400, detail="文件内容为空")
-    await file.seek(0)
-    
-    # 6. 保存文件
+    # 3. 🛡️ 读文件头识别真实格式和宽高 (不解码像素)：content_type / 后缀都由客户端决定，不可信；
+    #    声明尺寸超限的 (解压炸弹) 在这里就拒绝，后缀也按识别结果生成，防止上传恶意脚本 (如 .php, .sh)
     try:
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-    except Exception as e:
-        print(f"Upload Error: {e}")
+        image = await inspect_image(file)
+    except InvalidImage:
+        await file.close()
+        raise HTTPException(status_code=400, detail="不支持的图片格式 (仅支持 jpg, png, gif, webp)")
+    except ImageTooLarge as e:
+        await file.close()
+        raise HTTPException(
+            status_code=400,
+            detail=f"图片尺寸过大 ({e.info.width}x{e.info.height})，"
+                   f"边长不能超过 {settings.IMAGE_MAX_SIDE}，总像素不能超过 {settings.IMAGE_MAX_PIXELS}",
+        )
+
+    # 4. 保存文件：线程池里分块计算哈希并校验大小 (file.size 可能为 None，不能只信它)，
+    #    已有相同内容时直接复用，否则写入存储后端 (本地为临时文件 + 原子改名)
+    try:
+        stored = await save_upload(db, file, image.extension)
+        await db.commit()
+    except UploadTooLarge:
+        raise HTTPException(status_code=400, detail=f"文件过大，不能超过 {MAX_MB}MB")
+    except EmptyUpload:
+        raise HTTPException(status_code=400, detail="文件内容为空")
+    except OSError:
+        logger.exception("保存上传文件失败")
         raise HTTPException(
             status_code=500, 
             detail="服务器文件保存失败，请稍后重试"
@@ -83,5 +98,161 @@ async def upload_image(
     finally:
         await file.close()
         
-    # 7. 返回 URL (建议使用相对路径或从配置中读取域名)
-    return {"url": f"/static/uploads/{unique_filename}"}
\ No newline at end of file
+    # 5. 新内容的缩略图在后台进程池里生成，不阻塞本次请求 (重复内容已经有了)
+    if stored.created:
+        image_pipeline.schedule(stored.filename)
+
+    # 6. 返回 URL (建议使用相对路径或从配置中读取域名)
+    return {"url": upload_url(stored.filename)}
+
+
+# ==========================================
+# 📤 直传：文件不经过 API 进程，直接 PUT 到存储
+# ==========================================
+@router.post(
+    "/presign",
+    dependencies=[Depends(deps.rate_limit(cost=10))],  # 🚦 限流
+    response_model=DirectUploadTicketResponse,
+    summary="申请直传地址",
+    operation_id="presignUpload",
+    responses={
+        200: {"description": "upload 为空时已有相同内容，直接使用 url；否则按 upload 的地址和请求头 PUT 文件后调用 /uploads/complete"},
+        400: {"model": common_schema.ErrorResponse, "description": "文件类型/大小不合法"},
+        401: {"model": common_schema.ErrorResponse, "description": "未认证"},
+        422: {"model": common_schema.ValidationErrorResponse, "description": "参数校验失败"},
+    }
+)
+async def presign_upload(
+    body: DirectUploadRequest,
+    request: Request,
+    current_user: Principal = Depends(deps.get_current_active_user),
+    db: AsyncSession = Depends(get_db),
+) -> Any:
+    try:
+        ticket = await prepare_direct_upload(db, current_user.id, body.sha256, body.size, body.content_type)
+        await db.commit()
+    except UploadTooLarge:
+        raise HTTPException(status_code=400, detail=f"文件过大，不能超过 {MAX_MB}MB")
+    except EmptyUpload:
+        raise HTTPException(status_code=400, detail="文件内容为空")
+    except InvalidImage:
+        raise HTTPException(status_code=400, detail="不支持的图片格式 (仅支持 jpg, png, gif, webp)")
+
+    upload = None
+    if ticket.upload is not None:
+        upload = PresignedUploadInfo.model_validate(ticket.upload)
+        # local 后端签的是本服务的相对地址，补全成绝对地址，前端可以直接 PUT
+        if upload.url.startswith("/"):
+            upload.url = str(request.base_url).rstrip("/") + upload.url
+    return {
+        "filename": ticket.filename,
+        "url": upload_url(ticket.filename),
+        "upload": upload,
+        "complete_token": ticket.complete_token,
+    }
+
+
+@router.put(
+    "/direct",
+    status_code=status.HTTP_204_NO_CONTENT,
+    summary="直传文件 (local 存储后端)",
+    operation_id="putDirectUpload",
+    responses={
+        204: {"description": "已写入，接着调用 /uploads/complete"},
+        400: {"model": common_schema.ErrorResponse, "description": "内容与申请时声明的不一致"},
+        403: {"model": common_schema.ErrorResponse, "description": "令牌无效或已过期"},
+    }
+)
+async def put_direct_upload(
+    request: Request,
+    token: str = Query(..., description="/uploads/presign 签发的令牌"),
+) -> None:
+    # 令牌本身就是授权 (和 S3 预签名 URL 一样)，不再要求 Authorization 头
+    try:
+        await receive_direct_upload(token, request.stream())
+    except InvalidUploadToken:
+        raise HTTPException(status_code=403, detail="上传地址无效或已过期")
+    except (UploadTooLarge, UploadMismatch):
+        raise HTTPException(status_code=400, detail="文件内容与申请时声明的大小/哈希不一致")
+
+
+@router.post(
+    "/complete",
+    dependencies=[Depends(deps.rate_limit(cost=10))],  # 🚦 限流
+    response_model=UploadResponse,
+    summary="直传完成",
+    operation_id="completeUpload",
+    responses={
+        200: {"description": "校验通过，返回图片 URL"},
+        400: {"model": common_schema.ErrorResponse, "description": "文件不存在或不合法 (不合法的文件会被删除)"},
+        401: {"model": common_schema.ErrorResponse, "description": "未认证"},
+        403: {"model": common_schema.ErrorResponse, "description": "完成凭证无效、已过期或不属于当前用户"},
+        422: {"model": common_schema.ValidationErrorResponse, "description": "参数校验失败"},
+    }
+)
+async def complete_upload(
+    body: DirectUploadCompleteRequest,
+    current_user: Principal = Depends(deps.get_current_active_user),
+    db: AsyncSession = Depends(get_db),
+) -> Any:
+    # 凭 /presign 签发的完成凭证读回文件头，按和中转上传一样的规则校验 (大小 / 真实格式 / 像素上限)
+    try:
+        stored = await complete_direct_upload(db, current_user.id, body.complete_token)
+        await db.commit()
+    except InvalidUploadToken:
+        raise HTTPException(status_code=403, detail="完成凭证无效或已过期，请重新申请上传")
+    except (UploadMismatch, ValueError):
+        raise HTTPException(status_code=400, detail="文件尚未上传或与申请时声明的不一致")
+    except UploadTooLarge:
+        raise HTTPException(status_code=400, detail=f"文件过大，不能超过 {MAX_MB}MB")
+    except InvalidImage:
+        raise HTTPException(status_code=400, detail="不支持的图片格式 (仅支持 jpg, png, gif, webp)")
+    except ImageTooLarge as e:
+        raise HTTPException(
+            status_code=400,
+            detail=f"图片尺寸过大 ({e.info.width}x{e.info.height})，"
+                   f"边长不能超过 {settings.IMAGE_MAX_SIDE}，总像素不能超过 {settings.IMAGE_MAX_PIXELS}",
+        )
+
+    if stored.created:
+        image_pipeline.schedule(stored.filename)
+    return {"url": upload_url(stored.filename)}
+
+
+@router.get(
+    "/files/{key:path}",
+    summary="下载上传的文件 (跳转到存储的预签名地址)",
+    operation_id="getUploadedFile",
+    responses={
+        307: {"description": "跳转到有时效的下载地址"},
+    },
+    include_in_schema=False,
+)
+async def read_uploaded_file(key: str) -> Any:
+    # s3 桶不公开读时，图片 URL 指向这里；字节由存储直接返回，不经过 API 进程。
+    # 跳转本身可以缓存到预签名过期前，浏览器不必每次都回源到 API
+    ttl = settings.UPLOAD_PRESIGN_EXPIRES_SECONDS
+    location = storage.presign_download(key, ttl)
+    return RedirectResponse(
+        location,
+        status_code=status.HTTP_307_TEMPORARY_REDIRECT,
+        headers={"Cache-Control": f"private, max-age={ttl // 2}"},
+    )
+
+
+@router.get(
+    "/variants",
+    response_model=List[ImageVariantInfo],
+    summary="查询图片的缩略图",
+    operation_id="getImageVariants",
+    responses={
+        200: {"description": "获取成功 (还在生成或不支持时为空列表)"},
+        422: {"model": common_schema.ValidationErrorResponse, "description": "参数校验失败"},
+    }
+)
+async def read_image_variants(
+    url: str = Query(..., max_length=255, description="上传接口返回的原图 URL"),
+    db: AsyncSession = Depends(get_db),
+) -> Any:
+    variants = await get_variants(db, [url])
+    return variants.get(url, [])
\ No newline at end of file
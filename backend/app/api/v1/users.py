@@ -1,17 +1,81 @@
-from typing import Any
-from fastapi import APIRouter, Depends, HTTPException, Path, status
+from typing import Any, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Path, Query, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
 
 from app.api import deps
+from app.core.config import settings
 from app.core.database import get_db
-from app.models.user import User
-from app.models.story import StoryNode, NodeLike
+from app.core.principal import Principal
+from app.models.user import UserRole
 from app.schemas import user as user_schema
 from app.schemas import common as common_schema
+from app.utils.activity import decode_cursor, encode_cursor, fetch_activity
+from app.utils.user_stats import get_user_with_stats, get_users_with_stats
 
 router = APIRouter()
 
+
+def _parse_ids(raw: str) -> List[int]:
+    """解析 "1,2,3"，去重但保留首次出现的顺序"""
+    ids: List[int] = []
+    seen = set()
+    for part in raw.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        # isdigit 对 "²"、"٣" 等也为真，需限定 ASCII；位数封顶，避免超长数字串让 int() 报错或超出 BIGINT
+        if not (part.isascii() and part.isdigit()) or len(part) > 18 or int(part) < 1:
+            raise HTTPException(status_code=400, detail=f"无效的用户ID: {part}")
+        uid = int(part)
+        if uid not in seen:
+            seen.add(uid)
+            ids.append(uid)
+    return ids
+
+
+@router.get(
+    "",
+    dependencies=[Depends(deps.rate_limit(cost=2))],  # 🚦 限流
+    response_model=List[user_schema.UserPublicProfile],
+    summary="[公开] 批量获取用户资料卡",
+    operation_id="getUserProfilesBatch",
+    responses={
+        200: {"description": "获取成功，顺序与请求的 ids 一致，不存在的用户被跳过"},
+        400: {"model": common_schema.ErrorResponse, "description": "ids 格式错误或数量超限"},
+        422: {"model": common_schema.ValidationErrorResponse, "description": "参数校验失败"},
+    }
+)
+async def read_user_profiles(
+    ids: str = Query(..., description="逗号分隔的用户ID，如 1,2,3"),
+    db: AsyncSession = Depends(get_db),
+) -> Any:
+    """
+    信息流/评论区/故事树一次渲染多个作者时使用，替代逐个调用 /users/{user_id}。
+    整个请求只有一条 IN + LEFT JOIN 统计表的查询。
+    """
+    user_ids = _parse_ids(ids)
+    if len(user_ids) > settings.USER_BATCH_LOOKUP_MAX_IDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"一次最多查询 {settings.USER_BATCH_LOOKUP_MAX_IDS} 个用户",
+        )
+
+    found = await get_users_with_stats(db, user_ids)
+
+    profiles = []
+    for uid in user_ids:
+        if uid not in found:
+            continue
+        user, stats = found[uid]
+        profile = user_schema.UserPublicProfile.model_validate(user)
+        profile.nodes_count = stats["nodes_count"]
+        profile.published_nodes_count = stats["published_nodes_count"]
+        profile.likes_count = stats["likes_received"]
+        profile.comments_received = stats["comments_received"]
+        profiles.append(profile)
+    return profiles
+
+
 @router.get(
     "/{user_id}", 
     response_model=user_schema.UserProfileResponse, 
@@ -27,37 +91,59 @@ async def read_user_profile(
     user_id: int = Path(..., ge=1, description="要查看的用户ID"), # 🛡️ 增加路径参数校验
     db: AsyncSession = Depends(get_db),
 ) -> Any:
-    # 1. 查找用户
-    user = await db.get(User, user_id)
-    if not user:
+    # 1. 一次主键查询取用户和反范式统计
+    found = await get_user_with_stats(db, user_id)
+    if not found:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, 
             detail="用户不存在"
         )
+    user, stats = found
 
-    # 2. 统计数据
-    # 统计该用户发布的节点总数
-    nodes_count_stmt = (
-        select(func.count(StoryNode.id))
-        .where(StoryNode.author_id == user.id)
-    )
-    nodes_count = (await db.execute(nodes_count_stmt)).scalar() or 0
-
-    # 统计该用户收到的点赞总数 (通过 Join StoryNode 实现)
-    total_likes_stmt = (
-        select(func.count(NodeLike.user_id))
-        .select_from(NodeLike)
-        .join(StoryNode, NodeLike.node_id == StoryNode.id)
-        .where(StoryNode.author_id == user.id)
-    )
-    total_likes = (await db.execute(total_likes_stmt)).scalar() or 0
-
-    # 3. 组装并验证数据 (使用 Pydantic V2 推荐方式)
+    # 2. 组装并验证数据 (使用 Pydantic V2 推荐方式)
     # model_validate 会自动从 SQLAlchemy 对象中提取字段
     profile = user_schema.UserProfileResponse.model_validate(user)
     
-    # 注入额外的统计字段
-    profile.nodes_count = nodes_count
-    profile.total_likes_received = total_likes
+    # 注入统计字段
+    profile.nodes_count = stats["nodes_count"]
+    profile.published_nodes_count = stats["published_nodes_count"]
+    profile.likes_count = stats["likes_received"]
+    profile.comments_received = stats["comments_received"]
     
-    return profile
\ No newline at end of file
+    return profile
+
+
+@router.get(
+    "/{user_id}/activity",
+    dependencies=[Depends(deps.rate_limit(cost=1))],  # 🚦 限流
+    response_model=user_schema.ActivityPage,
+    summary="[公开] 用户动态时间线",
+    operation_id="getUserActivity",
+    responses={
+        200: {"description": "获取成功"},
+        400: {"model": common_schema.ErrorResponse, "description": "游标无效"},
+        422: {"model": common_schema.ValidationErrorResponse, "description": "参数校验失败"},
+    }
+)
+async def read_user_activity(
+    user_id: int = Path(..., ge=1),
+    cursor: Optional[str] = Query(None, description="上一页返回的 next_cursor，首页不传"),
+    limit: int = Query(20, ge=1, le=100),
+    current_user: Optional[Principal] = Depends(deps.get_current_user_or_none),
+    db: AsyncSession = Depends(get_db),
+) -> Any:
+    """
+    节点、评论、点赞按时间倒序交错排列。
+    本人和管理员能看到未发布节点上的活动，其他人只看已发布内容。
+    """
+    try:
+        decoded = decode_cursor(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="游标无效")
+
+    include_hidden = bool(current_user and (current_user.id == user_id or current_user.role == UserRole.ADMIN))
+    items, next_cursor = await fetch_activity(db, user_id, limit, decoded, include_hidden=include_hidden)
+    return user_schema.ActivityPage(
+        items=[user_schema.ActivityItem(**item) for item in items],
+        next_cursor=encode_cursor(next_cursor) if next_cursor else None,
+    )
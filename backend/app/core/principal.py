@@ -0,0 +1,72 @@
+# app/core/principal.py
+"""
+已认证用户的最小身份信息 (Principal) 及其进程内缓存
+
+鉴权依赖只需要 id/角色/状态，命中缓存时整个鉴权过程零 SQL。
+资料修改、管理员封禁、重置密码、邮箱激活后调用 principal_cache.invalidate；
+多 worker 部署时其他进程最迟在 TTL 到期后看到变更。
+"""
+from dataclasses import dataclass
+from typing import Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.user import User, UserRole
+from app.utils.ttl_cache import TTLCache
+
+
+@dataclass(frozen=True)
+class Principal:
+    id: int
+    role: UserRole
+    is_active: bool
+    is_verified: bool
+    username: str
+    avatar: Optional[str] = None
+
+
+class PrincipalCache:
+    """按 user_id 缓存 Principal，LRU 淘汰 + TTL 过期"""
+
+    def __init__(self, ttl_seconds: int, max_entries: int):
+        self._cache: TTLCache[int, Principal] = TTLCache(ttl_seconds, max_entries)
+
+    def get(self, user_id: int) -> Optional[Principal]:
+        return self._cache.get(user_id)
+
+    def set(self, principal: Principal) -> None:
+        self._cache.set(principal.id, principal)
+
+    def invalidate(self, user_id: int) -> None:
+        self._cache.pop(user_id)
+
+
+principal_cache = PrincipalCache(
+    ttl_seconds=settings.PRINCIPAL_CACHE_TTL_SECONDS,
+    max_entries=settings.PRINCIPAL_CACHE_MAX_ENTRIES,
+)
+
+
+async def load_principal(db: AsyncSession, user_id: int) -> Optional[Principal]:
+    """先查缓存，未命中时只 SELECT 需要的几列"""
+    principal = principal_cache.get(user_id)
+    if principal is not None:
+        return principal
+
+    stmt = select(
+        User.id,
+        User.role,
+        User.is_active,
+        User.is_verified,
+        User.username,
+        User.avatar,
+    ).where(User.id == user_id)
+    row = (await db.execute(stmt)).first()
+    if row is None:
+        return None
+
+    principal = Principal(**row._asdict())
+    principal_cache.set(principal)
+    return principal
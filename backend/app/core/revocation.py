@@ -0,0 +1,173 @@
+# app/core/revocation.py
+"""
+访问令牌吊销表
+
+访问令牌自带 role/is_active/is_verified 声明，鉴权时不查库，所以封禁、改角色、重置密码
+之后需要让已签发的令牌立刻失效：
+- revoke_user(db, user_id)：该用户在此刻之前签发 (iat) 的访问令牌全部作废
+- revoke_token(jti, exp)：单个令牌作废 (退出登录)
+
+按用户的截止时刻写进 token_revocations 表，随调用方的事务提交；提交成功后才在本进程生效
+并经 pubsub 的 auth:revocations 频道广播，事务回滚则什么都不发生。
+每个 worker 启动时和之后每 REVOCATION_SYNC_SECONDS 秒从表里同步一次，
+所以 PUBSUB_BACKEND=local 的多 worker 部署、进程重启都不会漏掉封禁；广播只是让生效更快。
+
+鉴权时只查内存里的 RevocationList。访问令牌寿命很短 (ACCESS_TOKEN_EXPIRE_MINUTES)，
+条目超过这个时间后令牌本身已过期，可以直接丢弃，因此表的大小只和"最近一个令牌周期内的吊销次数"有关。
+"""
+import asyncio
+import json
+import logging
+import time
+from datetime import datetime, timezone
+from threading import Lock
+from typing import Any, Dict, List, Mapping, Optional, Set, Tuple
+
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.core.principal import principal_cache
+from app.models.auth import TokenRevocation
+from app.utils.pubsub import broker
+
+logger = logging.getLogger(__name__)
+
+REVOCATION_CHANNEL = "auth:revocations"
+
+
+class RevocationList:
+    def __init__(self, retain_seconds: int) -> None:
+        self.retain_seconds = retain_seconds
+        self._users: Dict[int, float] = {}   # user_id -> 吊销时刻
+        self._tokens: Dict[str, float] = {}  # jti -> 令牌过期时刻
+        self._lock = Lock()
+        self._next_prune = 0.0
+
+    def _prune(self, now: float) -> None:
+        if now < self._next_prune:
+            return
+        self._next_prune = now + 60
+        horizon = now - self.retain_seconds
+        self._users = {uid: ts for uid, ts in self._users.items() if ts > horizon}
+        self._tokens = {jti: exp for jti, exp in self._tokens.items() if exp > now}
+
+    def revoke_user(self, user_id: int, at: Optional[float] = None) -> None:
+        at = time.time() if at is None else at
+        with self._lock:
+            self._users[user_id] = max(at, self._users.get(user_id, 0.0))
+            self._prune(at)
+
+    def revoke_token(self, jti: str, exp: float) -> None:
+        with self._lock:
+            self._tokens[jti] = exp
+            self._prune(time.time())
+
+    def is_revoked(self, claims: Mapping[str, Any]) -> bool:
+        with self._lock:
+            if claims.get("jti") in self._tokens:
+                return True
+            revoked_at = self._users.get(int(claims["sub"]))
+        # iat 精确到秒，同一秒内先签发的令牌可能漏过，窗口不超过 1 秒
+        return revoked_at is not None and claims.get("iat", 0) < int(revoked_at)
+
+    def apply(self, event: str, data: Mapping[str, Any]) -> None:
+        if event == "user":
+            self.revoke_user(int(data["user_id"]), float(data["at"]))
+        elif event == "token":
+            self.revoke_token(str(data["jti"]), float(data["exp"]))
+
+
+revocations = RevocationList(retain_seconds=settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+
+
+_PENDING_KEY = "pending_user_revocations"
+_publish_tasks: Set[asyncio.Task] = set()
+
+
+def _utc(value: datetime) -> datetime:
+    # SQLite 取回的是 naive datetime，按 UTC 处理
+    return value if value.tzinfo is not None else value.replace(tzinfo=timezone.utc)
+
+
+async def revoke_user(db: AsyncSession, user_id: int) -> None:
+    """记录截止时刻，不 commit；提交成功后才在本进程生效并广播给其他 worker"""
+    at = time.time()
+    await db.merge(TokenRevocation(user_id=user_id, revoked_at=datetime.fromtimestamp(at, tz=timezone.utc)))
+    db.sync_session.info.setdefault(_PENDING_KEY, []).append((user_id, at))
+
+
+async def _publish_user_revocations(pending: List[Tuple[int, float]]) -> None:
+    for user_id, at in pending:
+        await broker.publish(REVOCATION_CHANNEL, "user", {"user_id": user_id, "at": at})
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_committed(session: Session) -> None:
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+    for user_id, at in pending:
+        revocations.revoke_user(user_id, at)
+        principal_cache.invalidate(user_id)
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        # 脚本里同步提交：其他 worker 靠定期同步看到
+        return
+    task = loop.create_task(_publish_user_revocations(pending))
+    _publish_tasks.add(task)
+    task.add_done_callback(_publish_tasks.discard)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
+
+
+async def load_revocations() -> int:
+    """从 token_revocations 读入最近一个访问令牌周期内的截止时刻，返回条数"""
+    since = datetime.fromtimestamp(time.time() - revocations.retain_seconds, tz=timezone.utc)
+    async with AsyncSessionLocal() as db:
+        rows = (
+            await db.execute(
+                select(TokenRevocation.user_id, TokenRevocation.revoked_at).where(TokenRevocation.revoked_at > since)
+            )
+        ).all()
+    for user_id, revoked_at in rows:
+        revocations.revoke_user(user_id, _utc(revoked_at).timestamp())
+    return len(rows)
+
+
+async def run_revocation_sync_loop() -> None:
+    """后台任务：定期从数据库同步，兜底 pubsub 收不到的吊销 (local 后端的其他 worker、广播丢失)"""
+    while True:
+        await asyncio.sleep(settings.REVOCATION_SYNC_SECONDS)
+        try:
+            await load_revocations()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("revocation sync failed")
+
+
+async def revoke_token(jti: str, exp: float) -> None:
+    """退出登录时作废单个令牌：只在内存里 (寿命只剩几分钟)，多 worker 需要共享 pubsub 才能同步"""
+    revocations.revoke_token(jti, exp)
+    await broker.publish(REVOCATION_CHANNEL, "token", {"jti": jti, "exp": exp})
+
+
+async def run_revocation_listener() -> None:
+    """后台任务：接收其他 worker 广播的吊销事件 (本进程发出的会重复应用一次，幂等)"""
+    with broker.subscribe([REVOCATION_CHANNEL]) as sub:
+        while True:
+            payload = await sub.get(timeout=60)
+            if payload is None:
+                continue
+            try:
+                message = json.loads(payload)
+                revocations.apply(message["event"], message["data"])
+            except (ValueError, KeyError, TypeError):
+                logger.warning("bad revocation payload: %s", payload)
@@ -1,23 +1,67 @@
 # app/core/security.py
+import asyncio
+import hashlib
+import secrets
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Any, Union
+from typing import Any, Callable, Dict, Optional, Tuple, TypeVar, Union
 from jose import jwt
 from passlib.context import CryptContext
 from app.core.config import settings
 
-pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
+def build_pwd_context(time_cost: int, memory_cost: int, parallelism: int) -> CryptContext:
+    """按给定 argon2 参数构造 CryptContext；参数与已存哈希不一致时 needs_update 为真"""
+    return CryptContext(
+        schemes=["argon2"],
+        deprecated="auto",
+        argon2__time_cost=time_cost,
+        argon2__memory_cost=memory_cost,
+        argon2__parallelism=parallelism,
+    )
 
-def create_access_token(subject: Union[str, Any], expires_delta: timedelta = None) -> str:
-    """生成 JWT Token"""
+
+pwd_context = build_pwd_context(
+    time_cost=settings.ARGON2_TIME_COST,
+    memory_cost=settings.ARGON2_MEMORY_COST,
+    parallelism=settings.ARGON2_PARALLELISM,
+)
+
+T = TypeVar("T")
+
+def create_access_token(
+    subject: Union[str, Any],
+    expires_delta: timedelta = None,
+    claims: Optional[Dict[str, Any]] = None,
+) -> str:
+    """
+    生成 JWT 访问令牌
+    claims 里放角色/状态等身份声明，鉴权依赖直接从令牌还原身份，不必查库
+    """
+    now = datetime.utcnow()
     if expires_delta:
-        expire = datetime.utcnow() + expires_delta
+        expire = now + expires_delta
     else:
-        expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+        expire = now + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     
-    to_encode = {"exp": expire, "sub": str(subject)}
+    to_encode = {
+        **(claims or {}),
+        "exp": expire,
+        "iat": now,
+        "sub": str(subject),
+        "jti": secrets.token_hex(8),
+        "typ": "access",
+    }
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
+def create_refresh_token() -> str:
+    """刷新令牌是不透明随机串，服务端只保存其哈希"""
+    return secrets.token_urlsafe(32)
+
+def hash_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """验证密码是否正确"""
     return pwd_context.verify(plain_password, hashed_password)
@@ -26,6 +70,85 @@ def get_password_hash(password: str) -> str:
     """生成密码哈希"""
     return pwd_context.hash(password)
 
+def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """验证密码；若旧哈希的参数已过时，同时返回按当前参数重新生成的哈希"""
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
+# ==========================================
+# 密码哈希线程池
+# argon2 每次要几十毫秒 CPU，直接在 async 接口里调用会卡住整个事件循环；
+# argon2-cffi 计算时会释放 GIL，所以放进有界线程池即可并行且不阻塞其他请求。
+# ==========================================
+class PasswordHashStats:
+    """线程池排队/执行耗时统计，供管理员接口查看"""
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.in_flight = 0
+        self.total_queue_ms = 0.0
+        self.max_queue_ms = 0.0
+        self.total_run_ms = 0.0
+
+    def snapshot(self) -> Dict[str, float]:
+        calls = self.calls or 1
+        return {
+            "calls": self.calls,
+            "in_flight": self.in_flight,
+            "avg_queue_ms": round(self.total_queue_ms / calls, 2),
+            "max_queue_ms": round(self.max_queue_ms, 2),
+            "avg_run_ms": round(self.total_run_ms / calls, 2),
+        }
+
+
+password_hash_stats = PasswordHashStats()
+_hash_executor = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    thread_name_prefix="password-hash",
+)
+# 并发上限：超过后调用方在这里排队，而不是无限堆进线程池
+_hash_slots = asyncio.Semaphore(settings.PASSWORD_HASH_MAX_PENDING)
+
+
+async def _run_in_hash_pool(func: Callable[..., T], *args: Any) -> T:
+    submitted = time.perf_counter()
+    async with _hash_slots:
+        password_hash_stats.in_flight += 1
+        try:
+            def timed() -> tuple:
+                started = time.perf_counter()
+                result = func(*args)
+                return result, started, time.perf_counter()
+
+            loop = asyncio.get_running_loop()
+            result, started, finished = await loop.run_in_executor(_hash_executor, timed)
+        finally:
+            password_hash_stats.in_flight -= 1
+
+    queue_ms = (started - submitted) * 1000
+    password_hash_stats.calls += 1
+    password_hash_stats.total_queue_ms += queue_ms
+    password_hash_stats.max_queue_ms = max(password_hash_stats.max_queue_ms, queue_ms)
+    password_hash_stats.total_run_ms += (finished - started) * 1000
+    return result
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """在线程池中验证密码，不阻塞事件循环"""
+    return await _run_in_hash_pool(verify_password, plain_password, hashed_password)
+
+
+async def verify_and_update_password_async(
+    plain_password: str, hashed_password: str
+) -> Tuple[bool, Optional[str]]:
+    """在线程池中验证密码并按需重新哈希"""
+    return await _run_in_hash_pool(verify_and_update_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """在线程池中生成密码哈希，不阻塞事件循环"""
+    return await _run_in_hash_pool(get_password_hash, password)
+
 def verify_email_code(code: str, actual_code: str) -> bool:
     """验证邮箱验证码是否正确, 暂时不用hash"""
     return code == actual_code
@@ -1,4 +1,4 @@
 from app.models.base import Base
-from app.models.user import User
+from app.models.user import User, UserStats
 from app.models.story_book import StoryBook
 from app.models.story import StoryNode, NodeLike
\ No newline at end of file
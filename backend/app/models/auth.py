@@ -1,6 +1,6 @@
 # 验证码
 
-from sqlalchemy import String, DateTime, func
+from sqlalchemy import ForeignKey, String, DateTime, Index, func
 from datetime import datetime
 from sqlalchemy.orm import Mapped, mapped_column
 from app.models.base import Base
@@ -24,3 +24,28 @@ class EmailVerificationCode(Base):
     expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, index=True)
     is_used: Mapped[bool] = mapped_column(default=False, nullable=False, index=True)  # 是否已使用
 
+    __table_args__ = (
+        # 校验验证码：每个 (email, purpose) 最多一行未使用，按此索引直接定位
+        Index("ix_email_codes_email_purpose_used", "email", "purpose", "is_used"),
+    )
+
+
+# 刷新令牌：只存 sha256 哈希，轮换时旧令牌标记为已吊销
+class RefreshToken(Base):
+    __tablename__ = "refresh_tokens"
+
+    id: Mapped[int] = mapped_column(primary_key=True, index=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    token_hash: Mapped[str] = mapped_column(String(64), unique=True, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, index=True)
+    is_revoked: Mapped[bool] = mapped_column(default=False, nullable=False)  # 已轮换/已退出/被管理员吊销
+
+
+# 访问令牌按用户吊销的截止时刻：iat 早于该时刻的访问令牌一律无效 (封禁/重置密码/改角色)
+# 持久化后重启不丢，各 worker 定期从这里同步，不依赖共享 pub/sub
+class TokenRevocation(Base):
+    __tablename__ = "token_revocations"
+
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    revoked_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, index=True)
@@ -76,6 +76,8 @@ class StoryComment(Base):
         CheckConstraint("length(content) > 0", name="ck_story_comments_content_nonempty"),
         # 常见查询：按 node 看最新评论
         Index("ix_story_comments_node_created_at", "node_id", "created_at"),
+        # 用户动态时间线：按用户看最新评论
+        Index("ix_story_comments_user_created_at", "user_id", "created_at"),
     )
 
 
@@ -143,3 +145,61 @@ class Notification(Base):
         # 常见查询：我的未读通知列表
         Index("ix_notifications_user_isread_created", "user_id", "is_read", "created_at"),
     )
+
+
+class NotificationArchive(Base):
+    """
+    已读且过期的通知归档表，保持 notifications 热表足够小。
+    不设外键：节点/评论被删后归档记录仍然保留。
+    """
+    __tablename__ = "notifications_archive"
+
+    # 沿用原通知 id，不自增
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=False)
+
+    user_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    sender_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    type: Mapped[NotificationType] = mapped_column(
+        SAEnum(NotificationType, name="notification_type"),
+        nullable=False,
+    )
+    node_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    comment_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    is_read: Mapped[bool] = mapped_column(Boolean, default=True, nullable=False)
+
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    archived_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        nullable=False,
+    )
+
+    __table_args__ = (
+        # 常见查询：按用户翻历史通知
+        Index("ix_notifications_archive_user_created", "user_id", "created_at"),
+    )
+
+
+class NotificationOutbox(Base):
+    """
+    通知发件箱：写接口在同一事务里追加一条紧凑事件，
+    由后台 worker 批量转成 Notification 并推送，写接口不再承担通知扇出。
+    """
+    __tablename__ = "notification_outbox"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+
+    receiver_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    sender_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    type: Mapped[NotificationType] = mapped_column(
+        SAEnum(NotificationType, name="notification_type"),
+        nullable=False,
+    )
+    node_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    comment_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        nullable=False,
+    )
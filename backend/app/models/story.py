@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import String, Text, Integer, ForeignKey, DateTime
+from sqlalchemy import String, Text, Integer, ForeignKey, DateTime, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship, backref
 from app.models.base import Base
 import enum
@@ -26,6 +26,11 @@ class NodeLike(Base):
     user = relationship("User", back_populates="likes")
     node = relationship("StoryNode", back_populates="likes_relationship")
 
+    __table_args__ = (
+        # 用户动态时间线：按用户看最新点赞
+        Index("ix_node_likes_user_created_at", "user_id", "created_at"),
+    )
+
 class StoryNode(Base):
     __tablename__ = "story_nodes"
 
@@ -76,5 +81,10 @@ class StoryNode(Base):
     cascade="all, delete-orphan",  # 节点删除时评论一起删 OK
     )
 
+    __table_args__ = (
+        # 用户创作列表 / 动态时间线：按作者看最新节点
+        Index("ix_story_nodes_author_created_at", "author_id", "created_at"),
+    )
+
     def __repr__(self):
         return f"<Node {self.id} (Book: {self.book_id})>"
\ No newline at end of file
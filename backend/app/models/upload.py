@@ -0,0 +1,41 @@
+# 上传文件相关
+
+from datetime import datetime
+from sqlalchemy import DateTime, Integer, String, func
+from sqlalchemy.orm import Mapped, mapped_column
+from app.models.base import Base
+
+
+# 按内容寻址的上传文件：同一内容只存一份
+# 不维护引用计数：头像/封面/正文哪里用到了哪个文件由 upload_gc 扫描得出，
+# last_uploaded_at 只用来给"刚上传、还没保存"的文件留宽限期
+class UploadBlob(Base):
+    __tablename__ = "upload_blobs"
+
+    sha256: Mapped[str] = mapped_column(String(64), primary_key=True)
+    filename: Mapped[str] = mapped_column(String(255), unique=True, nullable=False)  # 存储里的 key (本地为 UPLOAD_DIR 下的文件名)
+    size: Mapped[int] = mapped_column(Integer, nullable=False)  # 字节数
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    last_uploaded_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+
+# 图片衍生图：每张上传的原图按宽度档位 × 格式生成若干缩略图
+class ImageVariant(Base):
+    __tablename__ = "image_variants"
+
+    id: Mapped[int] = mapped_column(primary_key=True, index=True)
+    source_url: Mapped[str] = mapped_column(String(255), nullable=False, index=True)  # 原图 URL (与 cover_image/avatar 中存的一致)
+    url: Mapped[str] = mapped_column(String(255), unique=True, nullable=False)
+    format: Mapped[str] = mapped_column(String(10), nullable=False)  # webp / jpeg
+    width: Mapped[int] = mapped_column(Integer, nullable=False)
+    height: Mapped[int] = mapped_column(Integer, nullable=False)
+    size: Mapped[int] = mapped_column(Integer, nullable=False)  # 字节数
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+
+# 不生成衍生图的原图 (动图)：记下来，回填命令不再每次重新解码
+class ImageVariantSkip(Base):
+    __tablename__ = "image_variant_skips"
+
+    source_url: Mapped[str] = mapped_column(String(255), primary_key=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
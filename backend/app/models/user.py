@@ -1,4 +1,4 @@
-from sqlalchemy import String, Boolean
+from sqlalchemy import String, Boolean, ForeignKey, Integer
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.models.base import Base
 import enum
@@ -59,4 +59,17 @@ class User(Base):
     )
 
     def __repr__(self):
-        return f"<User {self.username}>"
\ No newline at end of file
+        return f"<User {self.username}>"
+
+
+# 用户统计 (反范式)：写路径增量维护，后台任务定期对账
+# 单独成表，避免高频计数更新触发 users.updated_at 和锁住用户主行
+class UserStats(Base):
+    __tablename__ = "user_stats"
+
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    nodes_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)            # 写过的节点 (含待审核)
+    published_nodes_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)  # 已发布/已完结的节点
+    likes_received: Mapped[int] = mapped_column(Integer, default=0, nullable=False)         # 节点收到的点赞
+    comments_received: Mapped[int] = mapped_column(Integer, default=0, nullable=False)      # 节点收到的评论
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
@@ -1,5 +1,5 @@
 # app/schemas/__init__.py
-from .token import Token, TokenData
+from .token import Token, TokenData, RefreshTokenRequest
 from .user import *
 from .story_book import *
 from .story import *
\ No newline at end of file
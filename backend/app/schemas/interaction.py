@@ -1,5 +1,6 @@
 # app/schemas/interaction.py
 from datetime import datetime
+from typing import Optional
 from pydantic import BaseModel
 from app.schemas.story import AuthorInfo 
 
@@ -26,10 +27,20 @@ class CommentResponse(BaseModel):
 class NotificationResponse(BaseModel):
     id: int
     type: str # liked / commented / branched / Other
-    sender: AuthorInfo # 谁触发的
-    target_id: int # 跳转链接用
+    sender: Optional[AuthorInfo] = None # 谁触发的 (系统通知可能为空)
+    target_id: Optional[int] = None # 跳转链接用 (兼容旧前端，等于 node_id)
+    node_id: Optional[int] = None
+    comment_id: Optional[int] = None
+    # 批量补全的目标信息，前端无需再逐条请求节点
+    node_title: Optional[str] = None
+    node_branch_name: Optional[str] = None
+    comment_excerpt: Optional[str] = None
     is_read: bool
     created_at: datetime
     
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+# 未读通知数响应
+class UnreadCountResponse(BaseModel):
+    unread_count: int
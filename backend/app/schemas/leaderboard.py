@@ -0,0 +1,32 @@
+# app/schemas/leaderboard.py
+from datetime import datetime
+from typing import List, Literal, Optional
+
+from pydantic import BaseModel, Field
+
+from app.schemas.story import AuthorInfo
+
+LeaderboardMetric = Literal["likes", "branches"]
+LeaderboardPeriod = Literal["all", "week"]
+
+
+class LeaderboardEntry(BaseModel):
+    rank: int = Field(..., description="名次，同分并列")
+    score: int
+    user: AuthorInfo
+
+
+class LeaderboardPosition(BaseModel):
+    user_id: int
+    rank: Optional[int] = Field(None, description="未上榜为空")
+    score: int = 0
+
+
+class LeaderboardResponse(BaseModel):
+    metric: LeaderboardMetric
+    period: LeaderboardPeriod
+    book_id: Optional[int] = None
+    total: int = Field(..., description="上榜人数")
+    updated_at: Optional[datetime] = Field(None, description="榜单最后刷新时间 (UTC)")
+    entries: List[LeaderboardEntry]
+    me: Optional[LeaderboardPosition] = Field(None, description="当前登录用户或 user_id 指定用户的名次")
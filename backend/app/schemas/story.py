@@ -7,6 +7,7 @@ from typing import List, Optional
 from pydantic import BaseModel, ConfigDict, Field
 
 from app.models.story import NodeStatus
+from app.schemas.upload import ImageVariantInfo
 
 
 class MessageResponse(BaseModel):
@@ -19,6 +20,7 @@ class AuthorInfo(BaseModel):
     id: int
     username: str
     avatar: Optional[str] = None
+    avatar_variants: List[ImageVariantInfo] = Field(default_factory=list)  # 头像缩略图，按宽度升序
 
 
 class StoryNodeCreate(BaseModel):
@@ -67,4 +69,25 @@ class StoryNodeTreeItem(StoryNodeListItem):
 
 
 class NodeAuditRequest(BaseModel):
-    status: NodeStatus = Field(..., description="新的节点状态")
\ No newline at end of file
+    status: NodeStatus = Field(..., description="新的节点状态")
+
+class NodeAuditItem(BaseModel):
+    node_id: int = Field(..., ge=1)
+    status: NodeStatus = Field(..., description="新的节点状态")
+
+
+class BulkNodeAuditRequest(BaseModel):
+    items: List[NodeAuditItem] = Field(..., min_length=1, description="(节点, 目标状态) 列表，同一节点只取第一条")
+
+
+class NodeAuditResult(BaseModel):
+    node_id: int
+    ok: bool
+    old_status: Optional[NodeStatus] = None
+    status: Optional[NodeStatus] = None
+    detail: Optional[str] = Field(None, description="失败原因")
+
+
+class BulkNodeAuditResponse(BaseModel):
+    updated: int = Field(..., description="状态实际发生变化的节点数")
+    results: List[NodeAuditResult] = Field(..., description="与请求顺序一致的逐条结果")
@@ -4,6 +4,8 @@ from typing import List, Optional
 
 from pydantic import BaseModel, ConfigDict, Field
 
+from app.schemas.upload import ImageVariantInfo
+
 
 class StoryBookCreate(BaseModel):
     title: str = Field(..., min_length=1, max_length=100)
@@ -21,6 +23,7 @@ class StoryBookResponse(BaseModel):
     title: str
     description: Optional[str] = None
     cover_image: Optional[str] = None
+    cover_variants: List[ImageVariantInfo] = Field(default_factory=list)  # 封面缩略图，按宽度升序
 
     is_active: bool
     created_at: datetime
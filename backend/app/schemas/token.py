@@ -1,9 +1,14 @@
 # app/schemas/token.py
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: str | None = Field(None, description="刷新令牌，访问令牌过期后用它换新")
+    expires_in: int | None = Field(None, description="访问令牌有效期(秒)")
 
 class TokenData(BaseModel):
-    user_id: str | None = None
\ No newline at end of file
+    user_id: str | None = None
+
+class RefreshTokenRequest(BaseModel):
+    refresh_token: str = Field(..., description="登录时下发的刷新令牌")
@@ -0,0 +1,44 @@
+# app/schemas/upload.py
+from typing import Dict, Optional
+
+from pydantic import BaseModel, ConfigDict, Field
+
+
+class ImageVariantInfo(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    url: str
+    format: str
+    width: int
+    height: int
+
+
+class UploadResponse(BaseModel):
+    url: str
+
+
+class DirectUploadRequest(BaseModel):
+    """直传第一步：客户端先声明内容，服务端判断是否已有相同内容"""
+    sha256: str = Field(..., pattern=r"^[0-9a-f]{64}$", description="文件内容的 sha256 (小写十六进制)")
+    size: int = Field(..., ge=1, description="字节数")
+    content_type: str = Field(..., max_length=50, description="image/png / image/jpeg / image/gif / image/webp")
+
+
+class PresignedUploadInfo(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    url: str
+    method: str
+    headers: Dict[str, str] = Field(default_factory=dict, description="PUT 时必须原样带上的请求头")
+    expires_in: int
+
+
+class DirectUploadTicketResponse(BaseModel):
+    filename: str
+    url: str = Field(..., description="上传完成后的图片 URL")
+    upload: Optional[PresignedUploadInfo] = Field(None, description="为空表示已有相同内容，无需上传，直接使用 url")
+    complete_token: Optional[str] = Field(None, description="上传后调用 /uploads/complete 时原样带上 (upload 为空时也为空)")
+
+
+class DirectUploadCompleteRequest(BaseModel):
+    complete_token: str = Field(..., max_length=2048, description="/uploads/presign 签发的完成凭证")
@@ -1,4 +1,7 @@
 # app/schemas/user.py
+from datetime import datetime
+from typing import List, Literal
+
 from pydantic import BaseModel, EmailStr, Field
 from app.models.user import UserRole
 
@@ -66,10 +69,44 @@ class UserResponse(BaseModel):
 # --- [新增] 详细画像 (带统计数据) ---
 class UserProfileResponse(UserResponse):
     nodes_count: int = 0
-    likes_count: int = 0
+    published_nodes_count: int = 0
+    likes_count: int = 0  # 收到的点赞总数
+    comments_received: int = 0
 
     class Config:
         from_attributes = True
+# --- [新增] 公开资料卡 (批量查询用，不含邮箱等私密字段) ---
+class UserPublicProfile(BaseModel):
+    id: int
+    username: str
+    role: UserRole
+    bio: str | None = None
+    avatar: str | None = None
+    nodes_count: int = 0
+    published_nodes_count: int = 0
+    likes_count: int = 0  # 收到的点赞总数
+    comments_received: int = 0
+
+    class Config:
+        from_attributes = True
+
+# --- [新增] 用户动态时间线 ---
+class ActivityItem(BaseModel):
+    type: Literal["node", "comment", "like"] = Field(..., description="写了节点 / 发了评论 / 点了赞")
+    created_at: datetime
+    node_id: int
+    book_id: int
+    node_title: str | None = None
+    node_branch_name: str | None = None
+    comment_id: int | None = None
+    comment_excerpt: str | None = None
+
+
+class ActivityPage(BaseModel):
+    items: List[ActivityItem]
+    next_cursor: str | None = Field(None, description="下一页游标，为空表示没有更多")
+
+
 class PasswordReset(BaseModel):
     email: EmailStr = Field(..., description="用户邮箱")
     code: str = Field(..., description="6位验证码")
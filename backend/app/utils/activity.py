@@ -0,0 +1,174 @@
+# app/utils/activity.py
+"""
+用户动态时间线：写的节点 / 发的评论 / 点的赞 按时间交错排列
+
+三张表各自按 (user_id, created_at) 索引倒序取至多 limit + 1 行，再在内存里做 k 路归并，
+每页总共只读约 3 × limit 行，与用户历史多长无关。
+
+翻页用复合游标 (created_at, kind, id)：三个来源的记录按
+(created_at, KIND_RANK[kind], id) 全局降序排列，游标记下本页最后一条，
+下一页每个来源只取严格排在它后面的行。点赞表没有自增 id，用 node_id 代替 (同一用户内唯一)。
+"""
+import base64
+import heapq
+import json
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, desc, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.interaction import StoryComment
+from app.models.story import NodeLike, StoryNode
+from app.utils.notification import COMMENT_EXCERPT_LENGTH
+from app.utils.user_stats import VISIBLE_STATUSES
+
+# 同一时刻的多条记录按 kind 排序，保证全局顺序确定
+KIND_RANK = {"node": 3, "comment": 2, "like": 1}
+
+Cursor = Tuple[datetime, str, int]
+
+
+def encode_cursor(cursor: Cursor) -> str:
+    created_at, kind, item_id = cursor
+    raw = json.dumps([created_at.isoformat(), kind, item_id])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str) -> Cursor:
+    """格式错误抛 ValueError"""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        created_at, kind, item_id = json.loads(raw)
+        if kind not in KIND_RANK:
+            raise ValueError(kind)
+        return datetime.fromisoformat(created_at), kind, int(item_id)
+    except (TypeError, ValueError, json.JSONDecodeError) as e:
+        raise ValueError("invalid cursor") from e
+
+
+def _after_cursor(created_col, id_col, kind: str, cursor: Optional[Cursor]):
+    """本来源中严格排在游标之后 (更旧) 的行"""
+    if cursor is None:
+        return None
+    ts, cursor_kind, cursor_id = cursor
+    rank, cursor_rank = KIND_RANK[kind], KIND_RANK[cursor_kind]
+    if rank < cursor_rank:
+        return created_col <= ts
+    if rank > cursor_rank:
+        return created_col < ts
+    return or_(created_col < ts, and_(created_col == ts, id_col < cursor_id))
+
+
+async def fetch_activity(
+    db: AsyncSession,
+    user_id: int,
+    limit: int,
+    cursor: Optional[Cursor] = None,
+    include_hidden: bool = False,
+) -> Tuple[List[Dict], Optional[Cursor]]:
+    """
+    返回 (本页条目, 下一页游标)；没有更多数据时游标为 None。
+    include_hidden=False 时只展示已发布/已完结节点上的活动 (他人查看主页)。
+    """
+    # 每个来源多取一行，用来判断是否还有下一页
+    fetch = limit + 1
+
+    # 1) 节点：idx (author_id, created_at)
+    nodes_stmt = (
+        select(
+            StoryNode.id,
+            StoryNode.created_at,
+            StoryNode.book_id,
+            StoryNode.title,
+            StoryNode.branch_name,
+        )
+        .where(StoryNode.author_id == user_id)
+        .order_by(desc(StoryNode.created_at), desc(StoryNode.id))
+        .limit(fetch)
+    )
+    cond = _after_cursor(StoryNode.created_at, StoryNode.id, "node", cursor)
+    if cond is not None:
+        nodes_stmt = nodes_stmt.where(cond)
+    if not include_hidden:
+        nodes_stmt = nodes_stmt.where(StoryNode.status.in_(VISIBLE_STATUSES))
+
+    # 2) 评论：idx (user_id, created_at)，按主键回表拿节点标题
+    comments_stmt = (
+        select(
+            StoryComment.id,
+            StoryComment.created_at,
+            StoryComment.node_id,
+            StoryNode.book_id,
+            StoryNode.title,
+            StoryNode.branch_name,
+            func.substr(StoryComment.content, 1, COMMENT_EXCERPT_LENGTH),
+        )
+        .join(StoryNode, StoryComment.node_id == StoryNode.id)
+        .where(StoryComment.user_id == user_id, StoryComment.deleted_at.is_(None))
+        .order_by(desc(StoryComment.created_at), desc(StoryComment.id))
+        .limit(fetch)
+    )
+    cond = _after_cursor(StoryComment.created_at, StoryComment.id, "comment", cursor)
+    if cond is not None:
+        comments_stmt = comments_stmt.where(cond)
+    if not include_hidden:
+        comments_stmt = comments_stmt.where(StoryNode.status.in_(VISIBLE_STATUSES))
+
+    # 3) 点赞：idx (user_id, created_at)
+    likes_stmt = (
+        select(
+            NodeLike.node_id,
+            NodeLike.created_at,
+            StoryNode.book_id,
+            StoryNode.title,
+            StoryNode.branch_name,
+        )
+        .join(StoryNode, NodeLike.node_id == StoryNode.id)
+        .where(NodeLike.user_id == user_id)
+        .order_by(desc(NodeLike.created_at), desc(NodeLike.node_id))
+        .limit(fetch)
+    )
+    cond = _after_cursor(NodeLike.created_at, NodeLike.node_id, "like", cursor)
+    if cond is not None:
+        likes_stmt = likes_stmt.where(cond)
+    if not include_hidden:
+        likes_stmt = likes_stmt.where(StoryNode.status.in_(VISIBLE_STATUSES))
+
+    sources = []
+    sources.append([
+        {
+            "type": "node", "id": r.id, "created_at": r.created_at,
+            "node_id": r.id, "book_id": r.book_id, "node_title": r.title, "node_branch_name": r.branch_name,
+        }
+        for r in await db.execute(nodes_stmt)
+    ])
+    sources.append([
+        {
+            "type": "comment", "id": cid, "created_at": created_at,
+            "node_id": node_id, "book_id": book_id, "node_title": title, "node_branch_name": branch_name,
+            "comment_id": cid, "comment_excerpt": excerpt,
+        }
+        for cid, created_at, node_id, book_id, title, branch_name, excerpt in await db.execute(comments_stmt)
+    ])
+    sources.append([
+        {
+            "type": "like", "id": r.node_id, "created_at": r.created_at,
+            "node_id": r.node_id, "book_id": r.book_id, "node_title": r.title, "node_branch_name": r.branch_name,
+        }
+        for r in await db.execute(likes_stmt)
+    ])
+
+    # 每个来源已按 (created_at, id) 降序，k 路归并取前 limit 条
+    def sort_key(item: Dict):
+        return (item["created_at"], KIND_RANK[item["type"]], item["id"])
+
+    merged = heapq.merge(*sources, key=sort_key, reverse=True)
+    items = [item for _, item in zip(range(limit + 1), merged)]
+
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        last = items[-1]
+        next_cursor = (last["created_at"], last["type"], last["id"])
+    return items, next_cursor
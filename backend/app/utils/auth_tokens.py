@@ -0,0 +1,99 @@
+# app/utils/auth_tokens.py
+"""
+访问令牌 + 刷新令牌
+
+- 访问令牌：短期 JWT，携带 role/act/ver/name 声明，鉴权不查库
+- 刷新令牌：不透明随机串，数据库只存哈希；每次刷新都轮换，旧令牌作废
+- 已作废的刷新令牌再次出现视为泄露，吊销该用户全部会话
+"""
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import security
+from app.core.config import settings
+from app.core.revocation import revoke_user
+from app.models.auth import RefreshToken
+from app.models.user import User, UserRole
+from app.schemas.token import Token
+
+
+def build_claims(user: User) -> dict:
+    return {
+        "role": user.role.value,
+        "act": user.is_active,
+        "ver": user.is_verified,
+        "name": user.username,
+    }
+
+
+async def issue_token_pair(db: AsyncSession, user: User) -> Token:
+    """签发一对令牌，刷新令牌写入会话，由调用方 commit"""
+    access_token = security.create_access_token(
+        subject=str(user.id),
+        expires_delta=timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES),
+        claims=build_claims(user),
+    )
+    refresh_token = security.create_refresh_token()
+    db.add(
+        RefreshToken(
+            user_id=user.id,
+            token_hash=security.hash_token(refresh_token),
+            expires_at=datetime.utcnow() + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS),
+        )
+    )
+    return Token(
+        access_token=access_token,
+        token_type="bearer",
+        refresh_token=refresh_token,
+        expires_in=settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+    )
+
+
+async def rotate_refresh_token(db: AsyncSession, refresh_token: str) -> Optional[Token]:
+    """用刷新令牌换一对新令牌；令牌无效、用户被封禁时返回 None。无论结果如何调用方都要 commit"""
+    stmt = (
+        select(RefreshToken)
+        .where(RefreshToken.token_hash == security.hash_token(refresh_token))
+        .with_for_update()
+    )
+    record = (await db.execute(stmt)).scalars().first()
+    if record is None:
+        return None
+    if record.is_revoked:
+        # 旧令牌被重放：可能已泄露，整组会话作废
+        await revoke_user_sessions(db, record.user_id)
+        return None
+    if record.expires_at.replace(tzinfo=None) <= datetime.utcnow():
+        return None
+
+    record.is_revoked = True
+    # 身份声明以数据库为准，角色变更在这里生效
+    user = await db.get(User, record.user_id)
+    if user is None or not user.is_active or user.role == UserRole.BANNED or not user.is_verified:
+        return None
+    return await issue_token_pair(db, user)
+
+
+async def revoke_refresh_token(db: AsyncSession, refresh_token: str) -> None:
+    await db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.token_hash == security.hash_token(refresh_token))
+        .values(is_revoked=True)
+    )
+
+
+async def revoke_user_sessions(db: AsyncSession, user_id: int) -> None:
+    """
+    封禁、重置密码等场景：已签发的访问令牌全部作废，刷新令牌全部作废。
+    都由调用方 commit，提交后才生效。
+    """
+    await db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.user_id == user_id)
+        .where(RefreshToken.is_revoked == False)
+        .values(is_revoked=True)
+    )
+    await revoke_user(db, user_id)
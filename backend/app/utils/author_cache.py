@@ -0,0 +1,104 @@
+# app/utils/author_cache.py
+"""
+作者信息 (AuthorInfo: id/用户名/头像) 的进程内缓存
+
+列表接口 (动态/热门/搜索/用户作品/评论/通知/故事树) 只需要作者的三列，
+不再对每个请求 selectinload 整行 User：查询只取 author_id，
+再用 get_authors 批量补全，命中缓存时零 SQL，未命中的一次 IN 查询只 SELECT 三列
+(上传的头像另有一次 IN 查询取缩略图)。
+
+用户名/头像修改后调用 author_cache.invalidate；
+多 worker 部署时其他进程最迟在 TTL 到期后看到变更。
+"""
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Type, TypeVar
+
+from pydantic import BaseModel
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.user import User
+from app.schemas.story import AuthorInfo
+from app.utils.image_pipeline import get_variants
+from app.utils.ttl_cache import TTLCache
+
+SchemaT = TypeVar("SchemaT", bound=BaseModel)
+
+
+class AuthorCache:
+    """按 user_id 缓存 AuthorInfo，LRU 淘汰 + TTL 过期"""
+
+    def __init__(self, ttl_seconds: int, max_entries: int):
+        self._cache: TTLCache[int, AuthorInfo] = TTLCache(ttl_seconds, max_entries)
+
+    def get_many(self, user_ids: Iterable[int]) -> Dict[int, AuthorInfo]:
+        """返回命中的部分"""
+        return self._cache.get_many(user_ids)
+
+    def set_many(self, authors: Iterable[AuthorInfo]) -> None:
+        self._cache.set_many((author.id, author) for author in authors)
+
+    def invalidate(self, user_id: int) -> None:
+        self._cache.pop(user_id)
+
+
+author_cache = AuthorCache(
+    ttl_seconds=settings.AUTHOR_CACHE_TTL_SECONDS,
+    max_entries=settings.AUTHOR_CACHE_MAX_ENTRIES,
+)
+
+
+async def get_authors(db: AsyncSession, user_ids: Iterable[Optional[int]]) -> Dict[int, AuthorInfo]:
+    """批量取作者信息：先查缓存，未命中的一次 IN 查询补齐；不存在的 id 不出现在结果里"""
+    ids = {uid for uid in user_ids if uid is not None}
+    if not ids:
+        return {}
+
+    authors = author_cache.get_many(ids)
+    missing = ids - authors.keys()
+    if missing:
+        rows = await db.execute(
+            select(User.id, User.username, User.avatar).where(User.id.in_(missing))
+        )
+        rows = rows.all()
+        variants = await get_variants(db, (row.avatar for row in rows))
+        loaded = [
+            AuthorInfo(
+                id=row.id,
+                username=row.username,
+                avatar=row.avatar,
+                avatar_variants=variants.get(row.avatar, []),
+            )
+            for row in rows
+        ]
+        author_cache.set_many(loaded)
+        authors.update((author.id, author) for author in loaded)
+    return authors
+
+
+def build_with_author(
+    schema: Type[SchemaT],
+    obj: Any,
+    authors: Dict[int, AuthorInfo],
+    fk: str = "author_id",
+    field: str = "author",
+) -> SchemaT:
+    """
+    按 schema 的字段从 ORM 对象取值，作者字段用 authors 填充。
+    不对 ORM 对象整体 model_validate，避免 Pydantic 触碰 author 关系触发懒加载。
+    """
+    data = {name: getattr(obj, name) for name in schema.model_fields if name != field}
+    data[field] = authors.get(getattr(obj, fk))
+    return schema.model_validate(data)
+
+
+async def with_authors(
+    db: AsyncSession,
+    schema: Type[SchemaT],
+    objs: Sequence[Any],
+    fk: str = "author_id",
+    field: str = "author",
+) -> List[SchemaT]:
+    """一页 ORM 对象 -> 响应模型列表，作者信息走缓存"""
+    authors = await get_authors(db, (getattr(obj, fk) for obj in objs))
+    return [build_with_author(schema, obj, authors, fk=fk, field=field) for obj in objs]
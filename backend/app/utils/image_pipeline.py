@@ -0,0 +1,228 @@
+# app/utils/image_pipeline.py
+"""
+图片衍生图流水线
+
+上传接口只负责把原图落盘，随后把文件名交给 image_pipeline.schedule，请求立即返回：
+- 解码/缩放是 CPU 密集操作，放在独立的进程池 (IMAGE_PROCESS_WORKERS) 里跑，不占事件循环也不受 GIL 限制
+- 每张原图只解码一次：JPEG 用 draft 按目标尺寸做 DCT 缩放解码，其余档位从上一档结果逐级缩小
+- 按 IMAGE_VARIANT_WIDTHS 档位 × IMAGE_VARIANT_FORMATS 生成衍生图 (不放大)，写入存储的 variants/ 下
+- 原图不在本机 (s3 后端) 时先下载到临时目录；衍生图在临时目录生成后再放进存储
+- 结果记入 image_variants 表，封面/头像接口据此返回各档 URL，客户端挑最小的够用尺寸
+- 动图不生成衍生图 (缩略图会丢掉动画)，记入 image_variant_skips，回填时跳过
+
+进程重启时还没处理完的图片可以用回填命令补齐：
+    python -m app.utils.image_pipeline
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.upload import ImageVariant, ImageVariantSkip
+from app.schemas.upload import ImageVariantInfo
+from app.utils.storage import content_type_for, run_io, storage
+
+logger = logging.getLogger(__name__)
+
+VARIANT_SUBDIR = "variants"
+EXTENSIONS = {"webp": "webp", "jpeg": "jpg"}
+
+# (format, 文件名, 宽, 高, 字节数)
+RenderedVariant = Tuple[str, str, int, int, int]
+
+
+def upload_url(filename: str) -> str:
+    return storage.url(filename)
+
+
+def render_variants(
+    source_path: str,
+    out_dir: str,
+    widths: Sequence[int],
+    formats: Sequence[str],
+    quality: int,
+    max_pixels: int,
+) -> List[RenderedVariant]:
+    """在子进程里执行：解码一次原图，逐级缩小并编码各档衍生图。动图不处理，返回空列表"""
+    # 可选依赖：只有启用衍生图时才需要安装 Pillow
+    from PIL import Image, ImageOps
+
+    # 上传时已按文件头拒绝超限图片，这里再兜底 (回填的历史文件没经过校验)：超过 2 倍时 Pillow 抛 DecompressionBombError
+    Image.MAX_IMAGE_PIXELS = max_pixels
+    stem = os.path.splitext(os.path.basename(source_path))[0]
+    rendered: List[RenderedVariant] = []
+    with Image.open(source_path) as img:
+        if getattr(img, "is_animated", False):
+            return rendered
+        max_width = max(widths)
+        # JPEG 按需要的最大尺寸直接缩放解码，大图省掉绝大部分解码开销
+        img.draft("RGB", (max_width, max_width))
+        img = ImageOps.exif_transpose(img)
+        has_alpha = img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info)
+        img = img.convert("RGBA" if has_alpha else "RGB")
+
+        src_width, src_height = img.size
+        current = img
+        for width in sorted({min(w, src_width) for w in widths}, reverse=True):
+            height = max(1, round(src_height * width / src_width))
+            if current.size != (width, height):
+                current = current.resize((width, height), Image.LANCZOS)
+            for fmt in formats:
+                frame = current
+                if fmt == "jpeg" and has_alpha:
+                    # JPEG 不支持透明通道，铺白底
+                    frame = Image.new("RGB", current.size, (255, 255, 255))
+                    frame.paste(current, mask=current.getchannel("A"))
+                filename = f"{stem}_{width}.{EXTENSIONS[fmt]}"
+                path = os.path.join(out_dir, filename)
+                temp_path = f"{path}.part"
+                try:
+                    frame.save(temp_path, format=fmt.upper(), quality=quality, optimize=True)
+                    os.replace(temp_path, path)
+                except BaseException:
+                    if os.path.exists(temp_path):
+                        os.unlink(temp_path)
+                    raise
+                rendered.append((fmt, filename, width, height, os.path.getsize(path)))
+    return rendered
+
+
+async def get_variants(db: AsyncSession, source_urls: Iterable[Optional[str]]) -> Dict[str, List[ImageVariantInfo]]:
+    """一次 IN 查询取一批原图的衍生图，按宽度升序；没有衍生图的 URL 不出现在结果里"""
+    urls = {url for url in source_urls if storage.key_from_url(url) is not None}
+    if not urls:
+        return {}
+    stmt = (
+        select(ImageVariant)
+        .where(ImageVariant.source_url.in_(urls))
+        .order_by(ImageVariant.width, ImageVariant.format)
+    )
+    variants: Dict[str, List[ImageVariantInfo]] = {}
+    for row in (await db.execute(stmt)).scalars():
+        variants.setdefault(row.source_url, []).append(ImageVariantInfo.model_validate(row))
+    return variants
+
+
+class ImagePipeline:
+    def __init__(self, workers: int) -> None:
+        self.workers = workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn：不 fork 带着事件循环和线程池的父进程
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    async def process(self, filename: str) -> List[ImageVariantInfo]:
+        """生成并记录一张原图的衍生图 (重复处理会覆盖旧记录)"""
+        loop = asyncio.get_running_loop()
+        with tempfile.TemporaryDirectory(prefix="variants-") as work_dir:
+            source_path = storage.local_path(filename)
+            if source_path is None:
+                source_path = os.path.join(work_dir, os.path.basename(filename))
+                await run_io(storage.download, filename, source_path)
+            rendered = await loop.run_in_executor(
+                self._pool(),
+                render_variants,
+                source_path,
+                work_dir,
+                settings.IMAGE_VARIANT_WIDTHS,
+                settings.IMAGE_VARIANT_FORMATS,
+                settings.IMAGE_VARIANT_QUALITY,
+                settings.IMAGE_MAX_PIXELS,
+            )
+            await asyncio.gather(*(
+                run_io(storage.put_path, os.path.join(work_dir, name), f"{VARIANT_SUBDIR}/{name}", content_type_for(name))
+                for _, name, _, _, _ in rendered
+            ))
+        source_url = upload_url(filename)
+        rows = [
+            ImageVariant(
+                source_url=source_url,
+                url=upload_url(f"{VARIANT_SUBDIR}/{name}"),
+                format=fmt,
+                width=width,
+                height=height,
+                size=size,
+            )
+            for fmt, name, width, height, size in rendered
+        ]
+        async with AsyncSessionLocal() as db:
+            await db.execute(delete(ImageVariant).where(ImageVariant.source_url == source_url))
+            db.add_all(rows)
+            if not rows:
+                await db.merge(ImageVariantSkip(source_url=source_url))
+            await db.commit()
+            # 作者信息缓存里带着头像衍生图，用到这张图的用户要刷新 (延迟导入避免循环依赖)
+            from app.models.user import User
+            from app.utils.author_cache import author_cache
+
+            user_ids = (await db.execute(select(User.id).where(User.avatar == source_url))).scalars().all()
+            for user_id in user_ids:
+                author_cache.invalidate(user_id)
+        return [ImageVariantInfo.model_validate(row) for row in rows]
+
+    async def _run(self, filename: str) -> None:
+        try:
+            await self.process(filename)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("image variants failed for %s", filename)
+
+    def schedule(self, filename: str) -> None:
+        """上传成功后调用，不等待结果"""
+        if not settings.IMAGE_VARIANTS_ENABLED:
+            return
+        task = asyncio.create_task(self._run(filename))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def stop(self) -> None:
+        """关闭时丢弃未完成的任务，剩下的交给回填命令"""
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+image_pipeline = ImagePipeline(workers=settings.IMAGE_PROCESS_WORKERS)
+
+
+async def backfill_variants() -> int:
+    """为还没有衍生图记录 (也没被记为跳过) 的原图补生成，返回处理的文件数"""
+    async with AsyncSessionLocal() as db:
+        done = set((await db.execute(select(ImageVariant.source_url).distinct())).scalars().all())
+        done.update((await db.execute(select(ImageVariantSkip.source_url))).scalars().all())
+    # 只看顶层的原图，variants/ 下是衍生图
+    objects = await run_io(lambda: [obj.key for obj in storage.iter_objects() if "/" not in obj.key])
+    pending = [key for key in objects if upload_url(key) not in done]
+
+    processed = 0
+    for filename in pending:
+        try:
+            await image_pipeline.process(filename)
+            processed += 1
+        except Exception:
+            logger.exception("image variants failed for %s", filename)
+    await image_pipeline.stop()
+    return processed
+
+
+if __name__ == "__main__":
+    print(f"generated variants for {asyncio.run(backfill_variants())} images")
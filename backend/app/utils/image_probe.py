@@ -0,0 +1,148 @@
+# app/utils/image_probe.py
+"""
+不解码像素，只读文件头识别图片格式和尺寸
+
+客户端给的 content_type / 后缀都不可信：一个几十 KB 的 PNG 可以在 IHDR 里声明 50000×50000，
+交给 Pillow 解码就要占用数 GB 内存。上传时先用这里的函数读取文件头：
+- 按魔数识别 PNG / JPEG / GIF / WebP，其余一律拒绝
+- 从 PNG IHDR、JPEG SOFn、GIF 逻辑屏幕描述符、WebP VP8/VP8L/VP8X 头取宽高
+- 超过 IMAGE_MAX_SIDE / IMAGE_MAX_PIXELS 的直接拒绝，后续解码的 CPU 和内存都有上界
+JPEG 的 SOF 可能排在很大的 EXIF 段后面，按段长度 seek 跳过，不整段读入。
+"""
+import struct
+from dataclasses import dataclass
+from typing import BinaryIO
+
+# 各格式保存时使用的后缀 (文件名只由识别结果决定，不用客户端的后缀)
+EXTENSIONS = {"png": "png", "jpeg": "jpg", "gif": "gif", "webp": "webp"}
+
+HEAD_BYTES = 32
+# JPEG 中不带尺寸的 SOFn 编号：DHT / JPG 扩展 / DAC
+_JPEG_NON_SOF = {0xC4, 0xC8, 0xCC}
+# 扫描 SOF 时最多跳过的段数，防止构造出的超长段链
+_JPEG_MAX_SEGMENTS = 256
+
+
+class InvalidImage(Exception):
+    """不是支持的图片格式，或文件头损坏"""
+
+
+class ImageTooLarge(Exception):
+    def __init__(self, info: "ImageInfo"):
+        super().__init__(f"{info.width}x{info.height}")
+        self.info = info
+
+
+@dataclass(frozen=True)
+class ImageInfo:
+    format: str  # png / jpeg / gif / webp
+    width: int
+    height: int
+
+    @property
+    def pixels(self) -> int:
+        return self.width * self.height
+
+    @property
+    def extension(self) -> str:
+        return EXTENSIONS[self.format]
+
+
+def _read_exact(src: BinaryIO, size: int) -> bytes:
+    data = src.read(size)
+    if len(data) != size:
+        raise InvalidImage("truncated header")
+    return data
+
+
+def _probe_png(head: bytes) -> ImageInfo:
+    # 签名 8 字节 + IHDR 长度 4 字节 + "IHDR"，随后是宽高 (大端)
+    if head[12:16] != b"IHDR":
+        raise InvalidImage("missing IHDR")
+    width, height = struct.unpack(">II", head[16:24])
+    return ImageInfo("png", width, height)
+
+
+def _probe_gif(head: bytes) -> ImageInfo:
+    width, height = struct.unpack("<HH", head[6:10])
+    return ImageInfo("gif", width, height)
+
+
+def _probe_webp(head: bytes) -> ImageInfo:
+    chunk = head[12:16]
+    if chunk == b"VP8 ":
+        # 有损：帧头起始码 9d 01 2a 后是 14 位宽高
+        if head[23:26] != b"\x9d\x01\x2a":
+            raise InvalidImage("bad VP8 frame header")
+        width, height = struct.unpack("<HH", head[26:30])
+        return ImageInfo("webp", width & 0x3FFF, height & 0x3FFF)
+    if chunk == b"VP8L":
+        # 无损：签名 0x2f 后 28 位里依次是 14 位 (宽-1)、14 位 (高-1)
+        if head[20] != 0x2F:
+            raise InvalidImage("bad VP8L signature")
+        bits = int.from_bytes(head[21:25], "little")
+        return ImageInfo("webp", (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1)
+    if chunk == b"VP8X":
+        # 扩展格式 (带透明/动画)：24 位 (画布宽-1)、24 位 (画布高-1)
+        width = int.from_bytes(head[24:27], "little") + 1
+        height = int.from_bytes(head[27:30], "little") + 1
+        return ImageInfo("webp", width, height)
+    raise InvalidImage("unknown WebP chunk")
+
+
+def _probe_jpeg(src: BinaryIO) -> ImageInfo:
+    src.seek(2)  # 跳过 SOI
+    for _ in range(_JPEG_MAX_SEGMENTS):
+        marker = _read_exact(src, 2)
+        if marker[0] != 0xFF:
+            raise InvalidImage("bad JPEG marker")
+        code = marker[1]
+        # 段之间允许填充 0xFF
+        while code == 0xFF:
+            code = _read_exact(src, 1)[0]
+        # 不带长度的独立标记 (TEM / RSTn)
+        if code == 0x01 or 0xD0 <= code <= 0xD7:
+            continue
+        if code in (0xD9, 0xDA):
+            # 遇到 EOI / 扫描数据还没有 SOF，说明文件不完整
+            break
+        (length,) = struct.unpack(">H", _read_exact(src, 2))
+        if length < 2:
+            raise InvalidImage("bad JPEG segment length")
+        if 0xC0 <= code <= 0xCF and code not in _JPEG_NON_SOF:
+            _precision, height, width = struct.unpack(">BHH", _read_exact(src, 5))
+            return ImageInfo("jpeg", width, height)
+        src.seek(length - 2, 1)
+    raise InvalidImage("JPEG SOF not found")
+
+
+def probe_image(src: BinaryIO) -> ImageInfo:
+    """识别格式并读取宽高，只读文件头 (JPEG 按段跳读)；不支持或损坏时抛 InvalidImage"""
+    src.seek(0)
+    head = src.read(HEAD_BYTES)
+    try:
+        if head.startswith(b"\x89PNG\r\n\x1a\n"):
+            info = _probe_png(head)
+        elif head.startswith(b"\xff\xd8\xff"):
+            info = _probe_jpeg(src)
+        elif head[:6] in (b"GIF87a", b"GIF89a"):
+            info = _probe_gif(head)
+        elif head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+            info = _probe_webp(head)
+        else:
+            raise InvalidImage("unsupported format")
+    except (struct.error, IndexError):
+        raise InvalidImage("truncated header")
+    finally:
+        src.seek(0)
+    if info.width <= 0 or info.height <= 0:
+        raise InvalidImage("zero dimension")
+    return info
+
+
+def validate_image(src: BinaryIO, max_side: int, max_pixels: int) -> ImageInfo:
+    """probe_image + 尺寸上限检查，超限抛 ImageTooLarge"""
+    info = probe_image(src)
+    if max(info.width, info.height) > max_side or info.pixels > max_pixels:
+        raise ImageTooLarge(info)
+    return info
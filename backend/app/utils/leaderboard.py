@@ -0,0 +1,207 @@
+# app/utils/leaderboard.py
+"""
+作者排行榜
+
+榜单维度：指标 (likes 收到的点赞 / branches 发布的分支) × 周期 (all 总榜 / week 本周) × 范围 (全站 / 单个活动)。
+
+- Leaderboard：单个榜单，scores 字典 + 按 (-score, user_id) 排好序的列表，
+  取前 N 是切片，查"我的名次"是二分查找 O(log n)
+- LeaderboardService：后台任务周期刷新
+  * 增量：只读上次水位之后新增的点赞/新发布的节点，把增量加到对应榜单上
+  * 全量：每隔 LEADERBOARD_FULL_REBUILD_SECONDS (以及每周一零点) 重新聚合一次，
+    修正取消点赞、删除、驳回等增量看不到的变化；新榜单建好后整体替换，读请求不受影响
+
+只统计可见 (已发布/已完结) 节点收到的点赞和发布的分支。
+水位比当前时间落后 LEADERBOARD_LAG_SECONDS，给还没提交的事务留出余量；
+created_at / published_at 都由数据库 now() 生成，水位和"本周"也按数据库的 now() 计算，
+不受数据库会话时区影响；now() 只精确到秒，所以滞后必须大于 1 秒。
+每个 worker 各自维护一份，增量刷新只扫最近一小段数据，开销很小。
+"""
+import asyncio
+import logging
+import time
+from bisect import bisect_left, insort
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import case, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.story import NodeLike, StoryNode
+from app.utils.user_stats import VISIBLE_STATUSES
+
+logger = logging.getLogger(__name__)
+
+# (metric, period, book_id)，book_id 为 None 表示全站榜
+BoardKey = Tuple[str, str, Optional[int]]
+
+
+class Leaderboard:
+    def __init__(self) -> None:
+        self._scores: Dict[int, int] = {}
+        self._sorted: List[Tuple[int, int]] = []  # (-score, user_id) 升序 = 分数降序
+
+    def __len__(self) -> int:
+        return len(self._sorted)
+
+    def add(self, user_id: int, delta: int) -> None:
+        old = self._scores.get(user_id, 0)
+        if old:
+            del self._sorted[bisect_left(self._sorted, (-old, user_id))]
+        new = old + delta
+        if new > 0:
+            self._scores[user_id] = new
+            insort(self._sorted, (-new, user_id))
+        else:
+            self._scores.pop(user_id, None)
+
+    def _rank_of_score(self, score: int) -> int:
+        # 分数严格高于自己的人数 + 1 (并列同名次)
+        return bisect_left(self._sorted, (-score, 0)) + 1
+
+    def rank(self, user_id: int) -> Optional[Tuple[int, int]]:
+        """返回 (名次, 分数)，未上榜返回 None"""
+        score = self._scores.get(user_id)
+        if score is None:
+            return None
+        return self._rank_of_score(score), score
+
+    def top(self, limit: int, offset: int = 0) -> List[Tuple[int, int, int]]:
+        """返回 [(名次, user_id, 分数)]"""
+        entries = []
+        for neg_score, user_id in self._sorted[offset:offset + limit]:
+            entries.append((self._rank_of_score(-neg_score), user_id, -neg_score))
+        return entries
+
+
+def week_start(now: datetime) -> datetime:
+    """本周一 00:00 (与 now 同一时区)"""
+    day = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    return day - timedelta(days=day.weekday())
+
+
+class LeaderboardService:
+    def __init__(self, full_rebuild_seconds: int, lag_seconds: int) -> None:
+        self.full_rebuild_seconds = full_rebuild_seconds
+        self.lag_seconds = lag_seconds
+        self.boards: Dict[BoardKey, Leaderboard] = {}
+        self.updated_at: Optional[datetime] = None
+        self._watermark: Optional[datetime] = None
+        self._week_start: Optional[datetime] = None
+        self._last_full = 0.0
+        self._lock = asyncio.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self.updated_at is not None
+
+    def get(self, metric: str, period: str, book_id: Optional[int] = None) -> Leaderboard:
+        return self.boards.get((metric, period, book_id)) or Leaderboard()
+
+    @staticmethod
+    def _apply(boards: Dict[BoardKey, Leaderboard], metric: str, period: str, book_id: int, user_id: int, delta: int) -> None:
+        for key in ((metric, period, None), (metric, period, book_id)):
+            board = boards.get(key)
+            if board is None:
+                board = boards[key] = Leaderboard()
+            board.add(user_id, delta)
+
+    async def _likes(self, db: AsyncSession, since: Optional[datetime], until: datetime, this_week: datetime):
+        """按 (活动, 作者, 是否本周) 分组统计收到的点赞"""
+        in_week = case((NodeLike.created_at >= this_week, 1), else_=0)
+        stmt = (
+            select(StoryNode.book_id, StoryNode.author_id, in_week, func.count())
+            .select_from(NodeLike)
+            .join(StoryNode, NodeLike.node_id == StoryNode.id)
+            .where(StoryNode.status.in_(VISIBLE_STATUSES))
+            .where(NodeLike.created_at <= until)
+            .group_by(StoryNode.book_id, StoryNode.author_id, in_week)
+        )
+        if since is not None:
+            stmt = stmt.where(NodeLike.created_at > since)
+        return (await db.execute(stmt)).all()
+
+    async def _branches(self, db: AsyncSession, since: Optional[datetime], until: datetime, this_week: datetime):
+        """按 (活动, 作者, 是否本周) 分组统计已发布的分支"""
+        in_week = case((StoryNode.published_at >= this_week, 1), else_=0)
+        stmt = (
+            select(StoryNode.book_id, StoryNode.author_id, in_week, func.count())
+            .where(StoryNode.status.in_(VISIBLE_STATUSES))
+            .group_by(StoryNode.book_id, StoryNode.author_id, in_week)
+        )
+        if since is None:
+            # 全量：没有 published_at 的历史节点也计入总榜
+            stmt = stmt.where(or_(StoryNode.published_at.is_(None), StoryNode.published_at <= until))
+        else:
+            stmt = stmt.where(StoryNode.published_at > since, StoryNode.published_at <= until)
+        return (await db.execute(stmt)).all()
+
+    async def _fold(self, db, boards, since, until, this_week) -> None:
+        for metric, rows in (
+            ("likes", await self._likes(db, since, until, this_week)),
+            ("branches", await self._branches(db, since, until, this_week)),
+        ):
+            for book_id, author_id, in_week, count in rows:
+                self._apply(boards, metric, "all", book_id, author_id, int(count))
+                if in_week:
+                    self._apply(boards, metric, "week", book_id, author_id, int(count))
+
+    async def rebuild(self, db: AsyncSession, now: datetime) -> None:
+        until = now - timedelta(seconds=self.lag_seconds)
+        this_week = week_start(now)
+        boards: Dict[BoardKey, Leaderboard] = {}
+        await self._fold(db, boards, None, until, this_week)
+        # 整体替换，读请求看到的要么是旧榜要么是新榜
+        self.boards = boards
+        self._watermark = until
+        self._week_start = this_week
+        self._last_full = time.monotonic()
+        self.updated_at = datetime.utcnow()
+
+    async def increment(self, db: AsyncSession, now: datetime) -> None:
+        until = now - timedelta(seconds=self.lag_seconds)
+        if until <= self._watermark:
+            return
+        await self._fold(db, self.boards, self._watermark, until, self._week_start)
+        self._watermark = until
+        self.updated_at = datetime.utcnow()
+
+    async def refresh(self, db: AsyncSession) -> None:
+        async with self._lock:
+            # 和 created_at/published_at 用同一个时钟
+            now = (await db.execute(select(func.now()))).scalar_one()
+            need_full = (
+                not self.ready
+                or week_start(now) != self._week_start
+                or time.monotonic() - self._last_full >= self.full_rebuild_seconds
+            )
+            if need_full:
+                await self.rebuild(db, now)
+            else:
+                await self.increment(db, now)
+
+    async def ensure_ready(self, db: AsyncSession) -> None:
+        """首个请求早于后台任务时现建一次"""
+        if not self.ready:
+            await self.refresh(db)
+
+
+leaderboard = LeaderboardService(
+    full_rebuild_seconds=settings.LEADERBOARD_FULL_REBUILD_SECONDS,
+    lag_seconds=settings.LEADERBOARD_LAG_SECONDS,
+)
+
+
+async def run_leaderboard_loop() -> None:
+    """后台周期刷新任务"""
+    while True:
+        try:
+            async with AsyncSessionLocal() as db:
+                await leaderboard.refresh(db)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("leaderboard refresh failed")
+        await asyncio.sleep(settings.LEADERBOARD_REFRESH_SECONDS)
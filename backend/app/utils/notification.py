@@ -1,27 +1,109 @@
 # app/utils/notification.py
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from sqlalchemy import func, select
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.models.interaction import Notification, NotificationType
+from app.models.interaction import Notification, NotificationType, StoryComment
+from app.models.story import StoryNode
+from app.schemas.interaction import NotificationResponse
+from app.utils.author_cache import get_authors
+from app.utils.notification_outbox import enqueue_notification, enqueue_notifications
+from app.utils.user_stats import VISIBLE_STATUSES
+
+# 通知列表里评论摘要的长度
+COMMENT_EXCERPT_LENGTH = 80
+
 
 async def send_notification(
     db: AsyncSession,
     sender_id: int,    # 谁触发的 (如果是系统通知，可以是管理员ID，或者约定为0)
     receiver_id: int,  # 发给谁
     type: NotificationType,
-    target_id: int     # 关联的资源ID (通常是 node_id)
+    node_id: Optional[int] = None,     # 关联的故事节点
+    comment_id: Optional[int] = None,  # 关联的评论 (COMMENTED 类型)
 ):
     """
-    通用发送通知函数
+    通用发送通知函数：只写发件箱，真正的 Notification 由后台 worker 批量生成并推送
     """
     # 自己不通知自己
     if sender_id == receiver_id:
         return
 
-    notif = Notification(
-        user_id=receiver_id,
+    enqueue_notification(
+        db,
+        receiver_id=receiver_id,
         sender_id=sender_id,
         type=type,
-        target_id=target_id,
-        is_read=False
+        node_id=node_id,
+        comment_id=comment_id,
+    )
+    # 注意：这里不 commit，依赖调用方的 commit，发件箱和业务数据在同一事务里
+
+
+async def send_notifications(db: AsyncSession, notifications: Iterable[Dict[str, Any]]) -> None:
+    """
+    send_notification 的批量版 (如批量审核)：同样跳过自己通知自己，一次 INSERT 写入发件箱，不 commit
+    """
+    await enqueue_notifications(
+        db, [n for n in notifications if n.get("sender_id") != n["receiver_id"]]
     )
-    db.add(notif)
-    # 注意：这里不 commit，依赖调用方的 commit
\ No newline at end of file
+
+
+async def hydrate_notifications(
+    db: AsyncSession,
+    notifications: Sequence[Notification],
+) -> List[NotificationResponse]:
+    """
+    为一页通知批量补全发送者和目标信息 (节点标题/分支名、评论摘要)。
+    每种目标各一次 IN 查询，替代前端对每条通知单独请求节点；发送者走作者缓存。
+    待审核/被驳回节点的标题和分支名只给节点作者本人看。
+    """
+    senders = await get_authors(db, (n.sender_id for n in notifications))
+    node_ids = {n.node_id for n in notifications if n.node_id is not None}
+    comment_ids = {n.comment_id for n in notifications if n.comment_id is not None}
+
+    comments: Dict[int, tuple] = {}
+    if comment_ids:
+        # 只截取评论前若干字符，避免把长评论整条拉出来
+        rows = await db.execute(
+            select(
+                StoryComment.id,
+                StoryComment.node_id,
+                func.substr(StoryComment.content, 1, COMMENT_EXCERPT_LENGTH),
+            ).where(StoryComment.id.in_(comment_ids))
+        )
+        comments = {cid: (nid, excerpt) for cid, nid, excerpt in rows.all()}
+        # 只有 comment_id 的通知也能展示所属节点
+        node_ids.update(nid for nid, _ in comments.values())
+
+    nodes: Dict[int, tuple] = {}
+    if node_ids:
+        rows = await db.execute(
+            select(StoryNode.id, StoryNode.title, StoryNode.branch_name, StoryNode.status, StoryNode.author_id)
+            .where(StoryNode.id.in_(node_ids))
+        )
+        nodes = {nid: (title, branch, status, author_id) for nid, title, branch, status, author_id in rows.all()}
+
+    items: List[NotificationResponse] = []
+    for n in notifications:
+        comment_node_id, excerpt = comments.get(n.comment_id, (None, None))
+        node_id = n.node_id or comment_node_id
+        title, branch_name, status, author_id = nodes.get(node_id, (None, None, None, None))
+        if status not in VISIBLE_STATUSES and author_id != n.user_id:
+            title = branch_name = None
+        items.append(
+            NotificationResponse(
+                id=n.id,
+                type=n.type.value,
+                sender=senders.get(n.sender_id),
+                target_id=node_id,
+                node_id=node_id,
+                comment_id=n.comment_id,
+                node_title=title,
+                node_branch_name=branch_name,
+                comment_excerpt=excerpt,
+                is_read=n.is_read,
+                created_at=n.created_at,
+            )
+        )
+    return items
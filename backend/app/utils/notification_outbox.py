@@ -0,0 +1,223 @@
+# app/utils/notification_outbox.py
+"""
+通知发件箱 worker
+
+写接口通过 send_notification 在同一事务里写入 notification_outbox，
+这里的后台任务负责把发件箱批量转成 Notification：
+    1. SELECT ... FOR UPDATE SKIP LOCKED 取一批（多 worker 互不重复）
+    2. 按外键语义处理入队后被删掉的引用：接收者不在了丢弃 (CASCADE)，发送者/节点/评论不在了置空 (SET NULL)，
+       节点和评论都不在了丢弃 (通知必须有目标)
+    3. 批量 INSERT notifications 并取回自增 id (支持 RETURNING 的库一条多行 INSERT，MySQL 逐行取 lastrowid)，
+       DELETE 已处理的发件箱行，一次提交；整批失败 (检查之后引用又被并发删除等) 时逐行重试，
+       插不进去的行记日志后丢弃，不让一条坏数据卡住后面所有通知
+    4. 提交后更新未读计数缓存，并通过 broker 推送给接收者 (带通知 id，客户端可去重、按 id 设为已读)
+"""
+import asyncio
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set
+
+from sqlalchemy import delete, event, insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.interaction import Notification, NotificationOutbox, StoryComment
+from app.models.story import StoryNode
+from app.models.user import User
+from app.utils.pubsub import broker
+from app.utils.unread_counter import unread_counter
+
+logger = logging.getLogger(__name__)
+
+_WAKE_KEY = "notification_outbox_wake"
+
+
+async def _existing_ids(db: AsyncSession, column, ids: Iterable[Optional[int]]) -> Set[int]:
+    wanted = {i for i in ids if i is not None}
+    if not wanted:
+        return set()
+    return set((await db.execute(select(column).where(column.in_(wanted)))).scalars())
+
+
+class NotificationOutboxWorker:
+    def __init__(self, batch_size: int, poll_seconds: float) -> None:
+        self.batch_size = batch_size
+        self.poll_seconds = poll_seconds
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def wake(self) -> None:
+        """本进程有新事件提交时立即唤醒；其他进程写入的事件靠轮询兜底"""
+        self._wake.set()
+
+    def claim_stmt(self):
+        return (
+            select(NotificationOutbox)
+            .order_by(NotificationOutbox.id)
+            .limit(self.batch_size)
+            .with_for_update(skip_locked=True)
+        )
+
+    async def _resolve_references(self, db: AsyncSession, rows: Sequence[NotificationOutbox]) -> List[Dict[str, Any]]:
+        """按外键语义处理已被删除的用户/节点/评论，返回可以插入的通知字段"""
+        users = await _existing_ids(db, User.id, [r.receiver_id for r in rows] + [r.sender_id for r in rows])
+        nodes = await _existing_ids(db, StoryNode.id, (r.node_id for r in rows))
+        comments = await _existing_ids(db, StoryComment.id, (r.comment_id for r in rows))
+
+        values = []
+        for r in rows:
+            node_id = r.node_id if r.node_id in nodes else None
+            comment_id = r.comment_id if r.comment_id in comments else None
+            if r.receiver_id not in users or (node_id is None and comment_id is None):
+                logger.warning("dropping notification outbox row %s: receiver or target no longer exists", r.id)
+                continue
+            values.append({
+                "user_id": r.receiver_id,
+                "sender_id": r.sender_id if r.sender_id in users else None,
+                "type": r.type,
+                "node_id": node_id,
+                "comment_id": comment_id,
+                "is_read": False,
+                "created_at": r.created_at,
+            })
+        return values
+
+    async def _insert(self, db: AsyncSession, values: List[Dict[str, Any]]) -> List[Notification]:
+        # 走 ORM flush 而不是 insert() 列表：executemany 拿不回 id，推送里要带上
+        notifications = [Notification(**v) for v in values]
+        try:
+            async with db.begin_nested():
+                db.add_all(notifications)
+        except IntegrityError:
+            logger.warning("notification outbox batch failed, retrying row by row", exc_info=True)
+        else:
+            return notifications
+
+        inserted = []
+        for v in values:
+            notification = Notification(**v)
+            try:
+                async with db.begin_nested():
+                    db.add(notification)
+            except IntegrityError:
+                logger.warning("dropping notification outbox event %s", v, exc_info=True)
+                continue
+            inserted.append(notification)
+        return inserted
+
+    async def drain_once(self, db: AsyncSession) -> int:
+        rows = (await db.execute(self.claim_stmt())).scalars().all()
+        if not rows:
+            await db.rollback()
+            return 0
+
+        values = await self._resolve_references(db, rows)
+        notifications = await self._insert(db, values)
+        # 插入失败被丢弃的行也一并删除
+        await db.execute(delete(NotificationOutbox).where(NotificationOutbox.id.in_([r.id for r in rows])))
+        await db.commit()
+
+        for n in notifications:
+            unread_counter.incr(n.user_id)
+            await broker.publish(
+                f"user:{n.user_id}",
+                "notification",
+                {
+                    "id": n.id,
+                    "type": n.type.value,
+                    "sender_id": n.sender_id,
+                    "node_id": n.node_id,
+                    "comment_id": n.comment_id,
+                    "created_at": n.created_at,
+                },
+            )
+        return len(rows)
+
+    async def run(self) -> None:
+        while True:
+            try:
+                async with AsyncSessionLocal() as db:
+                    # 一次唤醒尽量把积压处理完
+                    while await self.drain_once(db) >= self.batch_size:
+                        pass
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("notification outbox drain failed")
+
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+
+outbox_worker = NotificationOutboxWorker(
+    batch_size=settings.NOTIFICATION_OUTBOX_BATCH_SIZE,
+    poll_seconds=settings.NOTIFICATION_OUTBOX_POLL_SECONDS,
+)
+
+
+def enqueue_notification(
+    db: AsyncSession,
+    receiver_id: int,
+    sender_id: Optional[int],
+    type,
+    node_id: Optional[int] = None,
+    comment_id: Optional[int] = None,
+) -> None:
+    """在调用方的事务里追加一条发件箱事件，不 commit"""
+    db.add(
+        NotificationOutbox(
+            receiver_id=receiver_id,
+            sender_id=sender_id,
+            type=type,
+            node_id=node_id,
+            comment_id=comment_id,
+        )
+    )
+    db.sync_session.info[_WAKE_KEY] = True
+
+
+async def enqueue_notifications(db: AsyncSession, events: Sequence[Dict[str, Any]]) -> None:
+    """
+    批量追加发件箱事件 (每条含 receiver_id/sender_id/type，可选 node_id/comment_id)，
+    一条多行 INSERT 写入，不 commit
+    """
+    if not events:
+        return
+    rows = [
+        {
+            "receiver_id": e["receiver_id"],
+            "sender_id": e.get("sender_id"),
+            "type": e["type"],
+            "node_id": e.get("node_id"),
+            "comment_id": e.get("comment_id"),
+        }
+        for e in events
+    ]
+    await db.execute(insert(NotificationOutbox), rows)
+    db.sync_session.info[_WAKE_KEY] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _wake_worker(session: Session) -> None:
+    if session.info.pop(_WAKE_KEY, False):
+        outbox_worker.wake()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_wake(session: Session) -> None:
+    session.info.pop(_WAKE_KEY, None)
@@ -0,0 +1,135 @@
+# app/utils/notification_retention.py
+"""
+通知保留策略
+
+- mark_read_in_chunks：按主键分批标记已读，避免一条 UPDATE 锁住重度用户的大段索引
+- archive_read_notifications：把已读且超过保留期的通知分批搬到 notifications_archive
+- run_archive_loop：后台周期任务，由 main.py 的 lifespan 启动
+
+也可以单独运行做一次归档（适合 cron）：
+    python -m app.utils.notification_retention
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.interaction import Notification, NotificationArchive, NotificationType
+
+logger = logging.getLogger(__name__)
+
+_ARCHIVE_COLUMNS = ["id", "user_id", "sender_id", "type", "node_id", "comment_id", "is_read", "created_at"]
+
+
+async def mark_read_in_chunks(
+    db: AsyncSession,
+    user_id: int,
+    type: Optional[NotificationType] = None,
+    chunk_size: Optional[int] = None,
+) -> int:
+    """
+    把用户的未读通知分批设为已读，每批单独提交，返回总共更新的行数
+    """
+    chunk_size = chunk_size or settings.NOTIFICATION_MARK_READ_CHUNK
+    total = 0
+    while True:
+        id_stmt = (
+            select(Notification.id)
+            .where(Notification.user_id == user_id)
+            .where(Notification.is_read == False)
+            .limit(chunk_size)
+        )
+        if type is not None:
+            id_stmt = id_stmt.where(Notification.type == type)
+        ids = (await db.execute(id_stmt)).scalars().all()
+        if not ids:
+            break
+
+        result = await db.execute(
+            update(Notification)
+            .where(Notification.id.in_(ids))
+            .values(is_read=True)
+        )
+        await db.commit()
+        total += result.rowcount or 0
+
+        if len(ids) < chunk_size:
+            break
+    return total
+
+
+async def archive_read_notifications(
+    db: AsyncSession,
+    older_than_days: Optional[int] = None,
+    batch_size: Optional[int] = None,
+) -> int:
+    """
+    把已读且早于保留期的通知搬到归档表，每批一个小事务，返回搬走的总行数
+    """
+    older_than_days = older_than_days or settings.NOTIFICATION_ARCHIVE_AFTER_DAYS
+    batch_size = batch_size or settings.NOTIFICATION_ARCHIVE_BATCH_SIZE
+    cutoff = datetime.now(timezone.utc) - timedelta(days=older_than_days)
+
+    total = 0
+    while True:
+        ids = (
+            await db.execute(
+                select(Notification.id)
+                .where(Notification.is_read == True)
+                .where(Notification.created_at < cutoff)
+                .order_by(Notification.id)
+                .limit(batch_size)
+            )
+        ).scalars().all()
+        if not ids:
+            break
+
+        source = select(*(getattr(Notification, c) for c in _ARCHIVE_COLUMNS)).where(Notification.id.in_(ids))
+        try:
+            await db.execute(
+                insert(NotificationArchive).from_select(_ARCHIVE_COLUMNS, source)
+            )
+            await db.execute(delete(Notification).where(Notification.id.in_(ids)))
+            await db.commit()
+        except Exception:
+            # 多个 worker 同时归档同一批时会主键冲突，让出这一轮即可
+            await db.rollback()
+            logger.exception("archive notifications batch failed")
+            break
+
+        total += len(ids)
+        if len(ids) < batch_size:
+            break
+        # 批次之间让出事件循环，避免长时间占用
+        await asyncio.sleep(0)
+    return total
+
+
+async def run_archive_loop() -> None:
+    """后台周期归档任务"""
+    while True:
+        try:
+            async with AsyncSessionLocal() as db:
+                moved = await archive_read_notifications(db)
+            if moved:
+                logger.info("archived %d notifications", moved)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("notification archive loop failed")
+        await asyncio.sleep(settings.NOTIFICATION_ARCHIVE_INTERVAL_SECONDS)
+
+
+async def _main() -> None:
+    async with AsyncSessionLocal() as db:
+        moved = await archive_read_notifications(db)
+    print(f"archived {moved} notifications")
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
@@ -0,0 +1,162 @@
+# app/utils/pubsub.py
+"""
+进程内发布/订阅 Broker，用于 SSE 实时推送
+
+- channel 约定：user:{user_id} 推送个人通知，book:{book_id} 推送故事树变化
+- 每个客户端一个有界队列，队列满时丢弃最旧的消息，发布方永远不会被慢客户端阻塞
+- 后端可插拔：local 只在当前进程内投递；redis 用 Redis PUB/SUB 在多个 worker 之间共享
+"""
+import asyncio
+import json
+import logging
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+Deliver = Callable[[str, str], None]
+
+
+class LocalBackend:
+    """单进程后端：publish 直接回调本进程的投递函数"""
+
+    def __init__(self) -> None:
+        self._deliver: Optional[Deliver] = None
+
+    async def start(self, deliver: Deliver) -> None:
+        self._deliver = deliver
+
+    async def stop(self) -> None:
+        self._deliver = None
+
+    async def publish(self, channel: str, payload: str) -> None:
+        if self._deliver is not None:
+            self._deliver(channel, payload)
+
+
+class RedisBackend:
+    """
+    多 worker 共享后端：所有 worker 订阅同一个前缀，publish 经 Redis 广播回每个 worker。
+    本地开发可用任意 Redis 兼容服务 (redis-server / valkey) 作为替身。
+    """
+
+    def __init__(self, url: str, prefix: str = "bifurcation:") -> None:
+        self.url = url
+        self.prefix = prefix
+        self._redis = None
+        self._pubsub = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self, deliver: Deliver) -> None:
+        # 可选依赖：只有启用 redis 后端时才需要安装
+        import redis.asyncio as aioredis
+
+        self._redis = aioredis.from_url(self.url, decode_responses=True)
+        self._pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+        await self._pubsub.psubscribe(f"{self.prefix}*")
+        self._task = asyncio.create_task(self._listen(deliver))
+
+    async def _listen(self, deliver: Deliver) -> None:
+        async for message in self._pubsub.listen():
+            channel = message["channel"][len(self.prefix):]
+            deliver(channel, message["data"])
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._pubsub is not None:
+            await self._pubsub.aclose()
+            self._pubsub = None
+        if self._redis is not None:
+            await self._redis.aclose()
+            self._redis = None
+
+    async def publish(self, channel: str, payload: str) -> None:
+        await self._redis.publish(f"{self.prefix}{channel}", payload)
+
+
+class Subscription:
+    """单个客户端连接的订阅，持有一个有界队列"""
+
+    def __init__(self, broker: "PubSubBroker", channels: List[str], queue_size: int) -> None:
+        self.broker = broker
+        self.channels = channels
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = 0
+
+    def put_nowait(self, payload: str) -> None:
+        try:
+            self.queue.put_nowait(payload)
+        except asyncio.QueueFull:
+            # 慢客户端：丢掉最旧的一条，保留最新状态
+            self.queue.get_nowait()
+            self.queue.put_nowait(payload)
+            self.dropped += 1
+
+    async def get(self, timeout: float) -> Optional[str]:
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self) -> None:
+        self.broker.unsubscribe(self)
+
+    def __enter__(self) -> "Subscription":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+class PubSubBroker:
+    def __init__(self, backend, queue_size: int) -> None:
+        self.backend = backend
+        self.queue_size = queue_size
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+
+    async def start(self) -> None:
+        await self.backend.start(self._deliver)
+
+    async def stop(self) -> None:
+        await self.backend.stop()
+
+    def subscribe(self, channels: List[str]) -> Subscription:
+        sub = Subscription(self, channels, self.queue_size)
+        for channel in channels:
+            self._subscribers.setdefault(channel, set()).add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        for channel in sub.channels:
+            subs = self._subscribers.get(channel)
+            if subs is None:
+                continue
+            subs.discard(sub)
+            if not subs:
+                del self._subscribers[channel]
+
+    def _deliver(self, channel: str, payload: str) -> None:
+        # 只做 put_nowait，不 await 任何客户端
+        for sub in list(self._subscribers.get(channel, ())):
+            sub.put_nowait(payload)
+
+    async def publish(self, channel: str, event_type: str, data: Dict[str, Any]) -> None:
+        payload = json.dumps({"event": event_type, "data": data}, default=str, ensure_ascii=False)
+        try:
+            await self.backend.publish(channel, payload)
+        except Exception:
+            # 推送失败不影响主流程，客户端还可以靠轮询兜底
+            logger.exception("publish to %s failed", channel)
+
+
+def _build_backend():
+    if settings.PUBSUB_BACKEND == "redis":
+        return RedisBackend(settings.PUBSUB_REDIS_URL)
+    return LocalBackend()
+
+
+broker = PubSubBroker(_build_backend(), queue_size=settings.PUBSUB_CLIENT_QUEUE_SIZE)
+
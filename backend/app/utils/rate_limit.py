@@ -0,0 +1,117 @@
+# app/utils/rate_limit.py
+"""
+令牌桶限流
+
+- 每个 key (如 "api:1.2.3.4"、"email-code:a@b.com") 一个桶，容量 capacity，每秒补充 refill_per_second
+- 每次请求按 cost 扣令牌，不够时拒绝并给出需要等待的秒数
+- 后端可插拔：memory 为进程内；redis 用 Lua 脚本原子扣减，多 worker 共享额度
+"""
+import math
+import time
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+from app.core.config import settings
+from app.utils.ttl_cache import TTLCache
+
+
+@dataclass(frozen=True)
+class RateLimitRule:
+    capacity: float
+    refill_per_second: float
+
+
+class InMemoryBackend:
+    def __init__(self, max_keys: int) -> None:
+        # 桶不设过期，超出上限时淘汰最久未访问的桶 (它们大概率已经回满)
+        self._buckets: TTLCache[str, Tuple[float, float]] = TTLCache(None, max_keys)
+
+    async def consume(self, key: str, rule: RateLimitRule, cost: float) -> Tuple[bool, float]:
+        now = time.monotonic()
+
+        def take(bucket: Optional[Tuple[float, float]]):
+            tokens, updated_at = bucket or (rule.capacity, now)
+            tokens = min(rule.capacity, tokens + (now - updated_at) * rule.refill_per_second)
+            if tokens >= cost:
+                return (tokens - cost, now), (True, 0.0)
+            return (tokens, now), (False, (cost - tokens) / rule.refill_per_second)
+
+        return self._buckets.compute(key, take)
+
+
+_TOKEN_BUCKET_LUA = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local cost = tonumber(ARGV[4])
+local data = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(data[1]) or capacity
+local ts = tonumber(data[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+local retry_after = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+else
+    retry_after = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return {allowed, tostring(retry_after)}
+"""
+
+
+class RedisBackend:
+    def __init__(self, url: str, prefix: str = "ratelimit:") -> None:
+        # 可选依赖：只有启用 redis 后端时才需要安装
+        import redis.asyncio as aioredis
+
+        self.prefix = prefix
+        self._redis = aioredis.from_url(url)
+        self._script = self._redis.register_script(_TOKEN_BUCKET_LUA)
+
+    async def consume(self, key: str, rule: RateLimitRule, cost: float) -> Tuple[bool, float]:
+        allowed, retry_after = await self._script(
+            keys=[f"{self.prefix}{key}"],
+            args=[rule.capacity, rule.refill_per_second, time.time(), cost],
+        )
+        return bool(int(allowed)), float(retry_after)
+
+
+class RateLimiter:
+    def __init__(self, backend, enabled: bool = True) -> None:
+        self.backend = backend
+        self.enabled = enabled
+
+    async def hit(self, key: str, rule: RateLimitRule, cost: float = 1) -> Tuple[bool, int]:
+        """扣减令牌，返回 (是否放行, 建议等待秒数)"""
+        if not self.enabled:
+            return True, 0
+        allowed, retry_after = await self.backend.consume(key, rule, cost)
+        return allowed, int(math.ceil(retry_after))
+
+
+# 常用规则
+API_RULE = RateLimitRule(
+    capacity=settings.RATE_LIMIT_API_CAPACITY,
+    refill_per_second=settings.RATE_LIMIT_API_REFILL_PER_SECOND,
+)
+AUTH_RULE = RateLimitRule(
+    capacity=settings.RATE_LIMIT_AUTH_CAPACITY,
+    refill_per_second=settings.RATE_LIMIT_AUTH_REFILL_PER_SECOND,
+)
+# 同一邮箱 1 分钟只能发一次验证码
+EMAIL_CODE_RULE = RateLimitRule(capacity=1, refill_per_second=1 / 60)
+# 同一邮箱 10 分钟内最多尝试 5 次重置密码 / 激活邮箱，防止暴力猜验证码
+PASSWORD_RESET_RULE = RateLimitRule(capacity=5, refill_per_second=5 / 600)
+EMAIL_VERIFY_RULE = RateLimitRule(capacity=5, refill_per_second=5 / 600)
+
+
+def _build_backend():
+    if settings.RATE_LIMIT_BACKEND == "redis":
+        return RedisBackend(settings.RATE_LIMIT_REDIS_URL)
+    return InMemoryBackend(max_keys=settings.RATE_LIMIT_MAX_KEYS)
+
+
+limiter = RateLimiter(_build_backend(), enabled=settings.RATE_LIMIT_ENABLED)
@@ -1,14 +1,240 @@
 # 发送邮件验证码
+"""
+邮件发件队列
+
+接口里调用 send_email_code 只是把邮件放进内存队列，立即返回；
+后台 EmailOutbox 批量取出，复用同一个 SMTP 连接逐封发送；
+失败的邮件按各自的重试次数指数退避，到点后再放回队列，等待期间不阻塞其他邮件的发送。
+EMAIL_BACKEND=console 时只打印到控制台（开发环境默认）。
+"""
+import asyncio
+import logging
+import smtplib
+from dataclasses import dataclass
+from email.message import EmailMessage
+from typing import Dict, List, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class QueuedEmail:
+    message: EmailMessage
+    attempts: int = 0
+
+
+class ConsoleTransport:
+    """开发环境：只打印，不真正发送"""
+
+    def send_many(self, messages: List[EmailMessage]) -> List[EmailMessage]:
+        for msg in messages:
+            print(f"Sending email to {msg['To']}: {msg['Subject']}\n{msg.get_content()}")
+        return []
+
+    def close(self) -> None:
+        pass
+
+
+class SMTPTransport:
+    """同步 smtplib 实现，在线程里调用；连接在批次之间复用，队列空闲时关闭"""
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        use_tls: bool = False,
+        timeout: float = 10,
+    ) -> None:
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.timeout = timeout
+        self._conn: Optional[smtplib.SMTP] = None
+
+    def _connect(self) -> smtplib.SMTP:
+        if self._conn is not None:
+            try:
+                self._conn.noop()
+                return self._conn
+            except smtplib.SMTPException:
+                self.close()
+        conn = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.use_tls:
+            conn.starttls()
+        if self.username:
+            conn.login(self.username, self.password or "")
+        self._conn = conn
+        return conn
+
+    def send_many(self, messages: List[EmailMessage]) -> List[EmailMessage]:
+        """逐封发送，返回发送失败需要重试的邮件；连接级错误直接抛出，整批重试"""
+        conn = self._connect()
+        failed: List[EmailMessage] = []
+        for msg in messages:
+            try:
+                conn.send_message(msg)
+            except smtplib.SMTPServerDisconnected:
+                self.close()
+                raise
+            except smtplib.SMTPException:
+                logger.exception("send email to %s failed", msg["To"])
+                failed.append(msg)
+        return failed
+
+    def close(self) -> None:
+        # 先摘下连接再 quit：发送循环空闲关闭和 stop() 可能在两个线程里同时调用，同一连接只 quit 一次
+        conn, self._conn = self._conn, None
+        if conn is None:
+            return
+        try:
+            conn.quit()
+        except (smtplib.SMTPException, OSError):
+            pass
+
+
+class EmailOutbox:
+    def __init__(
+        self,
+        transport,
+        batch_size: int,
+        max_retries: int,
+        queue_size: int,
+        backoff_seconds: float = 1.0,
+    ) -> None:
+        self.transport = transport
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._task: Optional[asyncio.Task] = None
+        # 等待退避到点、尚未放回队列的重试：id(QueuedEmail) -> 定时器
+        self._retries: Dict[int, asyncio.TimerHandle] = {}
+        self._retries_idle = asyncio.Event()
+        self._retries_idle.set()
+
+    def enqueue(self, message: EmailMessage) -> None:
+        self.queue.put_nowait(QueuedEmail(message))
+
+    def _requeue(self, e: QueuedEmail) -> None:
+        self._retries.pop(id(e), None)
+        if not self._retries:
+            self._retries_idle.set()
+        try:
+            self.queue.put_nowait(e)
+        except asyncio.QueueFull:
+            logger.error("email outbox full, drop retry to %s", e.message["To"])
+
+    def _schedule_retry(self, e: QueuedEmail) -> None:
+        """按这封邮件自己的重试次数退避 (封顶 60 秒)，到点后放回队列；不占用发送循环"""
+        delay = min(self.backoff_seconds * 2 ** (e.attempts - 1), 60)
+        self._retries[id(e)] = asyncio.get_running_loop().call_later(delay, self._requeue, e)
+        self._retries_idle.clear()
+
+    async def _next_batch(self) -> List[QueuedEmail]:
+        batch = [await self.queue.get()]
+        while len(batch) < self.batch_size and not self.queue.empty():
+            batch.append(self.queue.get_nowait())
+        return batch
+
+    async def _send_batch(self, batch: List[QueuedEmail]) -> None:
+        try:
+            failed_messages = await asyncio.to_thread(self.transport.send_many, [e.message for e in batch])
+            failed_ids = {id(m) for m in failed_messages}
+            failed = [e for e in batch if id(e.message) in failed_ids]
+        except Exception:
+            logger.exception("email batch of %d failed", len(batch))
+            failed = batch
+
+        for e in failed:
+            e.attempts += 1
+            if e.attempts > self.max_retries:
+                logger.error("drop email to %s after %d attempts", e.message["To"], e.attempts)
+                continue
+            self._schedule_retry(e)
+
+    async def run(self) -> None:
+        while True:
+            batch = await self._next_batch()
+            try:
+                await self._send_batch(batch)
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+            if self.queue.empty():
+                await asyncio.to_thread(self.transport.close)
+
+    async def drain(self) -> None:
+        """等待当前队列全部处理完（含重试）"""
+        while True:
+            await self.queue.join()
+            if not self._retries:
+                return
+            await self._retries_idle.wait()
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self, timeout: float = 10) -> None:
+        if self._task is None:
+            return
+        # 关闭前尽量把队列里的邮件发完
+        try:
+            await asyncio.wait_for(self.drain(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning(
+                "email outbox stopped with %d unsent emails", self.queue.qsize() + len(self._retries)
+            )
+        for handle in self._retries.values():
+            handle.cancel()
+        self._retries.clear()
+        self._retries_idle.set()
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        await asyncio.to_thread(self.transport.close)
+
+
+def _build_transport():
+    if settings.EMAIL_BACKEND == "smtp":
+        return SMTPTransport(
+            host=settings.SMTP_HOST,
+            port=settings.SMTP_PORT,
+            username=settings.SMTP_USERNAME,
+            password=settings.SMTP_PASSWORD,
+            use_tls=settings.SMTP_USE_TLS,
+        )
+    return ConsoleTransport()
+
+
+email_outbox = EmailOutbox(
+    _build_transport(),
+    batch_size=settings.EMAIL_BATCH_SIZE,
+    max_retries=settings.EMAIL_MAX_RETRIES,
+    queue_size=settings.EMAIL_QUEUE_SIZE,
+)
+
+
+def build_code_email(email: str, code: str) -> EmailMessage:
+    msg = EmailMessage()
+    msg["From"] = settings.SMTP_FROM
+    msg["To"] = email
+    msg["Subject"] = f"{settings.PROJECT_NAME} 验证码"
+    msg.set_content(f"您的验证码是 {code}，{settings.VERIFICATION_CODE_TTL_MINUTES} 分钟内有效。如非本人操作请忽略。")
+    return msg
 
 
 async def send_email_code(email: str, code: str) -> None:
     """
-    模拟发送邮件验证码的功能。在生产环境中，应集成实际的邮件服务。
+    把验证码邮件放进发件队列后立即返回，真正的 SMTP 往返由后台完成。
     """
-    # 模拟发送邮件的逻辑
     try:
-        print(f"Sending email to {email} with code: {code}")
-        # 这里可以集成实际的邮件发送服务，例如 SMTP、SendGrid、Amazon SES 等
-    except Exception as e:
-        print(f"Failed to send email to {email}: {e}")
-        raise
\ No newline at end of file
+        email_outbox.enqueue(build_code_email(email, code))
+    except asyncio.QueueFull:
+        logger.error("email outbox full, drop code email to %s", email)
+        raise
@@ -0,0 +1,232 @@
+# app/utils/static_files.py
+"""
+静态文件服务 (/static)
+
+上传文件按内容哈希命名，写入后不再改变，因此可以让浏览器/CDN 长期缓存：
+- uploads/ 下：Cache-Control: public, max-age=一年, immutable
+- 其余静态资源：Cache-Control: public, max-age=STATIC_MAX_AGE_SECONDS
+- ETag 采用 nginx 的格式 "mtime-size" (十六进制，强校验)，Python 和 nginx 出同一个值，
+  切换到 nginx 直出后客户端缓存不会失效；Last-Modified / If-None-Match / Range / If-Range 由 FileResponse 处理
+- 可压缩的文本类资源 (svg/css/js/json...) 如果旁边有预压缩的 .br / .gz，按 Accept-Encoding 直接返回
+
+生产环境建议让 nginx 直接出静态文件，Python worker 不再搬运字节。离线模式预压缩并生成 nginx 配置：
+    python -m app.utils.static_files --precompress --nginx deploy/nginx-static.conf
+"""
+import argparse
+import gzip
+import mimetypes
+import os
+import shutil
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, PathLike, StaticFiles
+from starlette.types import Scope
+
+from app.core.config import settings
+
+IMMUTABLE_PREFIXES = ("uploads/",)
+# (Content-Encoding, 文件后缀)，按优先级排列
+PRECOMPRESSED_ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+COMPRESSIBLE_TYPES = ("text/", "image/svg+xml", "application/javascript", "application/json", "application/xml")
+# 太小的文件压缩收益抵不过额外的请求头
+PRECOMPRESS_MIN_BYTES = 1024
+
+
+def is_compressible(path: str) -> bool:
+    media_type = mimetypes.guess_type(path)[0] or ""
+    return media_type.startswith(COMPRESSIBLE_TYPES)
+
+
+def cache_control_for(rel_path: str) -> str:
+    if rel_path.startswith(IMMUTABLE_PREFIXES):
+        return f"public, max-age={settings.STATIC_IMMUTABLE_MAX_AGE_SECONDS}, immutable"
+    return f"public, max-age={settings.STATIC_MAX_AGE_SECONDS}"
+
+
+def accepted_encodings(accept_encoding: str) -> List[str]:
+    """
+    按 Accept-Encoding 的 q 值挑出可用的预压缩编码，q 高的在前，同分按 PRECOMPRESSED_ENCODINGS 的顺序；
+    q=0 表示明确拒绝，"*" 匹配没有单独列出的编码
+    """
+    weights: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value.strip())
+                except ValueError:
+                    q = 0.0
+        weights[coding] = q
+    wildcard = weights.get("*", 0.0)
+    ranked = [(weights.get(encoding, wildcard), encoding) for encoding, _ in PRECOMPRESSED_ENCODINGS]
+    return [encoding for q, encoding in sorted(ranked, key=lambda item: -item[0]) if q > 0]
+
+
+def etag_for(stat_result: os.stat_result) -> str:
+    """与 nginx 相同的 ETag："<mtime 秒, 十六进制>-<size, 十六进制>" """
+    return f'"{int(stat_result.st_mtime):x}-{stat_result.st_size:x}"'
+
+
+class CachedStaticFiles(StaticFiles):
+    def __init__(self, *args, precompressed: bool = True, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.precompressed = precompressed
+
+    def _precompressed_sibling(
+        self, full_path: PathLike, request_headers: Headers
+    ) -> Optional[Tuple[str, str, os.stat_result]]:
+        """返回 (编码, 路径, stat)；只对文本类资源查找，图片等已压缩格式不多做一次 stat"""
+        accept = request_headers.get("accept-encoding", "")
+        if not accept or not is_compressible(str(full_path)):
+            return None
+        suffixes = dict(PRECOMPRESSED_ENCODINGS)
+        for encoding in accepted_encodings(accept):
+            sibling = f"{full_path}{suffixes[encoding]}"
+            try:
+                return encoding, sibling, os.stat(sibling)
+            except OSError:
+                continue
+        return None
+
+    def file_response(
+        self,
+        full_path: PathLike,
+        stat_result: os.stat_result,
+        scope: Scope,
+        status_code: int = 200,
+    ) -> Response:
+        request_headers = Headers(scope=scope)
+        rel_path = os.path.relpath(full_path, self.directory).replace(os.sep, "/")
+        media_type = mimetypes.guess_type(str(full_path))[0] or "application/octet-stream"
+        headers = {
+            "cache-control": cache_control_for(rel_path),
+            "etag": etag_for(stat_result),
+            "accept-ranges": "bytes",
+        }
+
+        path = full_path
+        # Range 请求按原文件的字节偏移计算，不返回压缩版本
+        if self.precompressed and status_code == 200 and "range" not in request_headers:
+            sibling = self._precompressed_sibling(full_path, request_headers)
+            if sibling is not None:
+                encoding, path, stat_result = sibling
+                headers["content-encoding"] = encoding
+                headers["etag"] = etag_for(stat_result)
+            if is_compressible(str(full_path)):
+                headers["vary"] = "Accept-Encoding"
+
+        response = FileResponse(
+            path,
+            status_code=status_code,
+            headers=headers,
+            media_type=media_type,
+            stat_result=stat_result,
+        )
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
+
+# ==========================================
+# 🧰 离线模式：预压缩 + 生成 nginx 配置
+# ==========================================
+def iter_files(root: str) -> Iterator[os.DirEntry]:
+    """os.scandir 递归遍历，跳过隐藏文件 (上传临时文件) 和预压缩产物"""
+    with os.scandir(root) as entries:
+        for entry in entries:
+            if entry.name.startswith("."):
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                yield from iter_files(entry.path)
+            elif entry.is_file(follow_symlinks=False) and not entry.name.endswith((".gz", ".br")):
+                yield entry
+
+
+def precompress(root: str) -> int:
+    """为文本类资源生成 .gz (装了 brotli 时另生成 .br)，已是最新的跳过，返回生成的文件数"""
+    try:
+        import brotli  # 可选依赖
+    except ImportError:
+        brotli = None
+
+    written = 0
+    for entry in iter_files(root):
+        stat_result = entry.stat()
+        if stat_result.st_size < PRECOMPRESS_MIN_BYTES or not is_compressible(entry.path):
+            continue
+        for encoding, suffix in PRECOMPRESSED_ENCODINGS:
+            if encoding == "br" and brotli is None:
+                continue
+            target = entry.path + suffix
+            if os.path.exists(target) and os.stat(target).st_mtime >= stat_result.st_mtime:
+                continue
+            temp_path = f"{target}.part"
+            with open(entry.path, "rb") as src:
+                if encoding == "br":
+                    with open(temp_path, "wb") as dst:
+                        dst.write(brotli.compress(src.read()))
+                else:
+                    with gzip.GzipFile(temp_path, "wb", compresslevel=9, mtime=int(stat_result.st_mtime)) as dst:
+                        shutil.copyfileobj(src, dst)
+            # 与原文件同 mtime，nginx gzip_static 生成的 ETag 也随原文件变化
+            os.utime(temp_path, (stat_result.st_atime, stat_result.st_mtime))
+            os.replace(temp_path, target)
+            written += 1
+    return written
+
+
+def nginx_config(root: str, url_prefix: str = "/static/") -> str:
+    """生成可 include 到 server {} 里的 location 配置，缓存策略与 CachedStaticFiles 一致"""
+    root = os.path.abspath(root).rstrip("/") + "/"
+    blocks = []
+    for prefix in IMMUTABLE_PREFIXES:
+        blocks.append(
+            f"location {url_prefix}{prefix} {{\n"
+            f"    alias {root}{prefix};\n"
+            f"    etag on;\n"
+            f"    gzip_static on;\n"
+            f"    add_header Cache-Control \"public, max-age={settings.STATIC_IMMUTABLE_MAX_AGE_SECONDS}, immutable\";\n"
+            f"}}\n"
+        )
+    blocks.append(
+        f"location {url_prefix} {{\n"
+        f"    alias {root};\n"
+        f"    etag on;\n"
+        f"    gzip_static on;\n"
+        f"    # brotli_static on;  # 需要 ngx_brotli 模块\n"
+        f"    add_header Cache-Control \"public, max-age={settings.STATIC_MAX_AGE_SECONDS}\";\n"
+        f"    gzip_vary on;\n"
+        f"}}\n"
+    )
+    return "# 由 python -m app.utils.static_files 生成，勿手动修改\n" + "\n".join(blocks)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="静态文件预压缩 / 生成 nginx 配置")
+    parser.add_argument("--root", default="static", help="静态文件目录")
+    parser.add_argument("--precompress", action="store_true", help="为文本类资源生成 .gz/.br")
+    parser.add_argument("--nginx", metavar="PATH", help="nginx 配置输出路径，- 表示标准输出")
+    args = parser.parse_args()
+
+    if args.precompress:
+        print(f"precompressed {precompress(args.root)} files")
+    if args.nginx:
+        config = nginx_config(args.root)
+        if args.nginx == "-":
+            print(config)
+        else:
+            with open(args.nginx, "w", encoding="utf-8") as f:
+                f.write(config)
+            print(f"wrote {args.nginx}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,379 @@
+# app/utils/storage.py
+"""
+上传文件的存储后端
+
+业务代码只和 key 打交道 (如 "<sha256>.png"、"variants/<sha256>_96.webp")，不关心文件实际放在哪：
+- local：存在 UPLOAD_DIR，经 /static/uploads/ 对外提供 (单机，或多节点挂同一块共享盘)
+- s3：任意 S3 兼容服务 (AWS S3 / MinIO / R2 ...)，多个应用节点共享同一份文件
+
+除了经 API 进程中转的上传，还支持直传：presign_upload 签发一个有时效的 PUT 地址，
+客户端把文件直接 PUT 过去，大文件不经过 Python worker；
+s3 签的是 S3 预签名 URL，内容 sha256 由 S3 校验；local 签的是本服务 /uploads/direct 的令牌地址，
+两种后端协议一致，前端不用区分。下载同理：s3 没有公开读地址时，/uploads/files/{key} 跳转到预签名 GET。
+
+后端方法都是同步阻塞的 (boto3 本身是同步库)，调用方用 run_io 放到专用 IO 线程池里执行。
+本地开发可用 moto server / MinIO 作为 S3 替身：
+    STORAGE_BACKEND=s3 S3_ENDPOINT_URL=http://127.0.0.1:9000 S3_BUCKET=uploads
+"""
+import asyncio
+import base64
+import mimetypes
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from threading import Lock
+from typing import Any, BinaryIO, Callable, Dict, Iterator, Optional, TypeVar
+
+from jose import JWTError, jwt
+
+from app.core.config import settings
+
+TEMP_PREFIX = ".upload-"
+TEMP_SUFFIX = ".part"
+DIRECT_UPLOAD_SCOPE = "direct_upload"
+
+T = TypeVar("T")
+
+_io_executor = ThreadPoolExecutor(
+    max_workers=settings.UPLOAD_IO_WORKERS,
+    thread_name_prefix="upload-io",
+)
+
+
+async def run_io(fn: Callable[..., T], *args: Any) -> T:
+    """在上传专用线程池里执行阻塞的存储操作，不占用事件循环，也不和其他 to_thread 调用抢线程"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_io_executor, fn, *args)
+
+
+def content_type_for(key: str) -> str:
+    return mimetypes.guess_type(key)[0] or "application/octet-stream"
+
+
+@dataclass(frozen=True)
+class StoredObject:
+    key: str
+    size: int
+    modified_at: float  # unix 时间戳
+
+
+@dataclass(frozen=True)
+class PresignedUpload:
+    url: str
+    method: str = "PUT"
+    headers: Dict[str, str] = field(default_factory=dict)  # 客户端 PUT 时必须原样带上的请求头
+    expires_in: int = 0
+
+
+class InvalidUploadToken(Exception):
+    pass
+
+
+class LocalStorage:
+    """本地目录后端；直传地址指向本服务的 /uploads/direct，令牌用 SECRET_KEY 签名"""
+
+    name = "local"
+
+    def __init__(self, root: str, url_prefix: str = "/static/uploads/") -> None:
+        self.root = os.path.abspath(root)
+        self.url_prefix = url_prefix
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        path = os.path.normpath(os.path.join(self.root, key))
+        if not path.startswith(self.root + os.sep):
+            raise ValueError(f"invalid key: {key}")
+        return path
+
+    def url(self, key: str) -> str:
+        return f"{self.url_prefix}{key}"
+
+    def key_from_url(self, url: Optional[str]) -> Optional[str]:
+        if url and url.startswith(self.url_prefix):
+            return url[len(self.url_prefix):]
+        return None
+
+    def local_path(self, key: str) -> Optional[str]:
+        """文件在本机上的路径 (图片处理直接读，不用下载)"""
+        return self._path(key)
+
+    def exists(self, key: str) -> bool:
+        return os.path.isfile(self._path(key))
+
+    def stat(self, key: str) -> Optional[StoredObject]:
+        try:
+            st = os.stat(self._path(key))
+        except FileNotFoundError:
+            return None
+        return StoredObject(key=key, size=st.st_size, modified_at=st.st_mtime)
+
+    def put_file(self, src: BinaryIO, key: str, content_type: Optional[str] = None) -> None:
+        """分块写同目录下的临时文件，成功后原子改名，静态目录里不会出现写了一半的文件"""
+        path = self._path(key)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=TEMP_PREFIX, suffix=TEMP_SUFFIX)
+        try:
+            with os.fdopen(fd, "wb") as dst:
+                src.seek(0)
+                shutil.copyfileobj(src, dst, settings.UPLOAD_CHUNK_SIZE)
+            # mkstemp 默认 0600，改成静态服务器 (nginx 等) 可读
+            os.chmod(temp_path, 0o644)
+            os.replace(temp_path, path)
+        except BaseException:
+            try:
+                os.unlink(temp_path)
+            except FileNotFoundError:
+                pass
+            raise
+
+    def put_path(self, path: str, key: str, content_type: Optional[str] = None) -> None:
+        """把本机上已生成好的文件放进存储 (会移走原文件)"""
+        target = self._path(key)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.move(path, target)
+        os.chmod(target, 0o644)
+
+    def download(self, key: str, path: str) -> None:
+        shutil.copyfile(self._path(key), path)
+
+    def read_head(self, key: str, length: int) -> bytes:
+        with open(self._path(key), "rb") as f:
+            return f.read(length)
+
+    def delete(self, key: str) -> None:
+        try:
+            os.unlink(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def _walk(self, prefix: str, temp: bool) -> Iterator[StoredObject]:
+        """os.scandir 逐个目录流式遍历；temp=False 时跳过隐藏文件，temp=True 时只返回写入中途留下的临时文件"""
+        stack = [self._path(prefix) if prefix else self.root]
+        while stack:
+            directory = stack.pop()
+            try:
+                entries = os.scandir(directory)
+            except FileNotFoundError:
+                continue
+            with entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        if not entry.name.startswith("."):
+                            stack.append(entry.path)
+                        continue
+                    if not entry.is_file(follow_symlinks=False):
+                        continue
+                    is_temp = entry.name.startswith(".") or entry.name.endswith(TEMP_SUFFIX)
+                    if is_temp != temp:
+                        continue
+                    st = entry.stat(follow_symlinks=False)
+                    key = os.path.relpath(entry.path, self.root).replace(os.sep, "/")
+                    yield StoredObject(key=key, size=st.st_size, modified_at=st.st_mtime)
+
+    def iter_objects(self, prefix: str = "") -> Iterator[StoredObject]:
+        return self._walk(prefix, temp=False)
+
+    def iter_temp_files(self) -> Iterator[StoredObject]:
+        """写入中途进程被杀留下的临时文件 (.upload-*.part 等)，由 upload_gc 按宽限期清理"""
+        return self._walk("", temp=True)
+
+    def presign_upload(self, key: str, content_type: str, size: int, sha256: str, expires_in: int) -> PresignedUpload:
+        claims = {
+            "scope": DIRECT_UPLOAD_SCOPE,
+            "key": key,
+            "ct": content_type,
+            "size": size,
+            "sha256": sha256,
+            "exp": datetime.now(timezone.utc) + timedelta(seconds=expires_in),
+        }
+        token = jwt.encode(claims, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+        return PresignedUpload(
+            url=f"{settings.API_V1_STR}/uploads/direct?token={token}",
+            headers={"Content-Type": content_type},
+            expires_in=expires_in,
+        )
+
+    def verify_upload_token(self, token: str) -> Dict[str, Any]:
+        """校验直传令牌，返回签发时的 key/ct/size/sha256"""
+        try:
+            claims = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        except JWTError as e:
+            raise InvalidUploadToken(str(e))
+        if claims.get("scope") != DIRECT_UPLOAD_SCOPE:
+            raise InvalidUploadToken("wrong scope")
+        return claims
+
+    def presign_download(self, key: str, expires_in: int) -> str:
+        # 静态目录本来就公开可读
+        return self.url(key)
+
+
+class S3Storage:
+    """
+    S3 兼容后端。boto3 是可选依赖，只有启用 s3 后端时才需要安装；
+    客户端是线程安全的，全进程共用一个 (连接池大小与 IO 线程数一致)。
+    """
+
+    name = "s3"
+
+    def __init__(
+        self,
+        bucket: str,
+        endpoint_url: Optional[str] = None,
+        region: Optional[str] = None,
+        access_key_id: Optional[str] = None,
+        secret_access_key: Optional[str] = None,
+        public_base_url: Optional[str] = None,
+    ) -> None:
+        self.bucket = bucket
+        self.endpoint_url = endpoint_url
+        self.region = region
+        self.access_key_id = access_key_id
+        self.secret_access_key = secret_access_key
+        # 桶公开读 (或前面有 CDN) 时直接拼地址；否则经 /uploads/files/{key} 换预签名地址
+        if public_base_url:
+            self.url_prefix = public_base_url.rstrip("/") + "/"
+        else:
+            self.url_prefix = f"{settings.API_V1_STR}/uploads/files/"
+        self._client = None
+        self._lock = Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    import boto3
+                    from botocore.config import Config
+
+                    self._client = boto3.client(
+                        "s3",
+                        endpoint_url=self.endpoint_url,
+                        region_name=self.region,
+                        aws_access_key_id=self.access_key_id,
+                        aws_secret_access_key=self.secret_access_key,
+                        config=Config(
+                            signature_version="s3v4",
+                            max_pool_connections=settings.UPLOAD_IO_WORKERS,
+                        ),
+                    )
+        return self._client
+
+    @staticmethod
+    def _is_not_found(error: Exception) -> bool:
+        code = getattr(error, "response", {}).get("Error", {}).get("Code")
+        return code in ("404", "NoSuchKey", "NotFound")
+
+    def url(self, key: str) -> str:
+        return f"{self.url_prefix}{key}"
+
+    def key_from_url(self, url: Optional[str]) -> Optional[str]:
+        if url and url.startswith(self.url_prefix):
+            return url[len(self.url_prefix):]
+        return None
+
+    def local_path(self, key: str) -> Optional[str]:
+        return None
+
+    def exists(self, key: str) -> bool:
+        return self.stat(key) is not None
+
+    def stat(self, key: str) -> Optional[StoredObject]:
+        from botocore.exceptions import ClientError
+
+        try:
+            head = self.client.head_object(Bucket=self.bucket, Key=key)
+        except ClientError as e:
+            if self._is_not_found(e):
+                return None
+            raise
+        return StoredObject(key=key, size=head["ContentLength"], modified_at=head["LastModified"].timestamp())
+
+    def _put_args(self, key: str, content_type: Optional[str]) -> Dict[str, str]:
+        # key 按内容哈希命名，对象不会变，和本地静态目录一样允许长期缓存
+        return {
+            "ContentType": content_type or content_type_for(key),
+            "CacheControl": f"public, max-age={settings.STATIC_IMMUTABLE_MAX_AGE_SECONDS}, immutable",
+        }
+
+    def put_file(self, src: BinaryIO, key: str, content_type: Optional[str] = None) -> None:
+        # 单个 PUT 是原子的：读者要么看到完整对象，要么看不到
+        src.seek(0)
+        self.client.upload_fileobj(src, self.bucket, key, ExtraArgs=self._put_args(key, content_type))
+
+    def put_path(self, path: str, key: str, content_type: Optional[str] = None) -> None:
+        self.client.upload_file(path, self.bucket, key, ExtraArgs=self._put_args(key, content_type))
+        os.unlink(path)
+
+    def download(self, key: str, path: str) -> None:
+        self.client.download_file(self.bucket, key, path)
+
+    def read_head(self, key: str, length: int) -> bytes:
+        """Range GET 只取文件头，识别图片尺寸不用下载整个文件"""
+        obj = self.client.get_object(Bucket=self.bucket, Key=key, Range=f"bytes=0-{length - 1}")
+        return obj["Body"].read()
+
+    def delete(self, key: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=key)
+
+    def iter_objects(self, prefix: str = "") -> Iterator[StoredObject]:
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix):
+            for obj in page.get("Contents", ()):
+                yield StoredObject(key=obj["Key"], size=obj["Size"], modified_at=obj["LastModified"].timestamp())
+
+    def iter_temp_files(self) -> Iterator[StoredObject]:
+        # 单个 PUT 是原子的，不会留下临时对象；未完成的分片上传交给桶的生命周期规则 (AbortIncompleteMultipartUpload)
+        return iter(())
+
+    def presign_upload(self, key: str, content_type: str, size: int, sha256: str, expires_in: int) -> PresignedUpload:
+        # 把 sha256 签进 URL：客户端必须带同样的 x-amz-checksum-sha256 头，内容不符时 S3 直接拒绝写入
+        checksum = base64.b64encode(bytes.fromhex(sha256)).decode()
+        params = {
+            "Bucket": self.bucket,
+            "Key": key,
+            "ContentType": content_type,
+            "ContentLength": size,
+            "ChecksumSHA256": checksum,
+            **{k: v for k, v in self._put_args(key, content_type).items() if k != "ContentType"},
+        }
+        url = self.client.generate_presigned_url("put_object", Params=params, ExpiresIn=expires_in)
+        return PresignedUpload(
+            url=url,
+            headers={
+                "Content-Type": content_type,
+                "x-amz-checksum-sha256": checksum,
+                "Cache-Control": params["CacheControl"],
+            },
+            expires_in=expires_in,
+        )
+
+    def verify_upload_token(self, token: str) -> Dict[str, Any]:
+        raise InvalidUploadToken("direct uploads go to S3")
+
+    def presign_download(self, key: str, expires_in: int) -> str:
+        return self.client.generate_presigned_url(
+            "get_object",
+            Params={"Bucket": self.bucket, "Key": key},
+            ExpiresIn=expires_in,
+        )
+
+
+def _build_backend():
+    if settings.STORAGE_BACKEND == "s3":
+        return S3Storage(
+            bucket=settings.S3_BUCKET,
+            endpoint_url=settings.S3_ENDPOINT_URL,
+            region=settings.S3_REGION,
+            access_key_id=settings.S3_ACCESS_KEY_ID,
+            secret_access_key=settings.S3_SECRET_ACCESS_KEY,
+            public_base_url=settings.S3_PUBLIC_BASE_URL,
+        )
+    return LocalStorage(settings.UPLOAD_DIR)
+
+
+storage = _build_backend()
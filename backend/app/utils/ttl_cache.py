@@ -0,0 +1,104 @@
+# app/utils/ttl_cache.py
+"""
+进程内 LRU + TTL 缓存
+
+未读计数、Principal、作者信息、限流令牌桶、内存验证码都是"按 key 存一小份状态，条数封顶，过期作废"，
+共用这一份实现：OrderedDict 维护访问顺序，超出 max_entries 时淘汰最久未访问的条目；
+一把 threading.Lock 保护所有读写，同步方法在事件循环里直接调用即可。
+"""
+import math
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Callable, Dict, Generic, Hashable, Iterable, Optional, Tuple, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+R = TypeVar("R")
+
+
+class TTLCache(Generic[K, V]):
+    """ttl_seconds 为 None 时条目不过期，只按 LRU 淘汰"""
+
+    def __init__(self, ttl_seconds: Optional[float], max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._data: "OrderedDict[K, tuple[V, float]]" = OrderedDict()
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def _expires_at(self, now: float) -> float:
+        return math.inf if self.ttl_seconds is None else now + self.ttl_seconds
+
+    def _live(self, key: K, now: float) -> Optional["tuple[V, float]"]:
+        """调用方持锁：取未过期的条目，过期的顺带删除"""
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        if entry[1] < now:
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return entry
+
+    def _store(self, key: K, value: V, expires_at: float) -> None:
+        """调用方持锁"""
+        self._data[key] = (value, expires_at)
+        self._data.move_to_end(key)
+
+    def _evict(self) -> None:
+        """调用方持锁"""
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def get(self, key: K) -> Optional[V]:
+        with self._lock:
+            entry = self._live(key, time.monotonic())
+            return None if entry is None else entry[0]
+
+    def get_many(self, keys: Iterable[K]) -> Dict[K, V]:
+        """返回命中的部分"""
+        now = time.monotonic()
+        found: Dict[K, V] = {}
+        with self._lock:
+            for key in keys:
+                entry = self._live(key, now)
+                if entry is not None:
+                    found[key] = entry[0]
+        return found
+
+    def set(self, key: K, value: V) -> None:
+        self.set_many(((key, value),))
+
+    def set_many(self, items: Iterable[Tuple[K, V]]) -> None:
+        expires_at = self._expires_at(time.monotonic())
+        with self._lock:
+            for key, value in items:
+                self._store(key, value, expires_at)
+            self._evict()
+
+    def compute(
+        self,
+        key: K,
+        fn: Callable[[Optional[V]], Tuple[Optional[V], R]],
+        keep_expiry: bool = False,
+    ) -> R:
+        """
+        原子地读-改-写：fn(旧值或 None) 返回 (新值, 结果)，新值为 None 时不写入；返回 fn 的结果。
+        keep_expiry=True 时已有条目沿用原来的过期时间 (只修正值，不续期)。
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._live(key, now)
+            value, result = fn(None if entry is None else entry[0])
+            if value is not None:
+                expires_at = entry[1] if keep_expiry and entry is not None else self._expires_at(now)
+                self._store(key, value, expires_at)
+                self._evict()
+            return result
+
+    def pop(self, key: K) -> None:
+        with self._lock:
+            self._data.pop(key, None)
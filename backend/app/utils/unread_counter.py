@@ -0,0 +1,104 @@
+# app/utils/unread_counter.py
+from threading import Lock
+from typing import Dict, List, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.interaction import Notification
+from app.utils.ttl_cache import TTLCache
+
+
+class UnreadCounter:
+    """
+    进程内的未读通知计数缓存 (LRU + TTL)
+
+    - 命中时直接返回，不碰数据库
+    - 过期或未命中时由 get_unread_count 走 ix_notifications_user_isread_created 索引重新对账
+    - 多 worker 部署时各进程各自缓存，TTL 保证最终一致
+    - COUNT 期间该用户的计数有变化 (incr/reset/invalidate) 时，COUNT 结果可能已经过时，不写入缓存：
+      begin_load 记下代数，每次变化代数 +1，finish_load 时代数不变才写入
+    """
+
+    def __init__(self, ttl_seconds: int, max_entries: int):
+        self._cache: TTLCache[int, int] = TTLCache(ttl_seconds, max_entries)
+        # 正在从数据库对账的用户 -> [并发对账数, 代数]；只在对账期间存在，条数不超过并发请求数
+        self._loading: Dict[int, List[int]] = {}
+        self._lock = Lock()
+
+    def get(self, user_id: int) -> Optional[int]:
+        return self._cache.get(user_id)
+
+    def _changed(self, user_id: int) -> None:
+        """调用方持锁"""
+        entry = self._loading.get(user_id)
+        if entry is not None:
+            entry[1] += 1
+
+    def begin_load(self, user_id: int) -> int:
+        """COUNT 之前调用，返回当前代数"""
+        with self._lock:
+            entry = self._loading.setdefault(user_id, [0, 0])
+            entry[0] += 1
+            return entry[1]
+
+    def finish_load(self, user_id: int, generation: int, count: Optional[int]) -> None:
+        """COUNT 之后调用 (失败时 count 传 None)：期间没有变化才写入缓存"""
+        with self._lock:
+            entry = self._loading[user_id]
+            entry[0] -= 1
+            fresh = entry[1] == generation
+            if entry[0] == 0:
+                del self._loading[user_id]
+            if fresh and count is not None:
+                self._cache.set(user_id, max(count, 0))
+
+    def incr(self, user_id: int, delta: int = 1) -> None:
+        """只在已缓存时累加；未缓存的用户下次读取时会从数据库对账"""
+        with self._lock:
+            self._changed(user_id)
+            self._cache.compute(
+                user_id,
+                lambda count: (None if count is None else max(count + delta, 0), None),
+                keep_expiry=True,
+            )
+
+    def reset(self, user_id: int) -> None:
+        with self._lock:
+            self._changed(user_id)
+            self._cache.set(user_id, 0)
+
+    def invalidate(self, user_id: int) -> None:
+        with self._lock:
+            self._changed(user_id)
+            self._cache.pop(user_id)
+
+
+unread_counter = UnreadCounter(
+    ttl_seconds=settings.UNREAD_COUNT_CACHE_TTL_SECONDS,
+    max_entries=settings.UNREAD_COUNT_CACHE_MAX_ENTRIES,
+)
+
+
+async def get_unread_count(db: AsyncSession, user_id: int) -> int:
+    """
+    获取用户未读通知数：优先读缓存，未命中时按 (user_id, is_read) 索引 COUNT 一次
+    """
+    cached = unread_counter.get(user_id)
+    if cached is not None:
+        return cached
+
+    generation = unread_counter.begin_load(user_id)
+    count: Optional[int] = None
+    stmt = (
+        select(func.count())
+        .select_from(Notification)
+        .where(Notification.user_id == user_id)
+        .where(Notification.is_read == False)
+    )
+    try:
+        count = (await db.execute(stmt)).scalar() or 0
+    finally:
+        unread_counter.finish_load(user_id, generation, count)
+    return count
@@ -0,0 +1,253 @@
+# app/utils/upload_gc.py
+"""
+上传文件垃圾回收
+
+换封面/换头像、上传后没用上的图片都不会被删除，上传目录只增不减。GC 分三步：
+1. 引用集合：按主键分批扫 users.avatar、story_books.cover_image、story_nodes.content，
+   从中提取上传文件的标识 (新文件名是 sha256，按内容寻址之前的旧文件名是 uuid4；
+   URL 前缀是相对路径还是 CDN 地址都能识别)；
+   宽限期内被上传过 (含命中去重) 的内容也算引用，给"刚上传、还没保存表单"的情况留余量
+2. 流式遍历存储 (本地为 os.scandir，s3 为 ListObjectsV2 分页)，标识不在引用集合里、
+   且修改时间早于宽限期的原图和衍生图判为孤儿；内存里只保留引用集合和孤儿列表，与目录大小无关
+3. 先删孤儿的 upload_blobs 记录 (同一事务里确认宽限期内没有再被上传)，再删文件：
+   记录删掉后并发上传同一内容不会命中去重，而是重新写文件；
+   最后分批删掉 image_variants / image_variant_skips 记录，写入中途留下的临时文件一并清理
+
+默认只出报告不删除：
+    python -m app.utils.upload_gc              # dry-run
+    python -m app.utils.upload_gc --delete     # 真正删除
+也可以配置 UPLOAD_GC_INTERVAL_SECONDS 由 main.py 的 lifespan 周期执行。
+"""
+import argparse
+import asyncio
+import logging
+import posixpath
+import re
+import time
+from datetime import datetime, timezone
+from dataclasses import dataclass, field
+from typing import AsyncIterator, List, Optional, Set
+
+from sqlalchemy import delete, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.story import StoryNode
+from app.models.story_book import StoryBook
+from app.models.upload import ImageVariant, ImageVariantSkip, UploadBlob
+from app.models.user import User
+from app.utils.image_pipeline import upload_url
+from app.utils.storage import StoredObject, run_io, storage
+
+logger = logging.getLogger(__name__)
+
+# 原图 "<sha256>.<ext>"，衍生图 "variants/<sha256>_<宽>.<ext>"；按内容寻址之前的旧文件是 "<uuid4>.<ext>"
+UPLOAD_KEY_RE = re.compile(
+    r"([0-9a-f]{64}|[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})"
+    r"(?:_\d+)?\.(?:png|jpg|jpeg|gif|webp)"
+)
+REPORT_SAMPLE_SIZE = 20
+
+
+@dataclass
+class GcReport:
+    dry_run: bool
+    referenced: int = 0  # 引用集合里的上传标识数
+    scanned: int = 0
+    orphans: List[StoredObject] = field(default_factory=list)
+    temp_files: List[StoredObject] = field(default_factory=list)
+    deleted: int = 0
+    failed: int = 0
+
+    @property
+    def orphan_bytes(self) -> int:
+        return sum(obj.size for obj in self.orphans) + sum(obj.size for obj in self.temp_files)
+
+    def summary(self) -> str:
+        action = "would delete" if self.dry_run else "deleted"
+        count = len(self.orphans) + len(self.temp_files) if self.dry_run else self.deleted
+        lines = [
+            f"referenced:        {self.referenced}",
+            f"scanned objects:   {self.scanned}",
+            f"orphans:           {len(self.orphans)} (+{len(self.temp_files)} stale temp files)",
+            f"{action}: {count} files, {self.orphan_bytes / 1024 / 1024:.2f} MiB",
+        ]
+        if self.failed:
+            lines.append(f"failed: {self.failed}")
+        for obj in (self.orphans + self.temp_files)[:REPORT_SAMPLE_SIZE]:
+            lines.append(f"  {obj.key}  {obj.size}B  {time.strftime('%Y-%m-%d %H:%M', time.localtime(obj.modified_at))}")
+        return "\n".join(lines)
+
+
+def upload_id(key: str) -> Optional[str]:
+    """存储 key 对应的上传标识 (sha256 或旧文件的 uuid4)；不是上传接口产生的文件返回 None"""
+    match = UPLOAD_KEY_RE.fullmatch(posixpath.basename(key))
+    return match.group(1) if match else None
+
+
+def content_hash(key: str) -> Optional[str]:
+    """按内容寻址的文件返回 sha256 (upload_blobs 主键)，旧文件没有记录，返回 None"""
+    ident = upload_id(key)
+    return ident if ident is not None and len(ident) == 64 else None
+
+
+async def _iter_column(db: AsyncSession, pk, column, batch_size: int) -> AsyncIterator[str]:
+    """按主键 keyset 分页取一列非空值，每批一条查询，不一次性把整表读进内存"""
+    last_id = 0
+    while True:
+        rows = (
+            await db.execute(
+                select(pk, column)
+                .where(pk > last_id)
+                .where(column.isnot(None))
+                .order_by(pk)
+                .limit(batch_size)
+            )
+        ).all()
+        for _, value in rows:
+            yield value
+        if len(rows) < batch_size:
+            break
+        last_id = rows[-1][0]
+
+
+async def collect_referenced_ids(db: AsyncSession, grace_cutoff: float, batch_size: int) -> Set[str]:
+    referenced: Set[str] = set()
+    for pk, column in (
+        (User.id, User.avatar),
+        (StoryBook.id, StoryBook.cover_image),
+        (StoryNode.id, StoryNode.content),
+    ):
+        async for value in _iter_column(db, pk, column, batch_size):
+            # 正文里可能嵌了多张图
+            referenced.update(match.group(1) for match in UPLOAD_KEY_RE.finditer(value))
+
+    # 宽限期内 (重新) 上传过的内容：可能正要被保存为头像/封面
+    since = datetime.fromtimestamp(grace_cutoff, tz=timezone.utc)
+    recent = await db.execute(select(UploadBlob.sha256).where(UploadBlob.last_uploaded_at >= since))
+    referenced.update(recent.scalars())
+    return referenced
+
+
+async def _release_blobs(db: AsyncSession, report: GcReport, grace_cutoff: float, batch_size: int) -> None:
+    """
+    删文件之前先删 upload_blobs 记录，每批一个事务：先删宽限期外的，剩下的就是扫描期间又被上传
+    (命中去重刷新了 last_uploaded_at) 的，从孤儿里去掉。记录删掉之后并发上传同一内容不会再命中去重，
+    而是重新写文件 (_delete_objects 删除前还会再看一眼修改时间)
+    """
+    hashes = list({h for h in (content_hash(obj.key) for obj in report.orphans) if h is not None})
+    since = datetime.fromtimestamp(grace_cutoff, tz=timezone.utc)
+    revived: Set[str] = set()
+    for i in range(0, len(hashes), batch_size):
+        chunk = hashes[i:i + batch_size]
+        await db.execute(
+            delete(UploadBlob)
+            .where(UploadBlob.sha256.in_(chunk))
+            .where(UploadBlob.last_uploaded_at < since)
+        )
+        rows = await db.execute(select(UploadBlob.sha256).where(UploadBlob.sha256.in_(chunk)))
+        revived.update(rows.scalars())
+        await db.commit()
+    if revived:
+        report.orphans = [obj for obj in report.orphans if content_hash(obj.key) not in revived]
+
+
+def _find_orphans(referenced: Set[str], grace_cutoff: float, report: GcReport) -> None:
+    """在线程里执行：流式遍历存储，只把孤儿留在内存里"""
+    for obj in storage.iter_objects():
+        report.scanned += 1
+        if obj.modified_at >= grace_cutoff:
+            continue
+        ident = upload_id(obj.key)
+        # 不认识的文件 (不是上传接口产生的) 不碰
+        if ident is not None and ident not in referenced:
+            report.orphans.append(obj)
+    report.temp_files.extend(obj for obj in storage.iter_temp_files() if obj.modified_at < grace_cutoff)
+
+
+def _delete_objects(objs: List[StoredObject], grace_cutoff: float, report: GcReport) -> List[StoredObject]:
+    """在线程里执行：逐个删除，返回删除成功的 (失败的留到下一轮)；扫描后被重新写过的跳过"""
+    deleted = []
+    for obj in objs:
+        try:
+            current = storage.stat(obj.key)
+            if current is None or current.modified_at >= grace_cutoff:
+                continue
+            storage.delete(obj.key)
+        except Exception:
+            report.failed += 1
+            logger.exception("failed to delete upload %s", obj.key)
+            continue
+        deleted.append(obj)
+    report.deleted += len(deleted)
+    return deleted
+
+
+async def _delete_records(db: AsyncSession, orphans: List[StoredObject], batch_size: int) -> None:
+    """分批删掉孤儿文件对应的衍生图记录，每批一个小事务 (upload_blobs 在删文件前已由 _release_blobs 删掉)"""
+    urls = [upload_url(obj.key) for obj in orphans]
+    for i in range(0, len(urls), batch_size):
+        chunk = urls[i:i + batch_size]
+        await db.execute(
+            delete(ImageVariant).where(or_(ImageVariant.source_url.in_(chunk), ImageVariant.url.in_(chunk)))
+        )
+        await db.execute(delete(ImageVariantSkip).where(ImageVariantSkip.source_url.in_(chunk)))
+        await db.commit()
+
+
+async def collect_upload_garbage(
+    db: AsyncSession,
+    dry_run: bool = True,
+    grace_seconds: Optional[int] = None,
+    batch_size: Optional[int] = None,
+) -> GcReport:
+    grace_seconds = settings.UPLOAD_GC_GRACE_HOURS * 3600 if grace_seconds is None else grace_seconds
+    batch_size = batch_size or settings.UPLOAD_GC_BATCH_SIZE
+    # 先定截止时间再收集引用：收集期间新上传的文件一定晚于截止时间，不会被误删
+    grace_cutoff = time.time() - grace_seconds
+
+    report = GcReport(dry_run=dry_run)
+    referenced = await collect_referenced_ids(db, grace_cutoff, batch_size)
+    report.referenced = len(referenced)
+    await run_io(_find_orphans, referenced, grace_cutoff, report)
+    if dry_run:
+        return report
+
+    await _release_blobs(db, report, grace_cutoff, batch_size)
+    await run_io(_delete_objects, report.temp_files, grace_cutoff, report)
+    deleted = await run_io(_delete_objects, report.orphans, grace_cutoff, report)
+    await _delete_records(db, deleted, batch_size)
+    return report
+
+
+async def run_upload_gc_loop() -> None:
+    """后台周期 GC 任务"""
+    while True:
+        await asyncio.sleep(settings.UPLOAD_GC_INTERVAL_SECONDS)
+        try:
+            async with AsyncSessionLocal() as db:
+                report = await collect_upload_garbage(db, dry_run=False)
+            if report.deleted:
+                logger.info(
+                    "upload gc deleted %d files (%.2f MiB)", report.deleted, report.orphan_bytes / 1024 / 1024
+                )
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("upload gc loop failed")
+
+
+async def _main(dry_run: bool, grace_hours: Optional[float]) -> None:
+    grace_seconds = None if grace_hours is None else int(grace_hours * 3600)
+    async with AsyncSessionLocal() as db:
+        report = await collect_upload_garbage(db, dry_run=dry_run, grace_seconds=grace_seconds)
+    print(report.summary())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="清理没有被引用的上传文件 (默认只出报告)")
+    parser.add_argument("--delete", action="store_true", help="真正删除，不加时为 dry-run")
+    parser.add_argument("--grace-hours", type=float, default=None, help="只删除早于该时长的文件")
+    args = parser.parse_args()
+    asyncio.run(_main(dry_run=not args.delete, grace_hours=args.grace_hours))
@@ -0,0 +1,268 @@
+# app/utils/upload_store.py
+"""
+上传文件入库 (按内容寻址，自动去重)
+
+- 文件放在哪由存储后端 (app.utils.storage) 决定，这里只管校验、去重和 upload_blobs 记录
+- 所有阻塞操作都经 run_io 在专用线程池里跑，慢磁盘/慢网络/大文件不会卡住事件循环上的其他请求
+- 先只读文件头识别图片格式和宽高 (image_probe)，格式不支持或像素超限直接拒绝，不做完整解码
+- 再对上传内容分块计算 sha256，同时累计字节数，超过上限立即中止
+- 以哈希作 key：upload_blobs 表里已有同一内容时直接返回已有 URL，只刷新 last_uploaded_at，不再写存储
+
+两种上传方式共用同一套校验和记录：
+- 经 API 中转：save_upload
+- 直传：prepare_direct_upload 签发地址和完成凭证 (已有相同内容时直接复用，客户端不用传) →
+  客户端 PUT 到存储 → complete_direct_upload 凭完成凭证读回文件头校验后入库；
+  凭证绑定 key/sha256/大小和申请人，不能拿它去"完成"别人的或已有的文件
+"""
+import hashlib
+import io
+import tempfile
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, AsyncIterator, BinaryIO, Dict, Optional, Tuple
+
+from fastapi import UploadFile
+from jose import JWTError, jwt
+from sqlalchemy import func, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.upload import UploadBlob
+from app.utils.image_probe import EXTENSIONS, ImageInfo, InvalidImage, validate_image
+from app.utils.storage import InvalidUploadToken, PresignedUpload, content_type_for, run_io, storage
+
+# 直传完成时读回的文件头长度：JPEG 的 SOF 可能排在几十 KB 的 EXIF 后面
+PROBE_HEAD_BYTES = 256 * 1024
+COMPLETE_UPLOAD_SCOPE = "complete_upload"
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+class EmptyUpload(Exception):
+    pass
+
+
+class UploadMismatch(Exception):
+    """直传的内容与签发时声明的不一致，或还没有上传"""
+
+
+@dataclass(frozen=True)
+class StoredUpload:
+    filename: str  # 存储里的 key
+    created: bool  # False 表示命中已有内容，没有写存储
+
+
+@dataclass(frozen=True)
+class DirectUploadTicket:
+    filename: str
+    upload: Optional[PresignedUpload]  # None 表示已有相同内容，不用再传
+    complete_token: Optional[str] = None  # 上传后调用 complete_direct_upload 的凭证
+
+
+def _hash_limited(src: BinaryIO, max_bytes: int, chunk_size: int) -> Tuple[str, int]:
+    """在线程里执行：分块计算 sha256，超限抛 UploadTooLarge，返回 (哈希, 字节数)"""
+    digest = hashlib.sha256()
+    size = 0
+    src.seek(0)
+    while True:
+        chunk = src.read(chunk_size)
+        if not chunk:
+            break
+        size += len(chunk)
+        if size > max_bytes:
+            raise UploadTooLarge(size)
+        digest.update(chunk)
+    if size == 0:
+        raise EmptyUpload()
+    return digest.hexdigest(), size
+
+
+async def inspect_image(file: UploadFile) -> ImageInfo:
+    """读文件头校验图片，不支持抛 InvalidImage，尺寸超限抛 ImageTooLarge"""
+    return await run_io(validate_image, file.file, settings.IMAGE_MAX_SIDE, settings.IMAGE_MAX_PIXELS)
+
+
+async def _touch(db: AsyncSession, sha256: str) -> bool:
+    """刷新最近上传时间，upload_gc 在宽限期内不会删它；记录已不存在 (刚被 GC 删掉) 时返回 False"""
+    result = await db.execute(
+        update(UploadBlob)
+        .where(UploadBlob.sha256 == sha256)
+        .values(last_uploaded_at=func.now())
+    )
+    return result.rowcount > 0
+
+
+async def _reuse_existing(db: AsyncSession, blob: Optional[UploadBlob]) -> bool:
+    """内容已存在 (记录和文件都在) 时直接复用；GC 先删记录再删文件，刷新不到记录就当作不存在，重新写文件"""
+    if blob is not None and await run_io(storage.exists, blob.filename):
+        return await _touch(db, blob.sha256)
+    return False
+
+
+async def _record_blob(db: AsyncSession, blob: Optional[UploadBlob], sha256: str, filename: str, size: int) -> None:
+    # 记录还在但文件曾被清理，这次补写的是同一内容
+    if blob is not None:
+        if await _touch(db, sha256):
+            return
+        # 记录已被 GC 删掉：旧对象移出会话，否则同主键的新对象 flush 时冲突
+        db.expunge(blob)
+    try:
+        async with db.begin_nested():
+            db.add(UploadBlob(sha256=sha256, filename=filename, size=size))
+    except IntegrityError:
+        # 并发上传了同一内容，对方先插入；内容相同，覆盖写入无害
+        await _touch(db, sha256)
+
+
+async def save_upload(
+    db: AsyncSession,
+    file: UploadFile,
+    ext: str,
+    max_bytes: int = settings.UPLOAD_MAX_BYTES,
+) -> StoredUpload:
+    """
+    保存上传文件，返回文件名 (已有相同内容时为已有文件名)。
+    超限抛 UploadTooLarge，空文件抛 EmptyUpload，两种情况都不会写存储。
+    只改会话不提交，由调用方 commit。
+    """
+    # 客户端声明了大小时先挡一次，省掉一次读取
+    if file.size is not None and file.size > max_bytes:
+        raise UploadTooLarge(file.size)
+
+    sha256, size = await run_io(_hash_limited, file.file, max_bytes, settings.UPLOAD_CHUNK_SIZE)
+
+    blob = await db.get(UploadBlob, sha256)
+    if await _reuse_existing(db, blob):
+        return StoredUpload(filename=blob.filename, created=False)
+
+    # 新内容 (或记录还在但文件已被清理)：写存储
+    filename = blob.filename if blob is not None else f"{sha256}.{ext}"
+    await run_io(storage.put_file, file.file, filename, content_type_for(filename))
+    await _record_blob(db, blob, sha256, filename, size)
+    return StoredUpload(filename=filename, created=True)
+
+
+# ==========================================
+# 📤 直传
+# ==========================================
+def _sign_completion(user_id: int, filename: str, sha256: str, size: int) -> str:
+    # 比上传地址多留一个周期：PUT 在地址过期前开始即可，大文件传完时地址可能已经过期
+    expires_in = settings.UPLOAD_PRESIGN_EXPIRES_SECONDS * 2
+    claims = {
+        "scope": COMPLETE_UPLOAD_SCOPE,
+        "sub": str(user_id),
+        "key": filename,
+        "sha256": sha256,
+        "size": size,
+        "exp": datetime.now(timezone.utc) + timedelta(seconds=expires_in),
+    }
+    return jwt.encode(claims, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+
+
+def _verify_completion(token: str, user_id: int) -> Dict[str, Any]:
+    try:
+        claims = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    except JWTError as e:
+        raise InvalidUploadToken(str(e))
+    if claims.get("scope") != COMPLETE_UPLOAD_SCOPE or claims.get("sub") != str(user_id):
+        raise InvalidUploadToken("wrong scope or user")
+    return claims
+
+
+async def prepare_direct_upload(
+    db: AsyncSession,
+    user_id: int,
+    sha256: str,
+    size: int,
+    content_type: str,
+) -> DirectUploadTicket:
+    """
+    客户端先声明内容的 sha256 / 大小 / 类型：已有相同内容时直接复用 (只改会话不提交)，
+    否则签发直传地址和完成凭证。声明不可信，complete_direct_upload 时还会读回文件头校验。
+    """
+    if size > settings.UPLOAD_MAX_BYTES:
+        raise UploadTooLarge(size)
+    if size <= 0:
+        raise EmptyUpload()
+    ext = EXTENSIONS.get(content_type.removeprefix("image/"))
+    if ext is None:
+        raise InvalidImage(content_type)
+
+    blob = await db.get(UploadBlob, sha256)
+    if await _reuse_existing(db, blob):
+        return DirectUploadTicket(filename=blob.filename, upload=None)
+
+    filename = blob.filename if blob is not None else f"{sha256}.{ext}"
+    upload = storage.presign_upload(
+        filename,
+        content_type=content_type_for(filename),
+        size=size,
+        sha256=sha256,
+        expires_in=settings.UPLOAD_PRESIGN_EXPIRES_SECONDS,
+    )
+    return DirectUploadTicket(
+        filename=filename,
+        upload=upload,
+        complete_token=_sign_completion(user_id, filename, sha256, size),
+    )
+
+
+async def receive_direct_upload(token: str, chunks: AsyncIterator[bytes]) -> None:
+    """
+    local 后端的直传端点：按令牌里签发的大小和 sha256 校验请求体，一致才写入存储。
+    (s3 后端由 S3 按签进 URL 的校验和完成同样的检查，不经过这里)
+    令牌无效抛 InvalidUploadToken。
+    """
+    claims = storage.verify_upload_token(token)
+    digest = hashlib.sha256()
+    size = 0
+    with tempfile.SpooledTemporaryFile(max_size=settings.UPLOAD_CHUNK_SIZE) as spool:
+        async for chunk in chunks:
+            size += len(chunk)
+            if size > claims["size"]:
+                raise UploadTooLarge(size)
+            digest.update(chunk)
+            await run_io(spool.write, chunk)
+        if size != claims["size"] or digest.hexdigest() != claims["sha256"]:
+            raise UploadMismatch(claims["key"])
+        await run_io(storage.put_file, spool, claims["key"], claims["ct"])
+
+
+async def complete_direct_upload(db: AsyncSession, user_id: int, token: str) -> StoredUpload:
+    """
+    直传完成后调用：凭 prepare_direct_upload 签发的完成凭证确认对象已存在，
+    读回文件头按与中转上传相同的规则校验，通过后入库 (只改会话不提交)。
+    - 凭证无效、过期或不是本人申请的抛 InvalidUploadToken
+    - 同一内容已经入库 (重复调用、并发上传) 时直接复用，返回 created=False，不重复生成衍生图
+    - 不合规的对象删除，但已有 upload_blobs 记录的对象属于别的内容引用，绝不删除
+    """
+    claims = _verify_completion(token, user_id)
+    filename, sha256 = claims["key"], claims["sha256"]
+
+    blob = await db.get(UploadBlob, sha256)
+    if await _reuse_existing(db, blob):
+        return StoredUpload(filename=blob.filename, created=False)
+
+    stored = await run_io(storage.stat, filename)
+    if stored is None:
+        raise UploadMismatch(filename)
+
+    try:
+        if stored.size > settings.UPLOAD_MAX_BYTES:
+            raise UploadTooLarge(stored.size)
+        if stored.size != claims["size"]:
+            raise UploadMismatch(filename)
+        head = await run_io(storage.read_head, filename, PROBE_HEAD_BYTES)
+        image = validate_image(io.BytesIO(head), settings.IMAGE_MAX_SIDE, settings.IMAGE_MAX_PIXELS)
+        if image.extension != filename.rpartition(".")[2]:
+            raise InvalidImage(f"{filename} is {image.format}")
+    except Exception:
+        if blob is None:
+            await run_io(storage.delete, filename)
+        raise
+
+    await _record_blob(db, blob, sha256, filename, stored.size)
+    return StoredUpload(filename=filename, created=True)
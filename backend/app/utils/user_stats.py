@@ -0,0 +1,203 @@
+# app/utils/user_stats.py
+"""
+用户统计 (user_stats 表)
+
+- bump_user_stats：写路径在同一事务里做原子增减 (UPDATE x = x + d)，不再在读的时候 COUNT
+- compute_user_stats：按作者分组的聚合查询，是统计口径的唯一定义
+- reconcile_user_stats：按主键分批对账，修正增量维护漏掉/算错的行，并补齐历史用户
+- run_reconcile_loop：后台周期任务，由 main.py 的 lifespan 启动
+
+也可以单独运行做一次全量对账（适合 cron 或上线后首次回填）：
+    python -m app.utils.user_stats
+"""
+import asyncio
+import logging
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import case, func, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.interaction import StoryComment
+from app.models.story import NodeLike, NodeStatus, StoryNode
+from app.models.user import User, UserStats
+
+logger = logging.getLogger(__name__)
+
+STAT_FIELDS = ("nodes_count", "published_nodes_count", "likes_received", "comments_received")
+# 计入 published_nodes_count 的状态，与故事树的可见性一致
+VISIBLE_STATUSES = (NodeStatus.PUBLISHED, NodeStatus.LOCKED)
+
+
+def empty_stats() -> Dict[str, int]:
+    return {field: 0 for field in STAT_FIELDS}
+
+
+async def compute_user_stats(db: AsyncSession, user_ids: Iterable[int]) -> Dict[int, Dict[str, int]]:
+    """对一批用户做分组聚合，三条 GROUP BY 查询，与用户数无关"""
+    ids = list(user_ids)
+    stats = {uid: empty_stats() for uid in ids}
+    if not ids:
+        return stats
+
+    nodes_stmt = (
+        select(
+            StoryNode.author_id,
+            func.count(StoryNode.id),
+            func.coalesce(func.sum(case((StoryNode.status.in_(VISIBLE_STATUSES), 1), else_=0)), 0),
+        )
+        .where(StoryNode.author_id.in_(ids))
+        .group_by(StoryNode.author_id)
+    )
+    for author_id, total, published in await db.execute(nodes_stmt):
+        stats[author_id]["nodes_count"] = int(total)
+        stats[author_id]["published_nodes_count"] = int(published)
+
+    likes_stmt = (
+        select(StoryNode.author_id, func.count())
+        .select_from(NodeLike)
+        .join(StoryNode, NodeLike.node_id == StoryNode.id)
+        .where(StoryNode.author_id.in_(ids))
+        .group_by(StoryNode.author_id)
+    )
+    for author_id, count in await db.execute(likes_stmt):
+        stats[author_id]["likes_received"] = int(count)
+
+    comments_stmt = (
+        select(StoryNode.author_id, func.count(StoryComment.id))
+        .select_from(StoryComment)
+        .join(StoryNode, StoryComment.node_id == StoryNode.id)
+        .where(StoryNode.author_id.in_(ids))
+        .group_by(StoryNode.author_id)
+    )
+    for author_id, count in await db.execute(comments_stmt):
+        stats[author_id]["comments_received"] = int(count)
+
+    return stats
+
+
+async def bump_user_stats(db: AsyncSession, user_id: int, **deltas: int) -> None:
+    """
+    原子增减统计字段，例如 bump_user_stats(db, author_id, likes_received=1)。
+    只改会话不提交，和业务修改一起 commit。
+    该用户还没有统计行时，按当前数据 (已 flush) 现算一行插入。
+    """
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    values = {}
+    for field, delta in deltas.items():
+        column = getattr(UserStats, field)
+        # 下限为 0，漂移交给对账修正
+        values[field] = case((column + delta < 0, 0), else_=column + delta)
+
+    stmt = update(UserStats).where(UserStats.user_id == user_id).values(**values)
+    result = await db.execute(stmt)
+    if result.rowcount:
+        return
+
+    await db.flush()
+    computed = (await compute_user_stats(db, [user_id]))[user_id]
+    try:
+        async with db.begin_nested():
+            db.add(UserStats(user_id=user_id, **computed))
+    except IntegrityError:
+        # 并发请求先插入了这一行，退回增量更新
+        await db.execute(stmt)
+
+
+def _stats_of(row: Optional[UserStats]) -> Dict[str, int]:
+    if row is None:
+        return empty_stats()
+    return {field: getattr(row, field) for field in STAT_FIELDS}
+
+
+async def get_user_with_stats(db: AsyncSession, user_id: int) -> Optional[Tuple[User, Dict[str, int]]]:
+    """一次主键查询取用户和统计 (LEFT JOIN，没有统计行的新用户按 0 处理)"""
+    stmt = (
+        select(User, UserStats)
+        .outerjoin(UserStats, UserStats.user_id == User.id)
+        .where(User.id == user_id)
+    )
+    row = (await db.execute(stmt)).first()
+    if row is None:
+        return None
+    return row[0], _stats_of(row[1])
+
+
+async def get_users_with_stats(db: AsyncSession, user_ids: List[int]) -> Dict[int, Tuple[User, Dict[str, int]]]:
+    """批量版本：一条 IN + LEFT JOIN 查询，返回 {user_id: (user, stats)}，不存在的 id 不出现在结果里"""
+    if not user_ids:
+        return {}
+    stmt = (
+        select(User, UserStats)
+        .outerjoin(UserStats, UserStats.user_id == User.id)
+        .where(User.id.in_(user_ids))
+    )
+    return {user.id: (user, _stats_of(stats)) for user, stats in await db.execute(stmt)}
+
+
+async def reconcile_user_stats(db: AsyncSession, batch_size: Optional[int] = None) -> int:
+    """按用户主键分批重新计算，返回修正 (含新插入) 的行数"""
+    batch_size = batch_size or settings.USER_STATS_RECONCILE_BATCH_SIZE
+    fixed = 0
+    last_id = 0
+    while True:
+        ids: List[int] = (
+            await db.execute(
+                select(User.id).where(User.id > last_id).order_by(User.id).limit(batch_size)
+            )
+        ).scalars().all()
+        if not ids:
+            break
+        last_id = ids[-1]
+
+        computed = await compute_user_stats(db, ids)
+        existing = {
+            row.user_id: row
+            for row in (await db.execute(select(UserStats).where(UserStats.user_id.in_(ids)))).scalars()
+        }
+        for uid in ids:
+            expected = computed[uid]
+            row = existing.get(uid)
+            if row is None:
+                db.add(UserStats(user_id=uid, **expected))
+                fixed += 1
+            elif any(getattr(row, f) != expected[f] for f in STAT_FIELDS):
+                for f in STAT_FIELDS:
+                    setattr(row, f, expected[f])
+                fixed += 1
+        await db.commit()
+
+        if len(ids) < batch_size:
+            break
+        # 批次之间让出事件循环
+        await asyncio.sleep(0)
+    return fixed
+
+
+async def run_reconcile_loop() -> None:
+    """后台周期对账任务"""
+    while True:
+        try:
+            async with AsyncSessionLocal() as db:
+                fixed = await reconcile_user_stats(db)
+            if fixed:
+                logger.info("reconciled stats for %d users", fixed)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("user stats reconcile loop failed")
+        await asyncio.sleep(settings.USER_STATS_RECONCILE_INTERVAL_SECONDS)
+
+
+async def _main() -> None:
+    async with AsyncSessionLocal() as db:
+        fixed = await reconcile_user_stats(db)
+    print(f"reconciled stats for {fixed} users")
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
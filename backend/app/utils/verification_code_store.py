@@ -0,0 +1,142 @@
+# app/utils/verification_code_store.py
+"""
+邮箱验证码存储
+
+同一 (邮箱, 用途) 任何时候只保留一个有效验证码：签发新码时作废旧码，
+因此校验只需按 (email, purpose, is_used) 取一行，不再按 created_at 排序扫描历史。
+
+- MemoryCodeStore：进程内 TTLCache，超出条数上限时淘汰最久未访问的，适合单 worker / 开发环境
+- DBCodeStore：email_verification_codes 表，配合 purge_verification_codes 定期分批清理过期/已用记录
+"""
+import asyncio
+import enum
+import logging
+from datetime import datetime, timedelta
+from typing import Tuple
+
+from sqlalchemy import delete, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import security
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.auth import EmailVerificationCode, VerificationPurpose
+from app.utils.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+
+class CodeCheck(str, enum.Enum):
+    OK = "ok"
+    MISSING = "missing"      # 不存在或已过期
+    MISMATCH = "mismatch"    # 验证码不匹配
+
+
+class MemoryCodeStore:
+    def __init__(self, max_entries: int = 100000) -> None:
+        self._codes: TTLCache[Tuple[str, VerificationPurpose], str] = TTLCache(
+            settings.VERIFICATION_CODE_TTL_MINUTES * 60, max_entries
+        )
+
+    async def issue(self, db: AsyncSession, email: str, purpose: VerificationPurpose, code: str) -> None:
+        self._codes.set((email, purpose), code)
+
+    async def consume(self, db: AsyncSession, email: str, purpose: VerificationPurpose, code: str) -> CodeCheck:
+        # 读和删之间没有 await，不会和其他请求交错
+        stored = self._codes.get((email, purpose))
+        if stored is None:
+            return CodeCheck.MISSING
+        if not security.verify_email_code(code, stored):
+            return CodeCheck.MISMATCH
+        self._codes.pop((email, purpose))
+        return CodeCheck.OK
+
+
+class DBCodeStore:
+    """只改会话不提交，和调用方的其他修改一起 commit"""
+
+    async def issue(self, db: AsyncSession, email: str, purpose: VerificationPurpose, code: str) -> None:
+        # 作废旧码，保证同一 (email, purpose) 只有一行未使用
+        await db.execute(
+            update(EmailVerificationCode)
+            .where(EmailVerificationCode.email == email)
+            .where(EmailVerificationCode.purpose == purpose)
+            .where(EmailVerificationCode.is_used == False)
+            .values(is_used=True)
+        )
+        db.add(
+            EmailVerificationCode(
+                email=email,
+                purpose=purpose,
+                code=code,
+                expires_at=datetime.utcnow() + timedelta(minutes=settings.VERIFICATION_CODE_TTL_MINUTES),
+            )
+        )
+
+    async def consume(self, db: AsyncSession, email: str, purpose: VerificationPurpose, code: str) -> CodeCheck:
+        stmt = (
+            select(EmailVerificationCode)
+            .where(EmailVerificationCode.email == email)
+            .where(EmailVerificationCode.purpose == purpose)
+            .where(EmailVerificationCode.is_used == False)
+            .where(EmailVerificationCode.expires_at > datetime.utcnow())
+            .limit(1)
+        )
+        record = (await db.execute(stmt)).scalars().first()
+        if record is None:
+            return CodeCheck.MISSING
+        if not security.verify_email_code(code, record.code):
+            return CodeCheck.MISMATCH
+        record.is_used = True
+        return CodeCheck.OK
+
+
+async def purge_verification_codes(db: AsyncSession, batch_size: int) -> int:
+    """分批删除过期或已使用的验证码，返回删除总数"""
+    total = 0
+    while True:
+        ids = (
+            await db.execute(
+                select(EmailVerificationCode.id)
+                .where(
+                    or_(
+                        EmailVerificationCode.is_used == True,
+                        EmailVerificationCode.expires_at < datetime.utcnow(),
+                    )
+                )
+                .limit(batch_size)
+            )
+        ).scalars().all()
+        if not ids:
+            break
+        await db.execute(delete(EmailVerificationCode).where(EmailVerificationCode.id.in_(ids)))
+        await db.commit()
+        total += len(ids)
+        if len(ids) < batch_size:
+            break
+        await asyncio.sleep(0)
+    return total
+
+
+async def run_purge_loop() -> None:
+    """后台周期清理任务，仅 DB 后端需要"""
+    while True:
+        try:
+            async with AsyncSessionLocal() as db:
+                purged = await purge_verification_codes(db, settings.VERIFICATION_CODE_PURGE_BATCH_SIZE)
+            if purged:
+                logger.info("purged %d verification codes", purged)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("verification code purge failed")
+        await asyncio.sleep(settings.VERIFICATION_CODE_PURGE_INTERVAL_SECONDS)
+
+
+def _build_store():
+    if settings.VERIFICATION_CODE_BACKEND == "memory":
+        return MemoryCodeStore()
+    return DBCodeStore()
+
+
+code_store = _build_store()
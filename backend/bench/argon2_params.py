@@ -0,0 +1,85 @@
+# bench/argon2_params.py
+"""
+argon2 参数基准：测量候选参数在本机的单次哈希延迟和并发吞吐，用来挑选 ARGON2_* 配置
+
+用法 (在 backend 目录下)：
+    python bench/argon2_params.py
+    python bench/argon2_params.py --candidate 2:19456:1 --candidate 3:65536:4 --threads 4
+参数格式为 time_cost:memory_cost(KiB):parallelism
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings  # noqa: E402
+from app.core.security import build_pwd_context  # noqa: E402
+
+DEFAULT_CANDIDATES = [
+    "2:19456:1",   # OWASP 最低推荐
+    "2:65536:2",
+    "3:65536:4",   # argon2 RFC 低内存档
+    "4:131072:4",
+]
+
+
+def parse_candidate(raw):
+    time_cost, memory_cost, parallelism = (int(x) for x in raw.split(":"))
+    return time_cost, memory_cost, parallelism
+
+
+def bench(time_cost, memory_cost, parallelism, rounds, threads):
+    ctx = build_pwd_context(time_cost, memory_cost, parallelism)
+    password = "benchmark-password-123"
+
+    # 预热一次，排除首次分配内存的开销
+    ctx.hash(password)
+
+    latencies = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        ctx.hash(password)
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    # 并发吞吐：模拟线程池同时处理多个登录
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(lambda _: ctx.hash(password), range(rounds * threads)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "p50_ms": statistics.median(latencies),
+        "p95_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+        "throughput": rounds * threads / elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="argon2 参数基准")
+    parser.add_argument("--candidate", action="append", help="time_cost:memory_cost:parallelism，可重复")
+    parser.add_argument("--rounds", type=int, default=20, help="每组参数的串行哈希次数")
+    parser.add_argument("--threads", type=int, default=settings.PASSWORD_HASH_WORKERS, help="吞吐测试的线程数")
+    args = parser.parse_args()
+
+    current = f"{settings.ARGON2_TIME_COST}:{settings.ARGON2_MEMORY_COST}:{settings.ARGON2_PARALLELISM}"
+    candidates = args.candidate or DEFAULT_CANDIDATES
+    if current not in candidates:
+        candidates = [current] + candidates
+
+    print(f"{'params (t:m:p)':<18}{'p50':>10}{'p95':>10}{'hash/s':>10}")
+    for raw in candidates:
+        result = bench(*parse_candidate(raw), rounds=args.rounds, threads=args.threads)
+        marker = "  <- 当前配置" if raw == current else ""
+        print(
+            f"{raw:<18}{result['p50_ms']:>8.1f}ms{result['p95_ms']:>8.1f}ms"
+            f"{result['throughput']:>10.1f}{marker}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+# bench/login_storm.py
+"""
+登录风暴压测：验证密码哈希放进线程池后，非鉴权接口的 p99 不受影响
+
+用法 (先启动后端)：
+    python bench/login_storm.py --base-url http://localhost:8057 --email admin@example.com --password admin123
+"""
+import argparse
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(len(ordered) * pct / 100))
+    return ordered[index]
+
+
+def probe(url, duration, samples):
+    """持续请求一个便宜的公开接口，记录每次耗时 (ms)"""
+    session = requests.Session()
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        session.get(url, timeout=30)
+        samples.append((time.perf_counter() - started) * 1000)
+
+
+def login_worker(url, email, password, stop):
+    session = requests.Session()
+    while not stop.is_set():
+        session.post(url, data={"username": email, "password": password}, timeout=30)
+
+
+def report(label, samples):
+    print(
+        f"{label:<16} n={len(samples):<5} "
+        f"p50={percentile(samples, 50):7.1f}ms "
+        f"p99={percentile(samples, 99):7.1f}ms "
+        f"mean={statistics.mean(samples) if samples else 0:7.1f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="登录风暴下的接口延迟测试")
+    parser.add_argument("--base-url", default="http://localhost:8057")
+    parser.add_argument("--email", default="admin@example.com")
+    parser.add_argument("--password", default="admin123")
+    parser.add_argument("--logins", type=int, default=32, help="并发登录线程数")
+    parser.add_argument("--duration", type=float, default=10.0, help="每个阶段持续秒数")
+    args = parser.parse_args()
+
+    api = f"{args.base_url.rstrip('/')}/api/v1"
+    probe_url = f"{api}/story/books"
+    login_url = f"{api}/auth/login"
+
+    # 1. 基线
+    baseline = []
+    probe(probe_url, args.duration, baseline)
+    report("baseline", baseline)
+
+    # 2. 登录风暴期间
+    stop = threading.Event()
+    storm = []
+    with ThreadPoolExecutor(max_workers=args.logins) as pool:
+        for _ in range(args.logins):
+            pool.submit(login_worker, login_url, args.email, args.password, stop)
+        probe(probe_url, args.duration, storm)
+        stop.set()
+    report("during storm", storm)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+# bench/upload_storm.py
+"""
+上传风暴压测：验证上传落盘放进线程池后，其他接口的 p99 不受并发上传影响
+
+用法 (先启动后端)：
+    python bench/upload_storm.py --base-url http://localhost:8057 --email admin@example.com --password admin123
+
+上传内容是随机像素的合法 PNG (不可压缩，大小约 宽 × 高 × 3 字节)；
+另外会发一个超限文件，确认被拒绝且没有落盘。
+"""
+import argparse
+import os
+import statistics
+import struct
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+
+def make_png(width, height):
+    """生成随机噪点 RGB PNG，不依赖图像库"""
+    def chunk(tag, data):
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF)
+
+    raw = b"".join(b"\x00" + os.urandom(width * 3) for _ in range(height))
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+        + chunk(b"IDAT", zlib.compress(raw, 1))
+        + chunk(b"IEND", b"")
+    )
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(len(ordered) * pct / 100))
+    return ordered[index]
+
+
+def probe(url, duration, samples):
+    """持续请求一个便宜的公开接口，记录每次耗时 (ms)"""
+    session = requests.Session()
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        session.get(url, timeout=30)
+        samples.append((time.perf_counter() - started) * 1000)
+
+
+def upload_worker(url, headers, payload, stop, uploaded):
+    session = requests.Session()
+    while not stop.is_set():
+        r = session.post(url, headers=headers, files={"file": ("bench.png", payload, "image/png")}, timeout=60)
+        if r.status_code == 200:
+            uploaded.append(len(payload))
+
+
+def report(label, samples):
+    print(
+        f"{label:<16} n={len(samples):<5} "
+        f"p50={percentile(samples, 50):7.1f}ms "
+        f"p99={percentile(samples, 99):7.1f}ms "
+        f"mean={statistics.mean(samples) if samples else 0:7.1f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="并发上传下的接口延迟测试")
+    parser.add_argument("--base-url", default="http://localhost:8057")
+    parser.add_argument("--email", default="admin@example.com")
+    parser.add_argument("--password", default="admin123")
+    parser.add_argument("--uploads", type=int, default=16, help="并发上传线程数")
+    parser.add_argument("--size", type=int, default=1000, help="图片边长 (像素)，约 size² × 3 字节")
+    parser.add_argument("--duration", type=float, default=10.0, help="每个阶段持续秒数")
+    args = parser.parse_args()
+
+    api = f"{args.base_url.rstrip('/')}/api/v1"
+    probe_url = f"{api}/story/books"
+    upload_url = f"{api}/uploads/"
+
+    r = requests.post(f"{api}/auth/login", data={"username": args.email, "password": args.password}, timeout=30)
+    r.raise_for_status()
+    headers = {"Authorization": f"Bearer {r.json()['access_token']}"}
+
+    payload = make_png(args.size, args.size)
+    print(f"payload {len(payload) / 1024 / 1024:.2f} MiB")
+
+    # 0. 超限文件应被拒绝
+    oversize = make_png(2000, 2000)
+    r = requests.post(upload_url, headers=headers, files={"file": ("big.png", oversize, "image/png")}, timeout=60)
+    print(f"oversize {len(oversize) / 1024 / 1024:.2f} MiB -> {r.status_code}")
+
+    # 1. 基线
+    baseline = []
+    probe(probe_url, args.duration, baseline)
+    report("baseline", baseline)
+
+    # 2. 上传风暴期间
+    stop = threading.Event()
+    storm, uploaded = [], []
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.uploads) as pool:
+        for _ in range(args.uploads):
+            pool.submit(upload_worker, upload_url, headers, payload, stop, uploaded)
+        probe(probe_url, args.duration, storm)
+        stop.set()
+    elapsed = time.perf_counter() - started
+    report("during uploads", storm)
+    print(f"uploads          n={len(uploaded):<5} {sum(uploaded) / 1024 / 1024 / elapsed:7.1f} MiB/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -11,10 +11,12 @@ from app.core.database import engine, AsyncSessionLocal
 from app.models.base import Base
 
 # 3. 【关键】必须导入所有定义了的模型，否则 Base 找不到它们
-from app.models.user import User, UserRole
+from app.models.user import User, UserRole, UserStats
 from app.models.story_book import StoryBook
 from app.models.story import StoryNode, NodeLike
-from app.models.interaction import StoryComment, Notification
+from app.models.interaction import StoryComment, Notification, NotificationArchive, NotificationOutbox
+from app.models.auth import EmailVerificationCode, RefreshToken, TokenRevocation
+from app.models.upload import ImageVariant, ImageVariantSkip, UploadBlob
 from app.core.security import get_password_hash
 
 from dotenv import load_dotenv
@@ -1,13 +1,60 @@
 # main.py (更新)
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from app.api.api import api_router
 from app.core.config import settings
-from fastapi.staticfiles import StaticFiles
+from app.utils.pubsub import broker
+from app.core.revocation import load_revocations, run_revocation_listener, run_revocation_sync_loop
+from app.utils.notification_retention import run_archive_loop
+from app.utils.notification_outbox import outbox_worker
+from app.utils.send_email_code import email_outbox
+from app.utils.verification_code_store import run_purge_loop
+from app.utils.user_stats import run_reconcile_loop
+from app.utils.leaderboard import run_leaderboard_loop
+from app.utils.image_pipeline import image_pipeline
+from app.utils.upload_gc import run_upload_gc_loop
+from app.utils.static_files import CachedStaticFiles
 from dotenv import load_dotenv
 load_dotenv()  # 加载环境变量
-app = FastAPI(title=settings.PROJECT_NAME)
 
-app.mount("/static", StaticFiles(directory="static"), name="static")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 启动：连接推送后端、后台任务
+    await broker.start()
+    # 先载入持久化的吊销截止时刻，重启后已封禁用户的令牌不会被放行
+    await load_revocations()
+    outbox_worker.start()
+    email_outbox.start()
+    background_tasks = [
+        asyncio.create_task(run_revocation_listener()),
+        asyncio.create_task(run_revocation_sync_loop()),
+        asyncio.create_task(run_leaderboard_loop()),
+    ]
+    if settings.NOTIFICATION_ARCHIVE_ENABLED:
+        background_tasks.append(asyncio.create_task(run_archive_loop()))
+    if settings.VERIFICATION_CODE_BACKEND == "db":
+        background_tasks.append(asyncio.create_task(run_purge_loop()))
+    if settings.USER_STATS_RECONCILE_INTERVAL_SECONDS > 0:
+        background_tasks.append(asyncio.create_task(run_reconcile_loop()))
+    if settings.UPLOAD_GC_INTERVAL_SECONDS > 0:
+        background_tasks.append(asyncio.create_task(run_upload_gc_loop()))
+    yield
+    # 关闭
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    await image_pipeline.stop()
+    await outbox_worker.stop()
+    await email_outbox.stop()
+    await broker.stop()
+
+
+app = FastAPI(title=settings.PROJECT_NAME, lifespan=lifespan)
+
+# 上传文件不可变：长期缓存 + ETag + Range；生产环境可改由 nginx 直出 (见 app/utils/static_files.py)
+app.mount("/static", CachedStaticFiles(directory="static", precompressed=settings.STATIC_PRECOMPRESSED), name="static")
 
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
@@ -0,0 +1,112 @@
+# tests/test_activity.py
+# 用户动态翻页：同一时刻的节点/评论/点赞混在一起时，逐页翻完既不重复也不遗漏
+import asyncio
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+pytest.importorskip("aiosqlite")
+
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine  # noqa: E402
+
+from app.models.base import Base  # noqa: E402
+from app.models.interaction import StoryComment  # noqa: E402
+from app.models.story import NodeLike, NodeStatus, StoryNode  # noqa: E402
+from app.models.story_book import StoryBook  # noqa: E402
+from app.models.user import User  # noqa: E402
+from app.utils.activity import decode_cursor, encode_cursor, fetch_activity  # noqa: E402
+
+T0 = datetime(2026, 1, 5, 12, 0, 0)
+T1 = T0 - timedelta(seconds=1)
+
+
+async def _seed():
+    """用户 1 在 T0 写了 2 个节点、发了 2 条评论、点了 2 个赞，T1 各一条；另有一个待审核节点"""
+    engine = create_async_engine("sqlite+aiosqlite://")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    sessions = async_sessionmaker(engine, expire_on_commit=False)
+    async with sessions() as db:
+        db.add_all([
+            User(id=1, email="a@example.com", username="a", hashed_password="x"),
+            User(id=2, email="b@example.com", username="b", hashed_password="x"),
+            StoryBook(id=1, title="book"),
+        ])
+        await db.flush()
+        published = NodeStatus.PUBLISHED
+        db.add_all([
+            StoryNode(id=1, book_id=1, author_id=2, content="other", status=published, created_at=T1),
+            StoryNode(id=2, book_id=1, author_id=2, content="other", status=published, created_at=T1),
+            StoryNode(id=3, book_id=1, author_id=2, content="other", status=published, created_at=T1),
+            StoryNode(id=10, book_id=1, author_id=1, content="a", status=published, created_at=T0),
+            StoryNode(id=11, book_id=1, author_id=1, content="b", status=published, created_at=T0),
+            StoryNode(id=12, book_id=1, author_id=1, content="c", status=published, created_at=T1),
+            StoryNode(id=13, book_id=1, author_id=1, content="pending", status=NodeStatus.PENDING, created_at=T0),
+        ])
+        await db.flush()
+        db.add_all([
+            StoryComment(id=20, node_id=1, user_id=1, content="x", created_at=T0),
+            StoryComment(id=21, node_id=2, user_id=1, content="y", created_at=T0),
+            StoryComment(id=22, node_id=3, user_id=1, content="z", created_at=T1),
+            NodeLike(user_id=1, node_id=1, created_at=T0),
+            NodeLike(user_id=1, node_id=2, created_at=T0),
+            NodeLike(user_id=1, node_id=3, created_at=T1),
+        ])
+        await db.commit()
+    return engine, sessions
+
+
+async def _walk(sessions, limit, include_hidden):
+    pages, cursor = [], None
+    while True:
+        async with sessions() as db:
+            items, cursor = await fetch_activity(db, 1, limit, cursor, include_hidden=include_hidden)
+        pages.append([(item["type"], item["id"]) for item in items])
+        if cursor is None:
+            return pages
+        # 游标要经过一次编码/解码，和接口里一样
+        cursor = decode_cursor(encode_cursor(cursor))
+
+
+EXPECTED = [
+    ("node", 11), ("node", 10),
+    ("comment", 21), ("comment", 20),
+    ("like", 2), ("like", 1),
+    ("node", 12), ("comment", 22), ("like", 3),
+]
+
+
+@pytest.mark.parametrize("limit", [1, 2, 4, 9])
+def test_paging_over_same_timestamp_rows_of_different_kinds(limit):
+    async def scenario():
+        engine, sessions = await _seed()
+        pages = await _walk(sessions, limit, include_hidden=False)
+        await engine.dispose()
+        return pages
+
+    pages = asyncio.run(scenario())
+    assert [entry for page in pages for entry in page] == EXPECTED
+    assert all(len(page) == limit for page in pages[:-1])
+
+
+def test_include_hidden_shows_own_pending_node():
+    async def scenario():
+        engine, sessions = await _seed()
+        pages = await _walk(sessions, 3, include_hidden=True)
+        await engine.dispose()
+        return pages
+
+    flat = [entry for page in asyncio.run(scenario()) for entry in page]
+    assert flat == [("node", 13)] + EXPECTED
+
+
+def test_decode_cursor_rejects_garbage():
+    cursor = (T0, "comment", 21)
+    assert decode_cursor(encode_cursor(cursor)) == cursor
+    for token in ("not-base64!", "", encode_cursor((T0, "bogus", 1))):
+        with pytest.raises(ValueError):
+            decode_cursor(token)
@@ -0,0 +1,161 @@
+# tests/test_auth_tokens.py
+# 访问令牌吊销截止时刻 (提交后才生效、可从表里恢复) 和刷新令牌轮换/重放检测
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+pytest.importorskip("aiosqlite")
+
+from sqlalchemy import select  # noqa: E402
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine  # noqa: E402
+
+from app.api import deps  # noqa: E402
+from app.core import revocation, security  # noqa: E402
+from app.core.revocation import RevocationList, load_revocations, revoke_user  # noqa: E402
+from app.models.auth import RefreshToken, TokenRevocation  # noqa: E402
+from app.models.user import User, UserRole  # noqa: E402
+from app.utils import auth_tokens  # noqa: E402
+
+
+@pytest.fixture
+def revoked(monkeypatch):
+    """每个用例一份干净的吊销表 (auth_tokens/deps 通过模块全局引用)"""
+    fresh = RevocationList(retain_seconds=900)
+    monkeypatch.setattr(revocation, "revocations", fresh)
+    monkeypatch.setattr(deps, "revocations", fresh)
+    return fresh
+
+
+async def _sessions():
+    engine = create_async_engine("sqlite+aiosqlite://")
+    async with engine.begin() as conn:
+        for model in (User, RefreshToken, TokenRevocation):
+            await conn.run_sync(model.__table__.create)
+    sessions = async_sessionmaker(engine, expire_on_commit=False)
+    async with sessions() as db:
+        db.add(User(id=1, email="a@example.com", username="a", hashed_password="x", is_verified=True))
+        await db.commit()
+    return engine, sessions
+
+
+def test_user_cutoff_only_hits_tokens_issued_before(revoked):
+    now = time.time()
+    revoked.revoke_user(1, at=now)
+    assert revoked.is_revoked({"sub": "1", "iat": int(now) - 60})
+    assert not revoked.is_revoked({"sub": "1", "iat": int(now) + 1})
+    assert not revoked.is_revoked({"sub": "2", "iat": int(now) - 60})
+    # 升级前的令牌没有 iat，按 0 处理，同样作废
+    assert revoked.is_revoked({"sub": "1"})
+
+    revoked.revoke_token("jti-1", exp=now + 60)
+    assert revoked.is_revoked({"sub": "2", "iat": int(now), "jti": "jti-1"})
+
+    # 其他 worker 广播来的事件
+    revoked.apply("user", {"user_id": 2, "at": now})
+    assert revoked.is_revoked({"sub": "2", "iat": int(now) - 1})
+
+
+def test_revoked_access_token_is_rejected(revoked):
+    token = security.create_access_token(subject="1", claims={"role": "user", "act": True, "ver": True, "name": "a"})
+    assert deps._decode_access_token(token) is not None
+    revoked.revoke_user(1, at=time.time() + 5)
+    assert deps._decode_access_token(token) is None
+
+
+def test_cutoff_applies_only_after_commit_and_survives_restart(revoked, monkeypatch):
+    async def scenario():
+        engine, sessions = await _sessions()
+        monkeypatch.setattr(revocation, "AsyncSessionLocal", sessions)
+        claims = {"sub": "1", "iat": int(time.time()) - 10}
+
+        async with sessions() as db:
+            await revoke_user(db, 1)
+            await db.rollback()
+        after_rollback = revoked.is_revoked(claims)
+
+        async with sessions() as db:
+            await revoke_user(db, 1)
+            before_commit = revoked.is_revoked(claims)
+            await db.commit()
+        after_commit = revoked.is_revoked(claims)
+
+        # 新进程：内存表为空，从 token_revocations 恢复
+        restarted = RevocationList(retain_seconds=900)
+        monkeypatch.setattr(revocation, "revocations", restarted)
+        loaded = await load_revocations()
+        await engine.dispose()
+        return after_rollback, before_commit, after_commit, loaded, restarted.is_revoked(claims)
+
+    after_rollback, before_commit, after_commit, loaded, after_restart = asyncio.run(scenario())
+
+    assert not after_rollback
+    assert not before_commit
+    assert after_commit
+    assert loaded == 1
+    assert after_restart
+
+
+def test_refresh_token_rotation_and_replay(revoked):
+    async def scenario():
+        engine, sessions = await _sessions()
+        async with sessions() as db:
+            user = await db.get(User, 1)
+            first = await auth_tokens.issue_token_pair(db, user)
+            await db.commit()
+
+        async with sessions() as db:
+            second = await auth_tokens.rotate_refresh_token(db, first.refresh_token)
+            await db.commit()
+
+        # 已轮换掉的旧令牌再次出现：视为泄露，整组会话作废
+        async with sessions() as db:
+            replay = await auth_tokens.rotate_refresh_token(db, first.refresh_token)
+            await db.commit()
+        async with sessions() as db:
+            after_replay = await auth_tokens.rotate_refresh_token(db, second.refresh_token)
+            await db.commit()
+            records = (await db.execute(select(RefreshToken.is_revoked))).scalars().all()
+        await engine.dispose()
+        return first, second, replay, after_replay, records
+
+    first, second, replay, after_replay, records = asyncio.run(scenario())
+
+    assert second is not None and second.refresh_token != first.refresh_token
+    assert replay is None
+    assert after_replay is None
+    assert records == [True, True]
+    assert revoked.is_revoked({"sub": "1", "iat": int(time.time()) - 1})
+
+
+def test_refresh_rejects_expired_and_banned(revoked):
+    async def scenario():
+        engine, sessions = await _sessions()
+        async with sessions() as db:
+            user = await db.get(User, 1)
+            expired = security.create_refresh_token()
+            db.add(RefreshToken(
+                user_id=1,
+                token_hash=security.hash_token(expired),
+                expires_at=datetime.utcnow() - timedelta(seconds=1),
+            ))
+            pair = await auth_tokens.issue_token_pair(db, user)
+            user.role = UserRole.BANNED
+            await db.commit()
+
+        async with sessions() as db:
+            results = (
+                await auth_tokens.rotate_refresh_token(db, expired),
+                await auth_tokens.rotate_refresh_token(db, pair.refresh_token),
+                await auth_tokens.rotate_refresh_token(db, "never-issued"),
+            )
+            await db.commit()
+        await engine.dispose()
+        return results
+
+    assert asyncio.run(scenario()) == (None, None, None)
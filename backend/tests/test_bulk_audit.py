@@ -0,0 +1,125 @@
+# tests/test_bulk_audit.py
+# 批量审核：逐条结果与请求顺序一致，不存在/重复的节点单独报错，其余照常生效
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+pytest.importorskip("aiosqlite")
+
+from fastapi import HTTPException  # noqa: E402
+from sqlalchemy import select  # noqa: E402
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine  # noqa: E402
+
+from app.api.v1 import admin  # noqa: E402
+from app.core.config import settings  # noqa: E402
+from app.core.principal import Principal  # noqa: E402
+from app.models.base import Base  # noqa: E402
+from app.models.interaction import NotificationOutbox, NotificationType  # noqa: E402
+from app.models.story import NodeStatus, StoryNode  # noqa: E402
+from app.models.story_book import StoryBook  # noqa: E402
+from app.models.user import User, UserRole, UserStats  # noqa: E402
+from app.schemas.story import BulkNodeAuditRequest  # noqa: E402
+
+ADMIN = Principal(id=1, role=UserRole.ADMIN, is_active=True, is_verified=True, username="admin")
+
+
+@pytest.fixture
+def published(monkeypatch):
+    events = []
+
+    async def publish(channel, event_type, data):
+        events.append((channel, event_type, data))
+
+    monkeypatch.setattr(admin.broker, "publish", publish)
+    return events
+
+
+async def _seed():
+    """作者 2 有三个待审核节点和一个已发布节点"""
+    engine = create_async_engine("sqlite+aiosqlite://")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    sessions = async_sessionmaker(engine, expire_on_commit=False)
+    async with sessions() as db:
+        db.add_all([
+            User(id=1, email="admin@example.com", username="admin", hashed_password="x", role=UserRole.ADMIN),
+            User(id=2, email="b@example.com", username="b", hashed_password="x"),
+            StoryBook(id=1, title="book"),
+        ])
+        await db.flush()
+        db.add_all([
+            StoryNode(id=10, book_id=1, author_id=2, content="a", status=NodeStatus.PENDING),
+            StoryNode(id=11, book_id=1, author_id=2, content="b", status=NodeStatus.PENDING),
+            StoryNode(id=12, book_id=1, author_id=2, content="c", status=NodeStatus.PENDING),
+            StoryNode(id=13, book_id=1, author_id=2, content="d", status=NodeStatus.PUBLISHED),
+        ])
+        db.add(UserStats(user_id=2, nodes_count=4, published_nodes_count=1))
+        await db.commit()
+    return engine, sessions
+
+
+def _request(*pairs):
+    return BulkNodeAuditRequest(items=[{"node_id": node_id, "status": status} for node_id, status in pairs])
+
+
+def test_per_item_results_follow_request_order(published):
+    async def scenario():
+        engine, sessions = await _seed()
+        request = _request(
+            (10, NodeStatus.PUBLISHED),
+            (99, NodeStatus.PUBLISHED),   # 不存在
+            (11, NodeStatus.REJECTED),
+            (10, NodeStatus.REJECTED),    # 重复，只取第一条
+            (13, NodeStatus.PUBLISHED),   # 状态没变
+            (12, NodeStatus.LOCKED),
+        )
+        async with sessions() as db:
+            response = await admin.bulk_audit_nodes(request, db=db, current_user=ADMIN)
+        async with sessions() as db:
+            statuses = dict((await db.execute(select(StoryNode.id, StoryNode.status))).all())
+            published_at = dict((await db.execute(select(StoryNode.id, StoryNode.published_at))).all())
+            outbox = (await db.execute(
+                select(NotificationOutbox.node_id, NotificationOutbox.type).order_by(NotificationOutbox.node_id)
+            )).all()
+            stats = await db.get(UserStats, 2)
+        await engine.dispose()
+        return response, statuses, published_at, outbox, stats
+
+    response, statuses, published_at, outbox, stats = asyncio.run(scenario())
+
+    results = [(r.node_id, r.ok, r.old_status, r.status) for r in response["results"]]
+    assert results == [
+        (10, True, NodeStatus.PENDING, NodeStatus.PUBLISHED),
+        (99, False, None, None),
+        (11, True, NodeStatus.PENDING, NodeStatus.REJECTED),
+        (10, False, None, None),
+        (13, True, NodeStatus.PUBLISHED, NodeStatus.PUBLISHED),
+        (12, True, NodeStatus.PENDING, NodeStatus.LOCKED),
+    ]
+    assert response["results"][1].detail == "节点不存在"
+    assert response["results"][3].detail == "重复的节点，已忽略"
+    assert response["updated"] == 3
+
+    # 重复的那条没有把 10 改成驳回
+    assert statuses == {
+        10: NodeStatus.PUBLISHED, 11: NodeStatus.REJECTED, 12: NodeStatus.LOCKED, 13: NodeStatus.PUBLISHED,
+    }
+    assert published_at[10] is not None and published_at[12] is not None
+    assert published_at[11] is None
+    # 通过/驳回各通知一次，LOCKED 不通知
+    assert outbox == [(10, NotificationType.APPROVED), (11, NotificationType.REJECTED)]
+    assert stats.published_nodes_count == 3
+    # 只推送可见性变化的节点
+    assert sorted(data["id"] for _, event, data in published if event == "node_audited") == [10, 12]
+
+
+def test_rejects_oversized_batch(monkeypatch):
+    monkeypatch.setattr(settings, "ADMIN_BULK_AUDIT_MAX_ITEMS", 2)
+    request = _request((10, NodeStatus.PUBLISHED), (11, NodeStatus.PUBLISHED), (12, NodeStatus.PUBLISHED))
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(admin.bulk_audit_nodes(request, db=None, current_user=ADMIN))
+    assert exc.value.status_code == 400
@@ -0,0 +1,128 @@
+# tests/test_email_outbox.py
+# 用本地 aiosmtpd 作为 SMTP 替身，验证发件队列的批量发送与连接复用
+import asyncio
+import os
+import socket
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+aiosmtpd_controller = pytest.importorskip("aiosmtpd.controller")
+
+from app.utils.send_email_code import EmailOutbox, SMTPTransport, build_code_email  # noqa: E402
+
+
+class CollectingHandler:
+    def __init__(self):
+        self.messages = []
+        self.sessions = set()
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(envelope)
+        self.sessions.add(id(session))
+        return "250 OK"
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def test_outbox_sends_batch_over_one_connection():
+    handler = CollectingHandler()
+    port = _free_port()
+    controller = aiosmtpd_controller.Controller(handler, hostname="127.0.0.1", port=port)
+    controller.start()
+    try:
+        async def scenario():
+            outbox = EmailOutbox(
+                SMTPTransport("127.0.0.1", port),
+                batch_size=10,
+                max_retries=1,
+                queue_size=100,
+            )
+            for i in range(5):
+                outbox.enqueue(build_code_email(f"user{i}@example.com", "123456"))
+            outbox.start()
+            await asyncio.wait_for(outbox.drain(), timeout=10)
+            await outbox.stop()
+
+        asyncio.run(scenario())
+    finally:
+        controller.stop()
+
+    assert sorted(e.rcpt_tos[0] for e in handler.messages) == [f"user{i}@example.com" for i in range(5)]
+    # 整批只建立了一个 SMTP 会话
+    assert len(handler.sessions) == 1
+
+
+class FlakyTransport:
+    """发给 bad@ 的邮件总是失败，其余成功"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.sent = []
+        self.attempts = 0
+
+    def send_many(self, messages):
+        time.sleep(self.delay)
+        failed = []
+        for msg in messages:
+            if msg["To"].startswith("bad@"):
+                self.attempts += 1
+                failed.append(msg)
+            else:
+                self.sent.append(msg["To"])
+        return failed
+
+    def close(self):
+        pass
+
+
+def test_retry_backoff_does_not_block_other_emails():
+    transport = FlakyTransport()
+
+    async def scenario():
+        outbox = EmailOutbox(transport, batch_size=1, max_retries=2, queue_size=100, backoff_seconds=5)
+        outbox.enqueue(build_code_email("bad@example.com", "123456"))
+        outbox.start()
+        await asyncio.sleep(0.05)
+        outbox.enqueue(build_code_email("good@example.com", "123456"))
+        # 失败邮件在等 5 秒退避，后来的邮件不用等
+        await asyncio.sleep(0.2)
+        assert transport.sent == ["good@example.com"]
+        assert transport.attempts == 1
+        await outbox.stop(timeout=0.1)
+
+    asyncio.run(scenario())
+
+
+def test_retry_dropped_when_queue_full():
+    transport = FlakyTransport()
+
+    async def until(condition):
+        while not condition():
+            await asyncio.sleep(0.005)
+
+    async def scenario():
+        outbox = EmailOutbox(transport, batch_size=1, max_retries=3, queue_size=1, backoff_seconds=0.3)
+        outbox.enqueue(build_code_email("bad@example.com", "123456"))
+        outbox.start()
+        await asyncio.wait_for(until(lambda: transport.attempts == 1), timeout=2)
+        # 发送循环卡在慢邮件上、队列已满时重试到点：丢弃并记录，发送循环不受影响
+        transport.delay = 1.0
+        outbox.enqueue(build_code_email("good1@example.com", "123456"))
+        await asyncio.wait_for(until(outbox.queue.empty), timeout=2)
+        transport.delay = 0
+        outbox.enqueue(build_code_email("good2@example.com", "123456"))
+        await asyncio.wait_for(outbox.drain(), timeout=5)
+        assert not outbox._task.done()
+        await outbox.stop()
+
+    asyncio.run(scenario())
+    assert transport.sent == ["good1@example.com", "good2@example.com"]
+    assert transport.attempts == 1
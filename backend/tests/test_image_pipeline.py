@@ -0,0 +1,68 @@
+# tests/test_image_pipeline.py
+# 衍生图渲染：不放大、透明图转 JPEG 铺白底、动图跳过
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+Image = pytest.importorskip("PIL.Image")
+
+from app.utils.image_pipeline import render_variants  # noqa: E402
+
+WIDTHS = [96, 320, 960]
+FORMATS = ["webp", "jpeg"]
+
+
+def _render(source, out_dir):
+    return render_variants(str(source), str(out_dir), WIDTHS, FORMATS, quality=80, max_pixels=24_000_000)
+
+
+def test_jpeg_variants_never_upscaled(tmp_path):
+    source = tmp_path / "photo.jpg"
+    Image.new("RGB", (500, 250), (10, 120, 200)).save(source, format="JPEG")
+    out = tmp_path / "out"
+    out.mkdir()
+
+    rendered = _render(source, out)
+
+    assert sorted({(width, height) for _, _, width, height, _ in rendered}) == [(96, 48), (320, 160), (500, 250)]
+    assert sorted(name for _, name, _, _, _ in rendered) == [
+        "photo_320.jpg", "photo_320.webp", "photo_500.jpg", "photo_500.webp", "photo_96.jpg", "photo_96.webp",
+    ]
+    for fmt, name, width, height, size in rendered:
+        with Image.open(out / name) as img:
+            assert img.format == fmt.upper()
+            assert img.size == (width, height)
+        assert size == os.path.getsize(out / name)
+    # 临时文件都已改名
+    assert not [name for name in os.listdir(out) if name.endswith(".part")]
+
+
+def test_png_alpha_flattened_onto_white_for_jpeg(tmp_path):
+    source = tmp_path / "logo.png"
+    img = Image.new("RGBA", (80, 40), (0, 0, 0, 0))
+    img.paste((200, 0, 0, 255), (0, 0, 40, 40))
+    img.save(source, format="PNG")
+
+    rendered = _render(source, tmp_path)
+
+    # 原图只有 80 宽，所有档位都收成 80
+    assert {width for _, _, width, _, _ in rendered} == {80}
+    with Image.open(tmp_path / "logo_80.jpg") as jpeg:
+        assert jpeg.mode == "RGB"
+        assert all(channel > 245 for channel in jpeg.getpixel((70, 20)))  # 透明区域 -> 白
+        red, green, blue = jpeg.getpixel((10, 20))
+        assert red > 180 and green < 40 and blue < 40
+    with Image.open(tmp_path / "logo_80.webp") as webp:
+        assert webp.mode == "RGBA"
+        assert webp.getpixel((70, 20))[3] == 0
+
+
+def test_animated_gif_skipped(tmp_path):
+    source = tmp_path / "anim.gif"
+    frames = [Image.new("RGB", (50, 50), color) for color in ((255, 0, 0), (0, 0, 255))]
+    frames[0].save(source, format="GIF", save_all=True, append_images=frames[1:])
+
+    assert _render(source, tmp_path) == []
@@ -0,0 +1,75 @@
+# tests/test_image_probe.py
+# 只读文件头识别格式和宽高：结果要和 Pillow 完整打开一致，伪造的超大尺寸不解码就被拒绝
+import io
+import os
+import struct
+import sys
+import zlib
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.image_probe import ImageTooLarge, InvalidImage, probe_image, validate_image  # noqa: E402
+
+
+def _png_header(width, height):
+    ihdr = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    crc = struct.pack(">I", zlib.crc32(b"IHDR" + ihdr) & 0xFFFFFFFF)
+    return b"\x89PNG\r\n\x1a\n" + struct.pack(">I", len(ihdr)) + b"IHDR" + ihdr + crc
+
+
+@pytest.mark.parametrize(
+    "fmt,options",
+    [
+        ("PNG", {}),
+        ("JPEG", {"exif": b"Exif\x00\x00" + b"\x00" * 40000}),  # 大 EXIF 段排在 SOF 前面
+        ("JPEG", {"progressive": True}),
+        ("GIF", {}),
+        ("WEBP", {"lossless": False}),
+        ("WEBP", {"lossless": True}),
+    ],
+)
+def test_probe_matches_pillow(fmt, options):
+    image_module = pytest.importorskip("PIL.Image")
+    buf = io.BytesIO()
+    image_module.new("RGB", (123, 45), (200, 30, 30)).save(buf, format=fmt, **options)
+    info = probe_image(buf)
+    assert (info.format, info.width, info.height) == (fmt.lower(), 123, 45)
+    assert buf.tell() == 0
+
+
+def test_webp_extended_canvas():
+    image_module = pytest.importorskip("PIL.Image")
+    buf = io.BytesIO()
+    image_module.new("RGBA", (300, 7), (0, 0, 0, 0)).save(buf, format="WEBP")
+    info = probe_image(buf)
+    assert (info.width, info.height) == (300, 7)
+
+
+def test_decompression_bomb_rejected_from_header():
+    # 只有文件头，声明 50000×50000
+    with pytest.raises(ImageTooLarge) as exc:
+        validate_image(io.BytesIO(_png_header(50000, 50000)), max_side=8192, max_pixels=24_000_000)
+    assert exc.value.info.pixels == 50000 * 50000
+
+    with pytest.raises(ImageTooLarge):
+        validate_image(io.BytesIO(_png_header(6000, 6000)), max_side=8192, max_pixels=24_000_000)
+
+    info = validate_image(io.BytesIO(_png_header(4000, 3000)), max_side=8192, max_pixels=24_000_000)
+    assert info.extension == "png"
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        b"<?php echo 1; ?>",
+        b"",
+        b"\x89PNG\r\n\x1a\n",
+        b"\xff\xd8\xff\xe0\x00\x10JFIF",
+        _png_header(0, 10),
+    ],
+)
+def test_invalid_images(data):
+    with pytest.raises(InvalidImage):
+        probe_image(io.BytesIO(data))
@@ -0,0 +1,102 @@
+# tests/test_leaderboard.py
+# 排行榜内存结构：增减分后的名次要和朴素排序一致 (同分并列)；
+# 刷新时只统计可见节点，水位按数据库时间推进
+import asyncio
+import os
+import random
+import sys
+from datetime import timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import func, select, update  # noqa: E402
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine  # noqa: E402
+
+from app.models.base import Base  # noqa: E402
+from app.models.story import NodeLike, NodeStatus, StoryNode  # noqa: E402
+from app.models.story_book import StoryBook  # noqa: E402
+from app.models.user import User  # noqa: E402
+from app.utils.leaderboard import Leaderboard, LeaderboardService  # noqa: E402
+
+
+def test_rank_matches_naive_ranking():
+    rng = random.Random(42)
+    board = Leaderboard()
+    expected = {}
+    for _ in range(3000):
+        user_id = rng.randint(1, 80)
+        delta = rng.choice([1, 1, 2, 3, -1, -2])
+        board.add(user_id, delta)
+        expected[user_id] = max(0, expected.get(user_id, 0) + delta)
+    expected = {uid: score for uid, score in expected.items() if score > 0}
+
+    assert len(board) == len(expected)
+    for uid, score in expected.items():
+        higher = sum(1 for s in expected.values() if s > score)
+        assert board.rank(uid) == (higher + 1, score)
+
+    top = board.top(10)
+    assert [score for _, _, score in top] == sorted(expected.values(), reverse=True)[:10]
+    assert all(board.rank(uid) == (rank, score) for rank, uid, score in top)
+
+
+def test_removed_when_score_drops_to_zero():
+    board = Leaderboard()
+    board.add(1, 2)
+    board.add(2, 5)
+    board.add(1, -2)
+    assert board.rank(1) is None
+    assert board.top(10) == [(1, 2, 5)]
+
+
+def test_refresh_counts_only_visible_nodes_on_db_clock():
+    pytest.importorskip("aiosqlite")
+
+    async def scenario():
+        engine = create_async_engine("sqlite+aiosqlite://")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        sessions = async_sessionmaker(engine, expire_on_commit=False)
+        async with sessions() as db:
+            db.add_all([
+                User(id=1, email="a@example.com", username="a", hashed_password="x"),
+                User(id=2, email="b@example.com", username="b", hashed_password="x"),
+                User(id=3, email="c@example.com", username="c", hashed_password="x"),
+                StoryBook(id=1, title="book"),
+            ])
+            await db.flush()
+            db.add_all([
+                StoryNode(id=10, book_id=1, author_id=1, content="ok",
+                          status=NodeStatus.PUBLISHED, published_at=func.now()),
+                StoryNode(id=11, book_id=1, author_id=2, content="pending", status=NodeStatus.PENDING),
+                StoryNode(id=12, book_id=1, author_id=2, content="rejected", status=NodeStatus.REJECTED),
+            ])
+            await db.flush()
+            db.add_all([NodeLike(user_id=u, node_id=n) for u in (2, 3) for n in (10, 11, 12)])
+            await db.commit()
+
+        service = LeaderboardService(full_rebuild_seconds=3600, lag_seconds=2)
+        async with sessions() as db:
+            # 刚写入的数据还在滞后窗口里，把 created_at / published_at 往前挪到水位之前
+            await db.execute(update(NodeLike).values(created_at=func.datetime(NodeLike.created_at, "-5 seconds")))
+            await db.execute(
+                update(StoryNode)
+                .where(StoryNode.published_at.is_not(None))
+                .values(published_at=func.datetime(StoryNode.published_at, "-5 seconds"))
+            )
+            await db.commit()
+            await service.refresh(db)
+            db_now = (await db.execute(select(func.now()))).scalar_one()
+
+        likes = service.get("likes", "all")
+        assert [(uid, score) for _, uid, score in likes.top(10)] == [(1, 2)]
+        assert service.get("likes", "week", 1).rank(2) is None
+        assert service.get("branches", "all").rank(1) == (1, 1)
+        assert service.get("branches", "all").rank(2) is None
+        assert abs(service._watermark - (db_now - timedelta(seconds=2))) <= timedelta(seconds=1)
+
+        await engine.dispose()
+
+    asyncio.run(scenario())
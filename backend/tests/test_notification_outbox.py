@@ -0,0 +1,142 @@
+# tests/test_notification_outbox.py
+# 通知发件箱 worker：分批转成通知并带 id 推送；引用已被删除的事件不能卡住后面的通知
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+pytest.importorskip("aiosqlite")
+
+from sqlalchemy import func, select  # noqa: E402
+from sqlalchemy.dialects import mysql  # noqa: E402
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine  # noqa: E402
+
+from app.models.base import Base  # noqa: E402
+from app.models.interaction import Notification, NotificationOutbox, NotificationType, StoryComment  # noqa: E402
+from app.models.story import StoryNode  # noqa: E402
+from app.models.story_book import StoryBook  # noqa: E402
+from app.models.user import User  # noqa: E402
+from app.utils import notification_outbox  # noqa: E402
+from app.utils.notification_outbox import NotificationOutboxWorker, enqueue_notification  # noqa: E402
+
+
+@pytest.fixture
+def published(monkeypatch):
+    events = []
+
+    async def publish(channel, event_type, data):
+        events.append((channel, event_type, data))
+
+    monkeypatch.setattr(notification_outbox.broker, "publish", publish)
+    return events
+
+
+async def _seed():
+    """两个用户、一个节点和它下面的一条评论"""
+    engine = create_async_engine("sqlite+aiosqlite://")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    sessions = async_sessionmaker(engine, expire_on_commit=False)
+    async with sessions() as db:
+        db.add_all([
+            User(id=1, email="a@example.com", username="a", hashed_password="x"),
+            User(id=2, email="b@example.com", username="b", hashed_password="x"),
+            StoryBook(id=1, title="book"),
+        ])
+        await db.flush()
+        db.add(StoryNode(id=10, book_id=1, author_id=1, content="root"))
+        await db.flush()
+        db.add(StoryComment(id=100, node_id=10, user_id=2, content="hi"))
+        await db.commit()
+    return engine, sessions
+
+
+async def _drain(sessions, worker):
+    async with sessions() as db:
+        while await worker.drain_once(db) >= worker.batch_size:
+            pass
+    async with sessions() as db:
+        notifications = (await db.execute(select(Notification).order_by(Notification.id))).scalars().all()
+        left = (await db.execute(select(func.count()).select_from(NotificationOutbox))).scalar()
+    return notifications, left
+
+
+def test_claim_uses_skip_locked():
+    sql = str(NotificationOutboxWorker(50, 1).claim_stmt().compile(dialect=mysql.dialect()))
+    assert "FOR UPDATE SKIP LOCKED" in sql
+
+
+def test_drains_in_batches_and_publishes_ids(published):
+    async def scenario():
+        engine, sessions = await _seed()
+        async with sessions() as db:
+            for _ in range(5):
+                enqueue_notification(db, 1, 2, NotificationType.LIKED, node_id=10)
+            await db.commit()
+        result = await _drain(sessions, NotificationOutboxWorker(batch_size=2, poll_seconds=1))
+        await engine.dispose()
+        return result
+
+    notifications, left = asyncio.run(scenario())
+
+    assert left == 0
+    assert len(notifications) == 5
+    assert [data["id"] for _, _, data in published] == [n.id for n in notifications]
+    assert {channel for channel, _, _ in published} == {"user:1"}
+
+
+def test_deleted_references_do_not_block_the_queue(published):
+    async def scenario():
+        engine, sessions = await _seed()
+        async with sessions() as db:
+            enqueue_notification(db, 1, 2, NotificationType.COMMENTED, node_id=999, comment_id=100)  # 节点已删：置空
+            enqueue_notification(db, 1, 2, NotificationType.LIKED, node_id=999)  # 没有目标：丢弃
+            enqueue_notification(db, 3, 2, NotificationType.LIKED, node_id=10)  # 接收者已删：丢弃
+            enqueue_notification(db, 1, 3, NotificationType.LIKED, node_id=10)  # 发送者已删：置空
+            enqueue_notification(db, 2, 1, NotificationType.APPROVED, node_id=10)
+            await db.commit()
+        result = await _drain(sessions, NotificationOutboxWorker(batch_size=10, poll_seconds=1))
+        await engine.dispose()
+        return result
+
+    notifications, left = asyncio.run(scenario())
+
+    assert left == 0
+    assert [(n.user_id, n.sender_id, n.node_id, n.comment_id) for n in notifications] == [
+        (1, 2, None, 100),
+        (1, None, 10, None),
+        (2, 1, 10, None),
+    ]
+    assert len(published) == 3
+
+
+def test_failed_batch_falls_back_to_row_by_row(published, monkeypatch):
+    async def unchecked(self, db, rows):
+        # 模拟检查之后引用又被删掉：坏行到 INSERT 时才失败 (这里用 CHECK 约束触发)
+        return [
+            {"user_id": r.receiver_id, "sender_id": r.sender_id, "type": r.type, "node_id": r.node_id,
+             "comment_id": r.comment_id, "is_read": False, "created_at": r.created_at}
+            for r in rows
+        ]
+
+    monkeypatch.setattr(NotificationOutboxWorker, "_resolve_references", unchecked)
+
+    async def scenario():
+        engine, sessions = await _seed()
+        async with sessions() as db:
+            enqueue_notification(db, 1, 2, NotificationType.LIKED, node_id=10)
+            enqueue_notification(db, 1, 2, NotificationType.LIKED)  # 没有目标，违反 ck_notifications_target_present
+            enqueue_notification(db, 2, 1, NotificationType.APPROVED, node_id=10)
+            await db.commit()
+        result = await _drain(sessions, NotificationOutboxWorker(batch_size=10, poll_seconds=1))
+        await engine.dispose()
+        return result
+
+    notifications, left = asyncio.run(scenario())
+
+    assert left == 0
+    assert [(n.user_id, n.node_id) for n in notifications] == [(1, 10), (2, 10)]
+    assert [data["id"] for _, _, data in published] == [n.id for n in notifications]
@@ -0,0 +1,112 @@
+# tests/test_rate_limit.py
+# 令牌桶限流和客户端 IP 识别：只有受信代理转发的 X-Forwarded-For 才算数
+import asyncio
+import ipaddress
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from starlette.requests import Request  # noqa: E402
+
+from app.api import deps  # noqa: E402
+from app.utils import rate_limit  # noqa: E402
+from app.utils.rate_limit import InMemoryBackend, RateLimiter, RateLimitRule  # noqa: E402
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rate_limit.time, "monotonic", clock)
+    return clock
+
+
+def _hit(limiter, key, rule, cost=1):
+    return asyncio.run(limiter.hit(key, rule, cost))
+
+
+def test_bucket_drains_and_refills(clock):
+    limiter = RateLimiter(InMemoryBackend(max_keys=100))
+    rule = RateLimitRule(capacity=3, refill_per_second=0.5)
+
+    assert [_hit(limiter, "k", rule)[0] for _ in range(4)] == [True, True, True, False]
+    assert _hit(limiter, "k", rule) == (False, 2)
+    # 别的 key 有自己的桶
+    assert _hit(limiter, "other", rule) == (True, 0)
+
+    clock.now += 2
+    assert _hit(limiter, "k", rule) == (True, 0)
+    assert _hit(limiter, "k", rule)[0] is False
+
+    # 补充不超过容量
+    clock.now += 3600
+    assert [_hit(limiter, "k", rule)[0] for _ in range(4)] == [True, True, True, False]
+
+
+def test_cost_and_disabled_limiter(clock):
+    rule = RateLimitRule(capacity=10, refill_per_second=1)
+    limiter = RateLimiter(InMemoryBackend(max_keys=100))
+    assert _hit(limiter, "k", rule, cost=8) == (True, 0)
+    assert _hit(limiter, "k", rule, cost=5) == (False, 3)
+
+    disabled = RateLimiter(InMemoryBackend(max_keys=100), enabled=False)
+    assert all(_hit(disabled, "k", rule, cost=100)[0] for _ in range(3))
+
+
+def test_least_recently_used_bucket_is_evicted(clock):
+    limiter = RateLimiter(InMemoryBackend(max_keys=2))
+    rule = RateLimitRule(capacity=1, refill_per_second=0.001)
+    _hit(limiter, "a", rule)
+    _hit(limiter, "b", rule)
+    _hit(limiter, "c", rule)
+    # a 被淘汰，重新从满桶开始；b 还在
+    assert _hit(limiter, "a", rule)[0] is True
+    assert _hit(limiter, "c", rule)[0] is False
+
+
+def _request(peer, *forwarded):
+    headers = [(b"x-forwarded-for", value.encode()) for value in forwarded]
+    return Request({"type": "http", "client": (peer, 1234), "headers": headers})
+
+
+@pytest.fixture
+def trusted(monkeypatch):
+    networks = [ipaddress.ip_network(p) for p in ("10.0.0.0/8", "127.0.0.1/32")]
+    monkeypatch.setattr(deps, "_TRUSTED_PROXIES", networks)
+
+
+def test_forwarded_for_ignored_from_untrusted_peer(trusted):
+    assert deps._client_ip(_request("203.0.113.7", "1.2.3.4")) == "203.0.113.7"
+
+
+def test_forwarded_for_skips_trusted_hops(trusted):
+    # 客户端自己伪造的最左边一段不算，取最右边第一个不受信的地址
+    assert deps._client_ip(_request("10.0.0.2", "6.6.6.6, 198.51.100.9, 10.0.0.1")) == "198.51.100.9"
+    # 多个请求头按顺序拼接
+    assert deps._client_ip(_request("127.0.0.1", "6.6.6.6", "198.51.100.9")) == "198.51.100.9"
+    # 不是 IP 的值不会被当成受信代理跳过
+    assert deps._client_ip(_request("10.0.0.2", "198.51.100.9, garbage")) == "garbage"
+
+
+def test_trusted_peer_without_forwarded_for(trusted):
+    assert deps._client_ip(_request("10.0.0.2")) == "10.0.0.2"
+    assert deps._client_ip(_request("10.0.0.2", "10.0.0.1")) == "10.0.0.1"
+
+
+def test_no_trusted_proxies_by_default(monkeypatch):
+    monkeypatch.setattr(deps, "_TRUSTED_PROXIES", [])
+    assert deps._client_ip(_request("127.0.0.1", "1.2.3.4")) == "127.0.0.1"
+
+
+def test_email_rate_key_is_normalised():
+    assert deps.email_rate_key("email-code", "  A@Example.COM ") == deps.email_rate_key("email-code", "a@example.com")
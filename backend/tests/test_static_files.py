@@ -0,0 +1,86 @@
+# tests/test_static_files.py
+# /static 的缓存头、ETag/304、Range 以及按 Accept-Encoding 选择预压缩文件
+import gzip
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from starlette.applications import Starlette  # noqa: E402
+from starlette.routing import Mount  # noqa: E402
+from starlette.testclient import TestClient  # noqa: E402
+
+from app.utils.static_files import CachedStaticFiles, accepted_encodings  # noqa: E402
+
+SVG = b"<svg>" + b"x" * 4000 + b"</svg>"
+try:
+    import brotli
+
+    SVG_BR = brotli.compress(SVG)
+except ImportError:
+    # 没装 brotli 时客户端也不会解码 br，内容无所谓
+    SVG_BR = b"fake-brotli"
+
+
+@pytest.fixture
+def client(tmp_path):
+    (tmp_path / "uploads").mkdir()
+    (tmp_path / "uploads" / "a.png").write_bytes(b"\x89PNG" + bytes(range(256)) * 4)
+    (tmp_path / "logo.svg").write_bytes(SVG)
+    (tmp_path / "logo.svg.gz").write_bytes(gzip.compress(SVG))
+    (tmp_path / "logo.svg.br").write_bytes(SVG_BR)
+    app = Starlette(routes=[Mount("/static", CachedStaticFiles(directory=str(tmp_path)))])
+    return TestClient(app)
+
+
+def test_upload_cached_immutable_with_etag_and_304(client, tmp_path):
+    r = client.get("/static/uploads/a.png")
+    assert r.status_code == 200
+    assert "immutable" in r.headers["cache-control"]
+    stat_result = os.stat(tmp_path / "uploads" / "a.png")
+    assert r.headers["etag"] == f'"{int(stat_result.st_mtime):x}-{stat_result.st_size:x}"'
+
+    r = client.get("/static/uploads/a.png", headers={"If-None-Match": r.headers["etag"]})
+    assert r.status_code == 304
+    assert r.content == b""
+
+
+def test_range_request(client):
+    r = client.get("/static/uploads/a.png", headers={"Range": "bytes=0-9"})
+    assert r.status_code == 206
+    assert r.headers["content-range"] == "bytes 0-9/1028"
+    assert r.content == b"\x89PNG" + bytes(range(6))
+
+    # 文本资源的 Range 按原文件计算，不返回压缩版本
+    r = client.get("/static/logo.svg", headers={"Range": "bytes=0-4", "Accept-Encoding": "gzip"})
+    assert r.status_code == 206
+    assert "content-encoding" not in r.headers
+    assert r.content == b"<svg>"
+
+
+@pytest.mark.parametrize(
+    "accept,encoding",
+    [
+        ("gzip", "gzip"),
+        ("gzip, br", "br"),
+        ("br;q=0.5, gzip", "gzip"),
+        ("gzip;q=0", None),
+        ("br;q=0, gzip;q=0", None),
+        ("", None),
+    ],
+)
+def test_precompressed_sibling_selection(client, accept, encoding):
+    r = client.get("/static/logo.svg", headers={"Accept-Encoding": accept})
+    assert r.status_code == 200
+    assert r.headers.get("content-encoding") == encoding
+    assert r.headers["vary"] == "Accept-Encoding"
+    if encoding is None:
+        assert r.content == SVG
+
+
+def test_accepted_encodings_wildcard():
+    assert accepted_encodings("*") == ["br", "gzip"]
+    assert accepted_encodings("br;q=0, *") == ["gzip"]
+    assert accepted_encodings("identity") == []
@@ -0,0 +1,108 @@
+# tests/test_storage.py
+# 存储后端的公共行为：local 用临时目录；s3 用本地 moto server 作为 S3 替身 (没装 boto3/moto 时跳过)
+import hashlib
+import io
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.storage import InvalidUploadToken, LocalStorage, S3Storage  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def moto_endpoint():
+    pytest.importorskip("boto3")
+    moto_server = pytest.importorskip("moto.server")
+    server = moto_server.ThreadedMotoServer(ip_address="127.0.0.1", port=0, verbose=False)
+    server.start()
+    host, port = server.get_host_and_port()
+    yield f"http://{host}:{port}"
+    server.stop()
+
+
+@pytest.fixture(params=["local", "s3"])
+def backend(request, tmp_path):
+    if request.param == "local":
+        return LocalStorage(str(tmp_path / "uploads"))
+    endpoint = request.getfixturevalue("moto_endpoint")
+    s3 = S3Storage(
+        "uploads-test",
+        endpoint_url=endpoint,
+        region="us-east-1",
+        access_key_id="test",
+        secret_access_key="test",
+    )
+    s3.client.create_bucket(Bucket=s3.bucket)
+    for obj in s3.iter_objects():
+        s3.delete(obj.key)
+    return s3
+
+
+def test_backend_roundtrip(backend, tmp_path):
+    backend.put_file(io.BytesIO(b"\x89PNG" + b"\x00" * 100), "a.png", "image/png")
+    generated = tmp_path / "a_96.webp"
+    generated.write_bytes(b"RIFF")
+    backend.put_path(str(generated), "variants/a_96.webp", "image/webp")
+
+    assert backend.exists("a.png")
+    assert not backend.exists("missing.png")
+    assert backend.stat("a.png").size == 104
+    assert backend.stat("missing.png") is None
+    assert backend.read_head("a.png", 4) == b"\x89PNG"
+    assert sorted(obj.key for obj in backend.iter_objects()) == ["a.png", "variants/a_96.webp"]
+    assert backend.key_from_url(backend.url("variants/a_96.webp")) == "variants/a_96.webp"
+    assert backend.key_from_url("https://example.com/a.png") is None
+
+    downloaded = tmp_path / "copy.png"
+    backend.download("a.png", str(downloaded))
+    assert downloaded.read_bytes()[:4] == b"\x89PNG"
+
+    backend.delete("a.png")
+    backend.delete("a.png")  # 删除不存在的 key 不报错
+    assert not backend.exists("a.png")
+
+
+def test_s3_presigned_urls_bypass_api(moto_endpoint):
+    requests = pytest.importorskip("requests")
+    s3 = S3Storage("presign-test", endpoint_url=moto_endpoint, region="us-east-1",
+                   access_key_id="test", secret_access_key="test")
+    s3.client.create_bucket(Bucket=s3.bucket)
+
+    data = os.urandom(2048)
+    sha256 = hashlib.sha256(data).hexdigest()
+    upload = s3.presign_upload(f"{sha256}.png", "image/png", len(data), sha256, expires_in=60)
+    assert "x-amz-checksum-sha256" in upload.headers
+    r = requests.put(upload.url, data=data, headers=upload.headers, timeout=10)
+    assert r.status_code == 200
+
+    r = requests.get(s3.presign_download(f"{sha256}.png", expires_in=60), timeout=10)
+    assert r.content == data
+
+
+def test_local_upload_token(tmp_path):
+    local = LocalStorage(str(tmp_path))
+    upload = local.presign_upload("x.png", "image/png", 10, "0" * 64, expires_in=60)
+    token = upload.url.split("token=", 1)[1]
+    claims = local.verify_upload_token(token)
+    assert (claims["key"], claims["size"], claims["ct"]) == ("x.png", 10, "image/png")
+
+    with pytest.raises(InvalidUploadToken):
+        local.verify_upload_token(token[:-2] + "xx")
+    expired = local.presign_upload("x.png", "image/png", 10, "0" * 64, expires_in=-1)
+    with pytest.raises(InvalidUploadToken):
+        local.verify_upload_token(expired.url.split("token=", 1)[1])
+    with pytest.raises(ValueError):
+        local.stat("../outside.png")
+
+
+def test_local_temp_files_listed_separately(tmp_path):
+    local = LocalStorage(str(tmp_path))
+    local.put_file(io.BytesIO(b"data"), "variants/a_96.webp")
+    (tmp_path / ".upload-x.part").write_bytes(b"half")
+    (tmp_path / "variants" / "b_96.webp.part").write_bytes(b"half")
+
+    assert [obj.key for obj in local.iter_objects()] == ["variants/a_96.webp"]
+    assert sorted(obj.key for obj in local.iter_temp_files()) == [".upload-x.part", "variants/b_96.webp.part"]
@@ -0,0 +1,69 @@
+# tests/test_unread_counter.py
+# 未读计数缓存：COUNT 期间来了新通知时不能把过时的计数写进缓存
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.unread_counter import UnreadCounter  # noqa: E402
+from app.utils import unread_counter as unread_module  # noqa: E402
+
+
+class FakeResult:
+    def __init__(self, value):
+        self.value = value
+
+    def scalar(self):
+        return self.value
+
+
+class FakeDB:
+    """COUNT 返回 count，返回前先执行 during (模拟 COUNT 期间发件箱提交了一条通知)"""
+
+    def __init__(self, count, during=None):
+        self.count = count
+        self.during = during
+        self.queries = 0
+
+    async def execute(self, stmt):
+        self.queries += 1
+        if self.during is not None:
+            self.during()
+        return FakeResult(self.count)
+
+
+def test_incr_only_touches_cached_users():
+    counter = UnreadCounter(ttl_seconds=60, max_entries=10)
+    counter.incr(1)
+    assert counter.get(1) is None
+
+    generation = counter.begin_load(1)
+    counter.finish_load(1, generation, 3)
+    counter.incr(1)
+    counter.incr(1, -10)
+    assert counter.get(1) == 0
+
+
+def test_count_is_not_cached_when_incremented_during_load(monkeypatch):
+    counter = UnreadCounter(ttl_seconds=60, max_entries=10)
+    monkeypatch.setattr(unread_module, "unread_counter", counter)
+
+    racing = FakeDB(count=2, during=lambda: counter.incr(7))
+    assert asyncio.run(unread_module.get_unread_count(racing, 7)) == 2
+    # 过时的 2 没有写入，下次重新对账
+    assert counter.get(7) is None
+
+    quiet = FakeDB(count=3)
+    assert asyncio.run(unread_module.get_unread_count(quiet, 7)) == 3
+    assert asyncio.run(unread_module.get_unread_count(quiet, 7)) == 3
+    assert quiet.queries == 1
+    assert counter._loading == {}
+
+
+def test_reset_during_load_wins():
+    counter = UnreadCounter(ttl_seconds=60, max_entries=10)
+    generation = counter.begin_load(5)
+    counter.reset(5)
+    counter.finish_load(5, generation, 9)
+    assert counter.get(5) == 0
@@ -0,0 +1,88 @@
+# tests/test_upload_gc.py
+# 上传文件 GC：按 sha256 / 旧 uuid4 文件名识别引用；用 sqlite 临时库 + 本地存储临时目录
+import asyncio
+import hashlib
+import io
+import os
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+pytest.importorskip("aiosqlite")
+
+from fastapi import UploadFile  # noqa: E402
+from sqlalchemy import select  # noqa: E402
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine  # noqa: E402
+
+from app.models.base import Base  # noqa: E402
+from app.models.story import StoryNode  # noqa: E402
+from app.models.story_book import StoryBook  # noqa: E402
+from app.models.upload import ImageVariant, ImageVariantSkip, UploadBlob  # noqa: E402
+from app.models.user import User  # noqa: E402
+from app.utils import upload_gc, upload_store  # noqa: E402
+from app.utils.storage import LocalStorage  # noqa: E402
+
+TABLES = [t.__table__ for t in (User, StoryBook, StoryNode, UploadBlob, ImageVariant, ImageVariantSkip)]
+
+
+def _put(storage, key, data, age_seconds):
+    storage.put_file(io.BytesIO(data), key)
+    old = time.time() - age_seconds
+    os.utime(storage.local_path(key), (old, old))
+
+
+def test_gc_matches_legacy_keys_and_releases_blobs(tmp_path, monkeypatch):
+    storage = LocalStorage(str(tmp_path / "uploads"))
+    monkeypatch.setattr(upload_gc, "storage", storage)
+    monkeypatch.setattr(upload_store, "storage", storage)
+
+    legacy_used = f"{uuid.uuid4()}.png"
+    legacy_orphan = f"{uuid.uuid4()}.jpg"
+    orphan_data = b"orphan image bytes"
+    orphan_sha = hashlib.sha256(orphan_data).hexdigest()
+    day = 24 * 3600
+    for key in (legacy_used, legacy_orphan, f"variants/{legacy_orphan[:-4]}_96.webp", "notes.txt"):
+        _put(storage, key, b"x", 2 * day)
+    _put(storage, f"{orphan_sha}.png", orphan_data, 2 * day)
+
+    async def scenario():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'db.sqlite'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(lambda sync_conn: Base.metadata.create_all(sync_conn, tables=TABLES))
+        sessions = async_sessionmaker(engine, expire_on_commit=False)
+        async with sessions() as db:
+            db.add(User(email="a@example.com", username="a", hashed_password="x", avatar=storage.url(legacy_used)))
+            db.add(UploadBlob(
+                sha256=orphan_sha,
+                filename=f"{orphan_sha}.png",
+                size=len(orphan_data),
+                last_uploaded_at=datetime.now(timezone.utc) - timedelta(days=2),
+            ))
+            await db.commit()
+
+        async with sessions() as db:
+            report = await upload_gc.collect_upload_garbage(db, dry_run=False, grace_seconds=day)
+        async with sessions() as db:
+            blobs_after_gc = (await db.execute(select(UploadBlob.sha256))).scalars().all()
+
+        # 记录随文件一起删掉了：再次上传同一内容不会命中去重，而是重新写文件
+        async with sessions() as db:
+            stored = await upload_store.save_upload(db, UploadFile(io.BytesIO(orphan_data), filename="a.png"), "png")
+            await db.commit()
+        await engine.dispose()
+        return report, blobs_after_gc, stored
+
+    report, blobs_after_gc, stored = asyncio.run(scenario())
+
+    assert report.deleted == 3
+    assert storage.exists(legacy_used)
+    assert storage.exists("notes.txt")
+    assert not storage.exists(legacy_orphan)
+    assert not storage.exists(f"variants/{legacy_orphan[:-4]}_96.webp")
+    assert blobs_after_gc == []
+    assert stored.created and storage.exists(stored.filename)
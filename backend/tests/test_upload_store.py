@@ -0,0 +1,123 @@
+# tests/test_upload_store.py
+# 按内容寻址去重、直传完成凭证；用 sqlite 临时库 + 本地存储临时目录
+import asyncio
+import hashlib
+import io
+import os
+import struct
+import sys
+import zlib
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+pytest.importorskip("aiosqlite")
+
+from fastapi import UploadFile  # noqa: E402
+from sqlalchemy import select  # noqa: E402
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine  # noqa: E402
+
+from app.models.upload import UploadBlob  # noqa: E402
+from app.utils import upload_store  # noqa: E402
+from app.utils.image_probe import ImageTooLarge  # noqa: E402
+from app.utils.storage import InvalidUploadToken, LocalStorage  # noqa: E402
+
+
+def _png(width, height):
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+    raw = b"".join(b"\x00" + b"\x80" * (width * 3) for _ in range(height))
+    ihdr = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", ihdr) + chunk(b"IDAT", zlib.compress(raw)) + chunk(b"IEND", b"")
+
+
+class CountingStorage(LocalStorage):
+    def __init__(self, root):
+        super().__init__(root)
+        self.writes = 0
+
+    def put_file(self, src, key, content_type=None):
+        self.writes += 1
+        super().put_file(src, key, content_type)
+
+
+async def _sessions(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'db.sqlite'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(UploadBlob.__table__.create)
+    return engine, async_sessionmaker(engine, expire_on_commit=False)
+
+
+def test_identical_upload_is_deduplicated(tmp_path, monkeypatch):
+    storage = CountingStorage(str(tmp_path / "uploads"))
+    monkeypatch.setattr(upload_store, "storage", storage)
+    data = _png(16, 16)
+
+    async def scenario():
+        engine, sessions = await _sessions(tmp_path)
+        results = []
+        for name in ("a.png", "copy-of-a.png"):
+            async with sessions() as db:
+                results.append(await upload_store.save_upload(db, UploadFile(io.BytesIO(data), filename=name), "png"))
+                await db.commit()
+        async with sessions() as db:
+            blobs = (await db.execute(select(UploadBlob))).scalars().all()
+        await engine.dispose()
+        return results, blobs
+
+    (first, second), blobs = asyncio.run(scenario())
+
+    assert first.created and not second.created
+    assert second.filename == first.filename
+    assert storage.writes == 1
+    assert os.listdir(tmp_path / "uploads") == [first.filename]
+    assert [(blob.filename, blob.size) for blob in blobs] == [(first.filename, len(data))]
+
+
+def test_direct_upload_completion_ticket(tmp_path, monkeypatch):
+    storage = CountingStorage(str(tmp_path / "uploads"))
+    monkeypatch.setattr(upload_store, "storage", storage)
+    data = _png(16, 16)
+    sha256 = hashlib.sha256(data).hexdigest()
+
+    async def scenario():
+        engine, sessions = await _sessions(tmp_path)
+        async with sessions() as db:
+            ticket = await upload_store.prepare_direct_upload(db, 7, sha256, len(data), "image/png")
+        # 模拟客户端 PUT 到存储
+        storage.put_file(io.BytesIO(data), ticket.filename)
+
+        async with sessions() as db:
+            with pytest.raises(InvalidUploadToken):
+                await upload_store.complete_direct_upload(db, 8, ticket.complete_token)
+            first = await upload_store.complete_direct_upload(db, 7, ticket.complete_token)
+            await db.commit()
+        async with sessions() as db:
+            again = await upload_store.complete_direct_upload(db, 7, ticket.complete_token)
+
+        # 已入库的对象即使按收紧后的规则不合规也不删除 (复用时不再校验)
+        monkeypatch.setattr(upload_store.settings, "IMAGE_MAX_PIXELS", 10)
+        async with sessions() as db:
+            after_limit = await upload_store.complete_direct_upload(db, 7, ticket.complete_token)
+
+        # 未入库的新对象不合规时删除
+        big = _png(8, 8)
+        big_sha = hashlib.sha256(big).hexdigest()
+        async with sessions() as db:
+            big_ticket = await upload_store.prepare_direct_upload(db, 7, big_sha, len(big), "image/png")
+        storage.put_file(io.BytesIO(big), big_ticket.filename)
+        async with sessions() as db:
+            with pytest.raises(ImageTooLarge):
+                await upload_store.complete_direct_upload(db, 7, big_ticket.complete_token)
+        await engine.dispose()
+        return ticket, first, again, after_limit, big_ticket
+
+    ticket, first, again, after_limit, big_ticket = asyncio.run(scenario())
+
+    assert first.created and first.filename == ticket.filename
+    assert not again.created and again.filename == ticket.filename
+    assert not after_limit.created
+    assert storage.exists(ticket.filename)
+    assert not storage.exists(big_ticket.filename)
@@ -1,6 +1,8 @@
 import api from './api'
 import type {
   AuditNodeRequest,
+  BulkAuditNodesRequest,
+  BulkAuditNodesResponse,
   StoryNodeTreeItem,
   AdminUpdateUserRequest,
   GetPendingNodesParams,
@@ -19,6 +21,11 @@ export const auditNode = (nodeId: number, data: AuditNodeRequest) => {
   return api.patch<StoryNodeTreeItem>(`/admin/nodes/${nodeId}/audit`, data)
 }
 
+// 批量审核节点（一次请求、一个事务），results 与提交顺序一致
+export const bulkAuditNodes = (data: BulkAuditNodesRequest) => {
+  return api.post<BulkAuditNodesResponse>('/admin/nodes/audit', data)
+}
+
 // 管理员更新用户（封禁、改角色）
 export const adminUpdateUser = (userId: number, data: AdminUpdateUserRequest) => {
   return api.patch(`/admin/users/${userId}`, data)
@@ -30,13 +30,29 @@ api.interceptors.response.use(
   (response: AxiosResponse) => {
     return response
   },
-  (error: AxiosError<MessageResponse>) => {
+  async (error: AxiosError<MessageResponse>) => {
     if (error.response) {
       const { status, data } = error.response
 
       // 处理 401 未授权
       if (status === 401) {
         const authStore = useAuthStore()
+        const original = error.config as (InternalAxiosRequestConfig & { _retried?: boolean }) | undefined
+        const isAuthCall = original?.url?.startsWith('/auth/refresh') || original?.url?.startsWith('/auth/logout')
+        // 访问令牌过期：先用刷新令牌换新，再重放原请求一次
+        if (original && !original._retried && !isAuthCall && authStore.refreshToken) {
+          original._retried = true
+          try {
+            const newToken = await authStore.refresh()
+            original.headers.Authorization = `Bearer ${newToken}`
+            return api(original)
+          } catch {
+            // 刷新失败，按登录过期处理
+          }
+        }
+        if (isAuthCall) {
+          return Promise.reject(new Error('登录已过期，请重新登录'))
+        }
         authStore.logout()
         window.location.href = '/login'
         return Promise.reject(new Error('登录已过期，请重新登录'))
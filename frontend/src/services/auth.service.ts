@@ -44,6 +44,16 @@ export const login = (data: LoginFormData) => {
   })
 }
 
+// 用刷新令牌换取新的访问令牌（旧刷新令牌随即作废）
+export const refreshToken = (refresh_token: string) => {
+  return api.post<TokenResponse>('/auth/refresh', { refresh_token })
+}
+
+// 退出登录（作废刷新令牌）
+export const logout = (refresh_token: string) => {
+  return api.post<MessageResponse>('/auth/logout', { refresh_token })
+}
+
 // 获取当前用户信息
 export const getMe = () => {
   return api.get<UserProfile>('/auth/me')
@@ -1,5 +1,5 @@
 import api from './api'
-import type { StoryNodeListItem, GetFeedParams, GetTrendingParams, SearchParams } from '@/types'
+import type { StoryNodeListItem, GetFeedParams, GetTrendingParams, SearchParams, Leaderboard, GetLeaderboardParams } from '@/types'
 
 // ==================== 发现相关 ====================
 
@@ -16,4 +16,9 @@ export const getTrending = (params?: GetTrendingParams) => {
 // 搜索
 export const search = (params: SearchParams) => {
   return api.get<StoryNodeListItem[]>('/discovery/search', { params })
-}
\ No newline at end of file
+}
+
+// 作者排行榜（登录后附带自己的名次）
+export const getLeaderboard = (params?: GetLeaderboardParams) => {
+  return api.get<Leaderboard>('/leaderboard', { params })
+}
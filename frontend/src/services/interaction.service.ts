@@ -28,4 +28,14 @@ export const getNotifications = (params?: { skip?: number; limit?: number }) =>
 // 一键已读
 export const markNotificationsRead = () => {
   return api.put<MessageResponse>('/interaction/notifications/read')
-}
\ No newline at end of file
+}
+
+// 未读通知数 (角标轮询)
+export const getUnreadCount = () => {
+  return api.get<{ unread_count: number }>('/interaction/notifications/unread-count')
+}
+
+// 单条通知设为已读
+export const markNotificationRead = (notificationId: number) => {
+  return api.put<MessageResponse>(`/interaction/notifications/${notificationId}/read`)
+}
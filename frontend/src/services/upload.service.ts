@@ -1,4 +1,5 @@
 import api from './api'
+import type { ImageVariant } from '@/types'
 
 // 上传图片
 export const uploadImage = (file: File) => {
@@ -10,4 +11,59 @@ export const uploadImage = (file: File) => {
       'Content-Type': 'multipart/form-data',
     },
   })
-}
\ No newline at end of file
+}
+
+interface DirectUploadTicket {
+  filename: string
+  url: string
+  upload: { url: string; method: string; headers: Record<string, string>; expires_in: number } | null
+  complete_token: string | null
+}
+
+const sha256Hex = async (file: File) => {
+  const digest = await crypto.subtle.digest('SHA-256', await file.arrayBuffer())
+  return Array.from(new Uint8Array(digest), (b) => b.toString(16).padStart(2, '0')).join('')
+}
+
+// 直传：文件直接 PUT 到存储（S3 或本地直传地址），不经过 API 进程；相同内容已存在时不用再传
+export const uploadImageDirect = async (file: File) => {
+  const { data: ticket } = await api.post<DirectUploadTicket>('/uploads/presign', {
+    sha256: await sha256Hex(file),
+    size: file.size,
+    content_type: file.type,
+  })
+  if (!ticket.upload) {
+    return ticket.url
+  }
+
+  // 预签名地址自带授权，不能带 Authorization 头，用 fetch 而不是 api 实例
+  const res = await fetch(ticket.upload.url, {
+    method: ticket.upload.method,
+    headers: ticket.upload.headers,
+    body: file,
+  })
+  if (!res.ok) {
+    throw new Error(`直传失败：${res.status}`)
+  }
+
+  const { data } = await api.post<{ url: string }>('/uploads/complete', { complete_token: ticket.complete_token })
+  return data.url
+}
+
+// 查询原图的缩略图（刚上传时可能还在生成，返回空数组）
+export const getImageVariants = (url: string) => {
+  return api.get<ImageVariant[]>('/uploads/variants', { params: { url } })
+}
+
+// 挑选不小于显示宽度的最小缩略图（优先 WebP），都不够大时退回原图
+export const pickImageVariant = (
+  original: string | null | undefined,
+  variants: ImageVariant[] | undefined,
+  displayWidth: number,
+  preferWebp = true,
+) => {
+  const format = preferWebp ? 'webp' : 'jpeg'
+  const candidates = (variants ?? []).filter((v) => v.format === format)
+  const fit = candidates.find((v) => v.width >= displayWidth)
+  return fit?.url ?? original ?? candidates[candidates.length - 1]?.url ?? null
+}
@@ -1,7 +1,17 @@
 import api from './api'
-import type { UserProfile } from '@/types'
+import type { UserProfile, UserPublicProfile, ActivityPage } from '@/types'
 
 // 获取用户资料（公开）
 export const getUserProfile = (userId: number) => {
   return api.get<UserProfile>(`/users/${userId}`)
-}
\ No newline at end of file
+}
+
+// 批量获取用户资料卡（信息流/评论区一次渲染多个作者时使用）
+export const getUserProfiles = (userIds: number[]) => {
+  return api.get<UserPublicProfile[]>('/users', { params: { ids: userIds.join(',') } })
+}
+
+// 用户动态时间线（节点/评论/点赞交错），翻页传上一页的 next_cursor
+export const getUserActivity = (userId: number, params?: { cursor?: string; limit?: number }) => {
+  return api.get<ActivityPage>(`/users/${userId}/activity`, { params })
+}
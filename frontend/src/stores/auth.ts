@@ -1,11 +1,19 @@
 import { defineStore } from 'pinia'
 import { ref, computed } from 'vue'
-import { login as loginApi, getMe as getMeApi } from '@/services/auth.service'
-import type { UserProfile, LoginFormData } from '@/types'
+import {
+  login as loginApi,
+  getMe as getMeApi,
+  refreshToken as refreshTokenApi,
+  logout as logoutApi,
+} from '@/services/auth.service'
+import type { UserProfile, LoginFormData, TokenResponse } from '@/types'
 
 export const useAuthStore = defineStore('auth', () => {
   // State
   const token = ref<string | null>(localStorage.getItem('token'))
+  const refreshToken = ref<string | null>(localStorage.getItem('refresh_token'))
+  // 同一时刻只发一个刷新请求，并发的 401 共用结果
+  let refreshing: Promise<string> | null = null
   const user = ref<UserProfile | null>(null)
 
   // Getters
@@ -20,13 +28,38 @@ export const useAuthStore = defineStore('auth', () => {
     localStorage.setItem('token', newToken)
   }
 
+  const setTokens = (data: TokenResponse) => {
+    setToken(data.access_token)
+    if (data.refresh_token) {
+      refreshToken.value = data.refresh_token
+      localStorage.setItem('refresh_token', data.refresh_token)
+    }
+  }
+
+  // 访问令牌过期时用刷新令牌换新，返回新的访问令牌
+  const refresh = () => {
+    if (!refreshing) {
+      const current = refreshToken.value
+      if (!current) return Promise.reject(new Error('未登录'))
+      refreshing = refreshTokenApi(current)
+        .then((response) => {
+          setTokens(response.data)
+          return response.data.access_token
+        })
+        .finally(() => {
+          refreshing = null
+        })
+    }
+    return refreshing
+  }
+
   const setUser = (userData: UserProfile) => {
     user.value = userData
   }
 
   const login = async (data: LoginFormData) => {
     const response = await loginApi(data)
-    setToken(response.data.access_token)
+    setTokens(response.data)
     // 登录成功后获取用户信息
     await fetchUser()
     return response.data
@@ -39,9 +72,15 @@ export const useAuthStore = defineStore('auth', () => {
   }
 
   const logout = () => {
+    if (refreshToken.value) {
+      // 通知后端作废刷新令牌，失败也不影响本地退出
+      logoutApi(refreshToken.value).catch(() => {})
+    }
     token.value = null
+    refreshToken.value = null
     user.value = null
     localStorage.removeItem('token')
+    localStorage.removeItem('refresh_token')
   }
 
   const updateUser = (userData: Partial<UserProfile>) => {
@@ -60,12 +99,15 @@ export const useAuthStore = defineStore('auth', () => {
 
   return {
     token,
+    refreshToken,
     user,
     isLoggedIn,
     isAdmin,
     isWriter,
     isBanned,
     setToken,
+    setTokens,
+    refresh,
     setUser,
     login,
     fetchUser,
@@ -65,6 +65,8 @@ export interface LoginFormData {
 export interface TokenResponse {
   access_token: string
   token_type: string
+  refresh_token?: string | null
+  expires_in?: number | null
 }
 
 // 修改个人资料请求
@@ -141,6 +143,16 @@ export interface GetTrendingParams {
   limit?: number
 }
 
+// 排行榜参数
+export interface GetLeaderboardParams {
+  metric?: 'likes' | 'branches'
+  period?: 'all' | 'week'
+  book_id?: number
+  skip?: number
+  limit?: number
+  user_id?: number
+}
+
 // 搜索节点参数
 export interface SearchParams {
   q: string
@@ -154,6 +166,24 @@ export interface AuditNodeRequest {
   status: 'published' | 'rejected'
 }
 
+// 批量审核：同一节点只取第一条
+export interface BulkAuditNodesRequest {
+  items: Array<{ node_id: number } & AuditNodeRequest>
+}
+
+export interface NodeAuditResult {
+  node_id: number
+  ok: boolean
+  old_status: string | null
+  status: string | null
+  detail: string | null
+}
+
+export interface BulkAuditNodesResponse {
+  updated: number
+  results: NodeAuditResult[]
+}
+
 // 管理员更新用户请求
 export interface AdminUpdateUserRequest {
   role?: 'admin' | 'writer' | 'banned'
@@ -15,17 +15,58 @@ export interface User {
   updated_at: string
 }
 
+// 上传图片的缩略图（后台生成，按宽度升序）
+export interface ImageVariant {
+  url: string
+  format: 'webp' | 'jpeg'
+  width: number
+  height: number
+}
+
 // 用户概要信息（在列表中使用）
 export interface AuthorInfo {
   id: number
   username: string
   avatar?: string | null
+  avatar_variants?: ImageVariant[]
 }
 
 // 用户详情响应（包含统计信息）
 export interface UserProfile extends User {
   nodes_count: number
+  published_nodes_count: number
   likes_count: number
+  comments_received: number
+}
+
+// 公开资料卡（批量查询，不含邮箱）
+export interface UserPublicProfile {
+  id: number
+  username: string
+  role: UserRole
+  bio?: string | null
+  avatar?: string | null
+  nodes_count: number
+  published_nodes_count: number
+  likes_count: number
+  comments_received: number
+}
+
+// 用户动态时间线
+export interface ActivityItem {
+  type: 'node' | 'comment' | 'like'
+  created_at: string
+  node_id: number
+  book_id: number
+  node_title: string | null
+  node_branch_name: string | null
+  comment_id: number | null
+  comment_excerpt: string | null
+}
+
+export interface ActivityPage {
+  items: ActivityItem[]
+  next_cursor: string | null
 }
 
 // 节点状态枚举
@@ -37,6 +78,7 @@ export interface StoryBook {
   title: string
   description?: string | null
   cover_image?: string | null
+  cover_variants?: ImageVariant[]
   is_active: boolean
   created_at: string
 }
@@ -103,8 +145,36 @@ export type NotificationType = 'like' | 'comment' | 'reply' | 'audit'
 export interface Notification {
   id: number
   type: NotificationType
-  sender: AuthorInfo
-  target_id: number
+  sender: AuthorInfo | null
+  target_id: number | null
+  node_id: number | null
+  comment_id: number | null
+  node_title: string | null
+  node_branch_name: string | null
+  comment_excerpt: string | null
   is_read: boolean
   created_at: string
-}
\ No newline at end of file
+}
+
+// 排行榜
+export interface LeaderboardEntry {
+  rank: number
+  score: number
+  user: AuthorInfo
+}
+
+export interface LeaderboardPosition {
+  user_id: number
+  rank: number | null
+  score: number
+}
+
+export interface Leaderboard {
+  metric: 'likes' | 'branches'
+  period: 'all' | 'week'
+  book_id: number | null
+  total: number
+  updated_at: string | null
+  entries: LeaderboardEntry[]
+  me: LeaderboardPosition | null
+}